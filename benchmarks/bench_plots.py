@@ -0,0 +1,320 @@
+"""
+Benchmarks of the plotting functions on the Agg backend.
+
+Every plotting function is run over a sweep of group sizes, numbers of
+groups and options, one option at a time on top of a base case. The time
+and peak memory of each stage are recorded:
+
+    plot : the plotting function itself (statistics and artists)
+    draw : one canvas draw (layout, including the swarm layout)
+    save : save_figure in the default formats (the saveplot variant only)
+
+The peak memory is the growth of the resident set during the stage, read
+from the high-water mark Linux keeps for the process. Elsewhere, each case
+is run once more under tracemalloc, which only sees the memory allocated
+through Python and numpy and slows the run several times.
+
+The stages the functions report themselves (see functions_profile_v0) are
+stored in the results too, for a finer breakdown of the plot and save
+stages, but are not compared with the baseline.
+
+The statistics cache is cleared before every run, so the numbers are those
+of a first render. Results are compared with a stored baseline, and the
+script exits with status 1 when a stage got slower or heavier than the
+tolerance allows.
+
+Usage:
+    python benchmarks/bench_plots.py --quick            # small sweep, a few minutes
+    python benchmarks/bench_plots.py                    # full sweep (10 to 10^6 samples, 2 to 50 groups), hours
+    python benchmarks/bench_plots.py --save-baseline    # record the baseline for this machine
+    python benchmarks/bench_plots.py --functions plot_radar --sizes 10 100
+"""
+import argparse
+import contextlib
+import ctypes
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from functions_cache_v0 import STATS_CACHE
+from functions_export_v0 import save_figure
+from functions_profile_v0 import profile_stages
+
+SIZES = (10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6)
+GROUPS = (2, 5, 10, 50)
+QUICK_SIZES = (10, 1000)
+QUICK_GROUPS = (2, 10)
+# Radar charts: the size is the number of axes
+RADAR_SIZES = (6, 24, 100, 1000)
+QUICK_RADAR_SIZES = (6, 24)
+# Cases with more samples in total are skipped (the swarm alone would take minutes)
+MAX_POINTS = 2 * 10 ** 6
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+# === Cases ===
+
+def _long_form(groups):
+    import pandas as pd
+
+    values = np.concatenate(groups[:2])
+    cond = np.repeat(['W', 'N3'], [groups[0].size, groups[1].size])
+    return pd.DataFrame({'value': values, 'cond': cond})
+
+
+def _run_boxes_W_N3(fig, ax, data, options):
+    from functions_boxplots_v3 import plot_boxes_W_N3
+
+    plot_boxes_W_N3(ax, data, legends=False, **options)
+
+
+def _run_boxes_generalized(fig, ax, groups, options):
+    from functions_boxplots_v3 import plot_boxes_generalized
+
+    plot_boxes_generalized(ax, groups, [f'g{i}' for i in range(len(groups))], **options)
+
+
+def _run_violins_generalized(fig, ax, groups, options):
+    from functions_violinplots_v3 import plot_violins_generalized
+
+    plot_violins_generalized(ax, groups, [f'g{i}' for i in range(len(groups))], **options)
+
+
+def _run_half_violin_box_swarm(fig, ax, groups, options):
+    from functions_box_swarm_halfviolin_v1 import plot_half_violin_box_swarm
+
+    plot_half_violin_box_swarm(ax, groups, [f'g{i}' for i in range(len(groups))], **options)
+
+
+def _radar_profiles(groups):
+    return np.array(groups)
+
+
+def _run_radar(fig, ax, profiles, options):
+    from functions_radar_v0 import plot_radar
+
+    plt.close(fig)
+    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
+    plot_radar(profiles, [f'axis {i}' for i in range(profiles.shape[1])], ax=ax)
+    return fig
+
+
+# name: (prepare the data from the list of groups, run, options that can be switched on, fixed number of groups)
+CASES = {
+    'plot_boxes_W_N3': (_long_form, _run_boxes_W_N3, ('connect_pairs', 'saveplot'), 2),
+    'plot_boxes_generalized': (None, _run_boxes_generalized, ('show_p_values', 'connect_pairs', 'saveplot'), None),
+    'plot_violins_generalized': (None, _run_violins_generalized, ('show_p_values', 'saveplot'), None),
+    'plot_half_violin_box_swarm': (None, _run_half_violin_box_swarm,
+                                   ('show_p_values', 'connect_pairs', 'single_collection', 'saveplot'), None),
+    'plot_radar': (_radar_profiles, _run_radar, ('saveplot',), None),
+}
+
+# Options of the base case; each variant switches one of them on
+BASE_OPTIONS = {'show_p_values': False, 'connect_pairs': False, 'single_collection': False}
+
+
+def make_groups(size, n_groups, seed=0):
+    """`n_groups` samples of `size` values with shifted means, the same for every run."""
+    rng = np.random.default_rng(seed)
+    return [rng.normal(i * 0.2, 1, size) for i in range(n_groups)]
+
+
+def _resident_bytes(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+
+
+def _reset_peak_resident():
+    """Reset the high-water mark of the resident set (Linux); False if it cannot be done here."""
+    try:
+        # Hand the freed memory back first, so reusing it counts as growth
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def run_case(name, size, n_groups, variant, out_dir, memory=None):
+    """
+    Run one case once; returns {stage: seconds}, {stage: peak bytes} and the
+    total seconds of the stages the functions reported, by path.
+
+    memory is 'resident' (high-water mark of the resident set), 'tracemalloc'
+    (tracing must already be started) or None to skip the measurement.
+    """
+    prepare, run, switches, _ = CASES[name]
+    groups = make_groups(size, n_groups)
+    data = prepare(groups) if prepare else groups
+    options = {key: False for key in BASE_OPTIONS if key in switches}
+    if variant in options:
+        options[variant] = True
+
+    STATS_CACHE.clear()
+    gc.collect()
+    times, peaks = {}, {}
+
+    def stage(label, func):
+        if memory == 'resident':
+            _reset_peak_resident()
+            before = _resident_bytes('VmRSS')
+        elif memory == 'tracemalloc':
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = func()
+        times[label] = time.perf_counter() - start
+        if memory == 'resident':
+            peaks[label] = _resident_bytes('VmHWM') - before
+        elif memory == 'tracemalloc':
+            peaks[label] = tracemalloc.get_traced_memory()[1] - before
+        return result
+
+    fig, ax = plt.subplots(figsize=(10, 7))
+    # The functions' own warnings (e.g. points left out of a crowded swarm) are not reported
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()), profile_stages() as profile:
+        warnings.simplefilter('ignore')
+        fig = stage('plot', lambda: run(fig, ax, data, options)) or fig
+        stage('draw', fig.canvas.draw)
+        if variant == 'saveplot':
+            stage('save', lambda: save_figure(fig, os.path.join(out_dir, 'figure'), parallel=False))
+    plt.close('all')
+    return times, peaks, profile.totals()
+
+
+def sweep(functions, sizes, radar_sizes, groups, max_points):
+    """Cases of the sweep, as (function, size, number of groups, variant)."""
+    for name in functions:
+        _, _, switches, fixed_groups = CASES[name]
+        case_sizes = radar_sizes if name == 'plot_radar' else sizes
+        for size in case_sizes:
+            for n_groups in ((fixed_groups,) if fixed_groups else groups):
+                if name != 'plot_radar' and size * n_groups > max_points:
+                    continue
+                for variant in ('base',) + switches:
+                    yield name, size, n_groups, variant
+
+
+def case_key(name, size, n_groups, variant):
+    return f'{name} n={size} k={n_groups} {variant}'
+
+
+# === Comparison with the baseline ===
+
+def compare(result, reference, tolerance, min_seconds, min_bytes):
+    """Stages of `result` that are slower or heavier than `reference` beyond the tolerance."""
+    regressions = []
+    for stage, seconds in result['seconds'].items():
+        old = reference.get('seconds', {}).get(stage)
+        if old is not None and seconds > old * (1 + tolerance) and seconds - old > min_seconds:
+            regressions.append(f'{stage} time {old:.3f}s -> {seconds:.3f}s')
+    for stage, peak in result['peak_bytes'].items():
+        old = reference.get('peak_bytes', {}).get(stage)
+        if old is not None and peak > old * (1 + tolerance) and peak - old > min_bytes:
+            regressions.append(f'{stage} memory {old / 2 ** 20:.1f} -> {peak / 2 ** 20:.1f} MiB')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='small sweep for a fast check')
+    parser.add_argument('--functions', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, help='samples per group (axes of the radar charts)')
+    parser.add_argument('--groups', nargs='+', type=int, help='numbers of groups')
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS, help='skip cases with more samples')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (the fastest is kept)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative increase')
+    parser.add_argument('--min-seconds', type=float, default=0.1, help='ignore smaller time increases')
+    parser.add_argument('--min-bytes', type=int, default=16 * 2 ** 20, help='ignore smaller memory increases')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    radar_sizes = args.sizes or (QUICK_RADAR_SIZES if args.quick else RADAR_SIZES)
+    groups = args.groups or (QUICK_GROUPS if args.quick else GROUPS)
+    reference = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            reference = json.load(f)['results']
+
+    memory = 'resident' if _reset_peak_resident() else 'tracemalloc'
+    # Imports and first-use costs (seaborn, fonts) are not part of any case
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name in args.functions:
+            run_case(name, 10, 2, 'base', out_dir)
+
+        results, regressions = {}, 0
+        for name, size, n_groups, variant in sweep(args.functions, sizes, radar_sizes, groups, args.max_points):
+            key = case_key(name, size, n_groups, variant)
+            runs = [run_case(name, size, n_groups, variant, out_dir, memory if memory == 'resident' else None)
+                    for _ in range(args.repeat)]
+            seconds = {stage: min(t[stage] for t, _, _ in runs) for stage in runs[0][0]}
+            inner = {path: min(s[path] for _, _, s in runs) for path in runs[0][2]}
+            if memory == 'resident':
+                peak_bytes = {stage: min(p[stage] for _, p, _ in runs) for stage in runs[0][1]}
+            else:
+                tracemalloc.start()
+                try:
+                    peak_bytes = run_case(name, size, n_groups, variant, out_dir, 'tracemalloc')[1]
+                finally:
+                    tracemalloc.stop()
+            results[key] = {'seconds': seconds, 'peak_bytes': peak_bytes, 'stages': inner}
+
+            line = f'{key:58}' + ''.join(f' {stage} {t:7.3f}s' for stage, t in seconds.items())
+            line += f'  peak {max(peak_bytes.values()) / 2 ** 20:7.1f} MiB'
+            if key in reference:
+                found = compare(results[key], reference[key], args.tolerance, args.min_seconds, args.min_bytes)
+                if found:
+                    regressions += 1
+                    line += '  REGRESSION: ' + '; '.join(found)
+            print(line, flush=True)
+
+    payload = {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'memory': memory,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(payload, f, indent=1)
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            # Keep the cases that were not run this time
+            with open(args.baseline) as f:
+                payload['results'] = {**json.load(f)['results'], **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(payload, f, indent=1)
+        print(f'baseline saved to {args.baseline}')
+    elif not reference:
+        print(f'no baseline at {args.baseline}; run with --save-baseline to record one')
+    else:
+        print(f'{regressions} case(s) regressed beyond {args.tolerance:.0%}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
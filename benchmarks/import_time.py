@@ -0,0 +1,113 @@
+"""
+Import-time budget for the plotting modules.
+
+Every module is imported in a fresh interpreter (best of several runs), and
+the script fails if an import takes longer than the budget or loads one of
+the heavy dependencies, which must only be imported when a plot is drawn.
+It also draws a first plot of each kind without p-values, which must not
+load seaborn, scipy or pandas: scipy is only needed for the p-values.
+
+Usage:
+    python benchmarks/import_time.py [--budget 0.3] [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'functions_boxplots_v3',
+    'functions_violinplots_v3',
+    'functions_box_swarm_halfviolin_v1',
+    'functions_radar_v0',
+    'functions_batch_v0',
+    'functions_facet_v0',
+    'functions_server_v0',
+    'functions_render_cache_v0',
+    'functions_style_v0',
+]
+
+# Must not be loaded by a bare import of the modules above
+HEAVY = ['matplotlib', 'seaborn', 'pandas', 'scipy']
+
+# Must not be loaded by a first plot with show_p_values=False
+NOT_PLOTTING = ['seaborn', 'scipy', 'pandas']
+
+PLOTS = [
+    ('functions_boxplots_v3', 'plot_boxes_generalized'),
+    ('functions_violinplots_v3', 'plot_violins_generalized'),
+    ('functions_box_swarm_halfviolin_v1', 'plot_half_violin_box_swarm'),
+]
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+_PLOT_PROBE = """
+import sys
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from {module} import {plot}
+fig = Figure()
+FigureCanvasAgg(fig)
+rng = np.random.default_rng(0)
+{plot}(fig.subplots(), [rng.normal(i, 1, 100) for i in range(3)], ['a', 'b', 'c'], show_p_values=False)
+fig.canvas.draw()
+print(','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure(module, repeat=5):
+    """Best import time of `module` in seconds over `repeat` fresh interpreters, and the heavy modules it loaded."""
+    best, loaded = float('inf'), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY)],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        best = min(best, float(output[0]))
+        loaded = output[1].split(',') if len(output) > 1 else []
+    return best, loaded
+
+
+def plot_imports(module, plot):
+    """Modules of NOT_PLOTTING loaded by a first `plot` without p-values, in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', _PLOT_PROBE.format(module=module, plot=plot, heavy=NOT_PLOTTING)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    return output[-1].split(',') if output else []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=float, default=0.3, help='seconds allowed per module import')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per module')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in MODULES:
+        seconds, loaded = measure(module, args.repeat)
+        over = seconds > args.budget
+        status = 'FAIL' if over or loaded else 'ok'
+        line = f'{status:4}  {module:36} {seconds * 1000:7.1f} ms'
+        if loaded:
+            line += f"  (imports {', '.join(loaded)})"
+        print(line)
+        failed |= status == 'FAIL'
+    print(f'budget: {args.budget * 1000:.0f} ms per module')
+    for module, plot in PLOTS:
+        loaded = plot_imports(module, plot)
+        line = f"{'FAIL' if loaded else 'ok':4}  {plot}(show_p_values=False)"
+        if loaded:
+            line += f"  (imports {', '.join(loaded)})"
+        print(line)
+        failed |= bool(loaded)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
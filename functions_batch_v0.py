@@ -0,0 +1,175 @@
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from functions_export_v0 import DEFAULT_FORMATS
+from functions_workers_v0 import usable_cpus
+
+# Plotting functions that can be named in a job, and the module they live in
+PLOT_FUNCTIONS = {
+    'plot_boxes_W_N3': 'functions_boxplots_v3',
+    'plot_boxes_generalized': 'functions_boxplots_v3',
+    'plot_violins_generalized': 'functions_violinplots_v3',
+    'plot_half_violin_box_swarm': 'functions_box_swarm_halfviolin_v1',
+    'plot_radar': 'functions_radar_v0',
+}
+
+BatchResult = namedtuple('BatchResult', ['index', 'filename', 'paths', 'error', 'seconds', 'cached'],
+                         defaults=(False,))
+BatchResult.__doc__ = """
+Outcome of one batch job.
+
+index : position of the job in the list; filename : output path without
+extension; paths : files written (empty on failure); error : formatted
+traceback, or None on success; seconds : wall time of the job in its worker;
+cached : True when the render was skipped because a RenderCache held its
+outputs.
+"""
+
+
+def render_batch(jobs, plot='plot_boxes_generalized', max_workers=None, figsize=(10, 7), cache=None,
+                 threads=False):
+    """
+    Render many figures across a process pool, yielding results as they finish.
+
+    Every job runs in a worker process on the Agg backend, on its own figure,
+    so jobs do not share pyplot state. A job that raises is reported in its
+    BatchResult and does not stop the others.
+
+    With `threads`, the jobs run in a thread pool of this process instead:
+    their figures are created without pyplot (matplotlib.figure.Figure),
+    styled per Axes and saved with fig.savefig, so they share no global
+    state. There is no process start-up or data pickling, and the numerical
+    stages (NumPy, the KDE FFTs) run in parallel as they release the GIL.
+
+    Parameters
+    ----------
+    jobs : iterable of (dataset, labels, options)
+        `dataset` and `labels` as for the plotting function (for
+        plot_boxes_W_N3, `dataset` is the long-form DataFrame and `labels`
+        None; for plot_radar, `dataset` holds the profiles and `labels` the
+        axis labels, and the chart is drawn on a polar Axes). `options` is a
+        dict of keyword arguments for the plotting function, e.g.
+        {'filename': 'out/metric_1', 'plot_title': ...}. It
+        may also contain 'plot' and 'figsize' to override the defaults below.
+        saveplot defaults to True.
+    plot : str or callable
+        Default plotting function: a name from PLOT_FUNCTIONS or a module-level
+        function with the same signature.
+    max_workers : int, optional
+        Number of worker processes. Defaults to the number of usable CPUs
+        (functions_workers_v0.usable_cpus).
+    figsize : tuple
+        Default figure size in inches.
+    cache : RenderCache or str, optional
+        On-disk render cache (or its directory, see functions_render_cache_v0).
+        Jobs whose data, labels, options, libraries and code are unchanged
+        since their outputs were written are not rendered again; they are
+        yielded first, with `cached` True. The manifest is saved at the end.
+    threads : bool
+        Render in `max_workers` threads of this process rather than in
+        worker processes.
+
+    Yields
+    ------
+    BatchResult
+        One per job, in completion order.
+    """
+    if max_workers is None:
+        max_workers = usable_cpus()
+    if isinstance(cache, str):
+        from functions_render_cache_v0 import RenderCache
+
+        cache = RenderCache(cache)
+    if threads:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker)
+    with executor:
+        futures = {}
+        keys = {}
+        for index, (dataset, labels, options) in enumerate(jobs):
+            options = dict(options or {})
+            job_plot = options.pop('plot', plot)
+            job_figsize = options.pop('figsize', figsize)
+            filename = options.get('filename', 'filename')
+            if cache is not None:
+                options.setdefault('saveplot', True)
+                keys[index] = cache.key(job_plot, dataset, labels, options, figsize=job_figsize)
+                paths = cache.lookup(filename, keys[index], _formats(options))
+                if paths is not None:
+                    yield BatchResult(index, filename, paths, None, 0.0, True)
+                    continue
+            future = executor.submit(_render_job, index, job_plot, dataset, labels, options, job_figsize,
+                                     pyplot=not threads)
+            futures[future] = (index, filename)
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception:
+                    # The worker died (e.g. killed or out of memory): report it like any other failure
+                    index, filename = futures[future]
+                    result = BatchResult(index, filename, [], traceback.format_exc(), None)
+                if cache is not None and result.error is None:
+                    cache.store(result.filename, keys[result.index], result.paths)
+                yield result
+        finally:
+            if cache is not None:
+                cache.save()
+
+
+def _init_batch_worker():
+    import matplotlib
+
+    matplotlib.use('Agg', force=True)
+
+
+def _render_job(index, plot, dataset, labels, options, figsize, pyplot=True):
+    import importlib
+
+    start = time.perf_counter()
+    options.setdefault('saveplot', True)
+    filename = options.get('filename', 'filename')
+    formats = _formats(options)
+    fig = None
+    try:
+        if isinstance(plot, str):
+            plot = getattr(importlib.import_module(PLOT_FUNCTIONS[plot]), plot)
+        radar = getattr(plot, '__name__', None) == 'plot_radar'
+        fig, ax = _new_figure(figsize, radar, pyplot)
+        if radar:
+            # Profiles first (array or list of dicts), the axis labels as `labels`, on a polar Axes
+            plot(dataset, labels, ax=ax, **options)
+        else:
+            if labels is None:
+                plot(ax, dataset, **options)
+            else:
+                plot(ax, dataset, labels, **options)
+        paths = [f'{filename}.{fmt}' for fmt in formats] if options['saveplot'] else []
+        return BatchResult(index, filename, paths, None, time.perf_counter() - start)
+    except Exception:
+        return BatchResult(index, filename, [], traceback.format_exc(), time.perf_counter() - start)
+    finally:
+        if fig is not None and pyplot:
+            import matplotlib.pyplot as plt
+
+            plt.close(fig)
+
+
+def _new_figure(figsize, polar, pyplot):
+    # Without pyplot, the figure is not registered anywhere: nothing is shared between threads
+    if pyplot:
+        import matplotlib.pyplot as plt
+
+        return plt.subplots(figsize=figsize, subplot_kw=dict(polar=polar))
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot(polar=polar)
+
+
+def _formats(options):
+    formats = options.get('save_formats', DEFAULT_FORMATS)
+    return (formats,) if isinstance(formats, str) else tuple(formats)
@@ -1,3 +1,22 @@
+import functools
+
+import numpy as np
+
+from functions_cache_v0 import cached_box_summary, cached_violin_stats, group_key
+from functions_drawing_v0 import (connect_pairs_collection, resolve_palette, set_betweenx, update_box,
+                                  update_connect_pairs)
+from functions_export_v0 import DEFAULT_FORMATS, RASTERIZE_POINTS, save_figure
+from functions_grouped_v0 import GroupedData
+from functions_handle_v0 import PlotHandle
+from functions_lazy_v0 import lazy_import
+from functions_profile_v0 import profiled, stage
+from functions_style_v0 import apply_context, plotting_context
+from functions_summary_v0 import summarize_groups
+from functions_swarm_v0 import sample_legend, swarm_scatter
+
+plt = lazy_import('matplotlib.pyplot')
+
+@profiled
 def plot_half_violin_box_swarm(ax, dataset, labels,
                                 y_min=None, y_max=None,
                                 h_line=None,
@@ -14,125 +33,114 @@ def plot_half_violin_box_swarm(ax, dataset, labels,
                                 connect_pairs=False,
                                 saveplot=False,
                                 filename='filename',
-                                dpi=300):
-
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    import numpy as np
-    import pandas as pd
-    import scipy.stats as stats
-    
-    sns.set_context('notebook', font_scale=font_scale)
+                                dpi=300,
+                                save_formats=DEFAULT_FORMATS,
+                                rasterize_above=RASTERIZE_POINTS,
+                                kde_grid_size=256,
+                                kde_tol=1e-3,
+                                test='ranksums',
+                                test_kws=None,
+                                pairs=None,
+                                significant_only=False,
+                                single_collection=False,
+                                max_points=None):
 
     n_groups = len(labels)
 
-    # Color palettes
-    def resolve_palette(palette, n):
-        if palette is None:
-            return sns.color_palette("deep", n)
-        elif isinstance(palette, str):
-            return sns.color_palette(palette, n)
-        elif isinstance(palette, list):
-            if len(palette) < n:
-                raise ValueError(f"Palette has fewer colors ({len(palette)}) than number of groups ({n})")
-            return palette
+    # Resolve palettes
+    violin_palette = resolve_palette(violin_palette, n_groups, labels)
+    box_palette = resolve_palette(box_palette, n_groups, labels)
+    swarm_palette = resolve_palette(swarm_palette, n_groups, labels)
+
+    # Precomputed summaries or out-of-core groups (chunk iterators, memmaps) only
+    # give the boxes; the violins, swarm and p-values need the samples
+    keys = None
+    with stage('group_data'):
+        summaries = summarize_groups(dataset)
+        if summaries is not None:
+            print("⚠️ The groups are summaries, not samples: only the boxes are drawn.")
+            grouped = None
         else:
-            raise TypeError(f"Palette must be a string, list, or None, but got {type(palette)}")
+            # Combine data (contiguous values + group offsets)
+            grouped = GroupedData.from_dataset(dataset, labels)
+    if grouped is not None:
+        with stage('box_statistics'):
+            # Content hash of each group: its statistics are reused from the cache on re-renders
+            keys = [group_key(g) for g in grouped]
+            summaries = [cached_box_summary(g, key=key) for g, key in zip(grouped, keys)]
 
-    # Resolve palettes
-    violin_palette = resolve_palette(violin_palette, n_groups)
-    box_palette = resolve_palette(box_palette, n_groups)
-    swarm_palette = resolve_palette(swarm_palette, n_groups)
-
-    # Combine data
-    all_data = []
-    for i, (data, label) in enumerate(zip(dataset, labels)):
-        df = pd.DataFrame({'value': data, 'group': i, 'label': label})
-        all_data.append(df)
-    df_all = pd.concat(all_data, ignore_index=True)
-
-    # === Plot half-violins ===
-    for i in range(n_groups):
-        values = df_all[df_all['group'] == i]['value']
-        parts = ax.violinplot(values, positions=[i + bias],
-                              showmeans=False, showmedians=False,
-                              showextrema=False, widths=0.6)
-        for pc in parts['bodies']:
-            pc.set_facecolor(violin_palette[i])
-            pc.set_alpha(0.5)
-            m = np.mean(pc.get_paths()[0].vertices[:, 0])
-            pc.get_paths()[0].vertices[:, 0] = np.clip(pc.get_paths()[0].vertices[:, 0], m, np.inf)
-
-    # === Plot boxplots manually ===
+    # Kept by the returned handle, to move them when the data change
+    artists = {}
     widths = 0.25
-    for i in range(n_groups):
-        values = df_all[df_all['group'] == i]['value']
-        ax.boxplot(values,
-                   positions=[i - bias - widths/2],
-                   widths=widths,
-                   patch_artist=True,
-                   boxprops=dict(facecolor=box_palette[i], color='black', linewidth=1.5, alpha=0.5),
-                   medianprops=dict(color=box_palette[i], linewidth=2, alpha=1),
-                   whiskerprops=dict(color='black', linewidth=1.5),
-                   capprops=dict(color='black', linewidth=1.5),
-                   flierprops=dict(marker='', alpha=0))
-
-    # === Swarmplot (centered) ===
-    swarm_y = []  # store y-values for each group
-    for i in range(n_groups):
-        values = df_all[df_all['group'] == i]['value'].values
-        swarm_y.append(values)
-        x_positions = np.random.normal(loc=i, scale=0.03, size=len(values))  # jitter manually
-        ax.scatter(x_positions, values, s=point_size**2, color=swarm_palette[i], zorder=10, alpha=0.9)
+
+    violin_stats = None
+    if grouped is not None:
+        with stage('kde'):
+            violin_stats = cached_violin_stats(grouped, keys, grid_size=kde_grid_size, tol=kde_tol)
+
+    if single_collection:
+        # === Every group at once: one polygon collection, one line collection, one scatter ===
+        with stage('collections', ax):
+            artists.update(_draw_collections(ax, summaries, violin_stats, grouped, violin_palette,
+                                             box_palette, swarm_palette, bias, widths, point_size,
+                                             max_points))
+        update_groups = functools.partial(_update_collections, bias=bias, widths=widths,
+                                          swarm_palette=swarm_palette, kde_grid_size=kde_grid_size,
+                                          kde_tol=kde_tol)
+    else:
+        # === Plot half-violins ===
+        if grouped is not None:
+            with stage('violins', ax):
+                # Densities from the binned/FFT KDE, drawn by ax.violin (no exact KDE in ax.violinplot)
+                parts = ax.violin(violin_stats,
+                                  positions=np.arange(n_groups) + bias,
+                                  showmeans=False, showmedians=False,
+                                  showextrema=False, widths=0.6)
+                for i, pc in enumerate(parts['bodies']):
+                    pc.set_facecolor(violin_palette[i])
+                    pc.set_alpha(0.5)
+                    _clip_half(pc)
+            artists['violins'] = parts['bodies']
+
+        # === Plot boxplots manually ===
+        with stage('boxes', ax):
+            artists['boxes'] = []
+            for i in range(n_groups):
+                # Same as ax.boxplot, from the (cached) statistics
+                artists['boxes'].append(ax.bxp(
+                    [summaries[i]],
+                    positions=[i - bias - widths/2],
+                    widths=widths,
+                    patch_artist=True,
+                    boxprops=dict(facecolor=box_palette[i], edgecolor='black', linewidth=1.5, alpha=0.5),
+                    medianprops=dict(color=box_palette[i], linewidth=2, alpha=1),
+                    whiskerprops=dict(color='black', linewidth=1.5),
+                    capprops=dict(color='black', linewidth=1.5),
+                    flierprops=dict(marker='', alpha=0)))
+
+        # === Swarmplot (centered, deterministic beeswarm between box and violin) ===
+        # The gap is narrow: the markers shrink down to half of point_size to fit it
+        if grouped is not None:
+            with stage('swarm', ax):
+                artists['swarm'] = swarm_scatter(ax, grouped, swarm_palette, point_size=point_size,
+                                                 width=2 * bias, max_points=max_points,
+                                                 min_point_size=point_size / 2, zorder=10, alpha=0.9)
+        update_groups = functools.partial(_update_groups, bias=bias, widths=widths,
+                                          kde_grid_size=kde_grid_size, kde_tol=kde_tol)
 
     # === Optionally connect pairs between consecutive groups ===
-    if connect_pairs:
-        for i in range(n_groups - 1):
-            if len(swarm_y[i]) == len(swarm_y[i+1]):
-                for y1, y2 in zip(swarm_y[i], swarm_y[i+1]):
-                    ax.plot([i, i+1], [y1, y2], color='gray', alpha=0.4, linewidth=1)
-            else:
-                print(f"⚠️ Cannot connect pairs between '{labels[i]}' and '{labels[i+1]}': different lengths.")
-
-    # === Compute significance tests ===
-    pairs = [(labels[i], labels[j]) for i in range(len(labels)) for j in range(i+1, len(labels))]
-    (miny, maxy) = ax.get_ylim()
-    y_increment = 0.1 * (maxy - miny)
-    yposition = maxy
-    
-    h = 0
-    if show_p_values:
-        for pair in pairs:
-            group1 = df_all[df_all['label'] == pair[0]]['value']
-            group2 = df_all[df_all['label'] == pair[1]]['value']
-
-            stat_test = stats.ranksums(group1, group2)
-            p_value = stat_test.pvalue
-            
-            if p_value < 1e-5:
-                significance_asterisks = '*****'
-            elif p_value < 1e-4:
-                significance_asterisks = '****'
-            elif p_value < 1e-3:
-                significance_asterisks = '***'
-            elif p_value < 1e-2:
-                significance_asterisks = '**'
-            elif p_value < 0.05:
-                significance_asterisks = '*'
-            else:
-                significance_asterisks = '(n.s.)'
-
-            x_start = labels.index(pair[0])
-            x_end = labels.index(pair[1])
-            y = yposition * 1.0
-            h = df_all['value'].max() * 0.01
-            ax.plot([x_start, x_start, x_end, x_end], 
-                    [y, y + h, y + h, y-h], 
-                    color='black', lw=1.5, zorder=20)
-            ax.text((x_start + x_end) / 2, y + h * 1.05, significance_asterisks,
-                ha='center', va='bottom', fontsize=14, color='black')
-            ax.set_ylim(top=y + h * 2)
-            yposition += y_increment
+    if connect_pairs and grouped is not None:
+        with stage('connect_pairs', ax):
+            artists['connect_pairs'] = connect_pairs_collection(ax, grouped, labels)
+
+    if grouped is not None:
+        # Fraction of the points drawn of each downsampled group
+        sample_legend(ax, artists['swarm'] if not single_collection else [artists['swarm']], labels)
+
+    # === Compute significance tests, then the y limits ===
+    handle = PlotHandle(ax, grouped, keys, artists, update_groups)
+    handle.annotate(show_p_values and grouped is not None, test, test_kws, pairs, significant_only,
+                    y_min, y_max, pad=5)
 
     # === Labels and formatting ===
     ax.set_xlim(-0.5 - bias/2, n_groups - 0.5 + bias/2)
@@ -142,21 +150,158 @@ def plot_half_violin_box_swarm(ax, dataset, labels,
     ax.set_title(plot_title)
     ax.set_xlabel('')
 
-    # Update axis limits
-    if y_max is None:
-        y_max = yposition
-    else:
-        y_max = max(y_max, yposition)
-    ax.set_ylim(y_min, y_max + 5*h)
-
     if h_line is not None:
-        ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.5)
+        artists['h_line'] = ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.5)
 
     if ygrid:
         ax.grid(axis='y')
         ax.set_axisbelow(True)
 
+    # Per-Axes fonts and ticks instead of sns.set_context; None keeps rcParams
+    if font_scale is not None:
+        apply_context(ax, plotting_context(font_scale))
+
     if saveplot:
-        plt.savefig(filename + '.png', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.pdf', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.svg', bbox_inches='tight', dpi=dpi)
+        save_figure(ax, filename, formats=save_formats, dpi=dpi,
+                    rasterize_above=rasterize_above)
+
+    return handle
+
+
+def _clip_half(body):
+    """Keep the right half of a violin body drawn by ax.violin."""
+    if not body.get_paths():
+        # Empty group (e.g. a panel of plot_facets without samples of it)
+        return
+    vertices = body.get_paths()[0].vertices
+    m = np.mean(vertices[:, 0])
+    vertices[:, 0] = np.clip(vertices[:, 0], m, np.inf)
+
+
+def _update_groups(handle, changed, bias, widths, kde_grid_size, kde_tol):
+    """Move the half-violin, box, swarm and paired lines of the changed groups of plot_half_violin_box_swarm."""
+    grouped, keys, artists = handle.grouped, handle.keys, handle.artists
+    with stage('box_statistics'):
+        summaries = {i: cached_box_summary(grouped[i], key=keys[i]) for i in changed}
+    with stage('kde'):
+        violin_stats = cached_violin_stats([grouped[i] for i in changed], [keys[i] for i in changed],
+                                           grid_size=kde_grid_size, tol=kde_tol)
+    with stage('violins', handle.ax):
+        for i, stats in zip(changed, violin_stats):
+            # Scaled as ax.violin(widths=0.6) scales them
+            vals = np.asarray(stats['vals'])
+            if len(vals) > 0:
+                vals = 0.5 * 0.6 * vals / vals.max()
+            set_betweenx(artists['violins'][i], stats['coords'], i + bias - vals, i + bias + vals)
+            _clip_half(artists['violins'][i])
+    with stage('boxes', handle.ax):
+        for i in changed:
+            update_box(artists['boxes'][i], summaries[i], i - bias - widths/2, widths)
+    with stage('swarm', handle.ax):
+        for i in changed:
+            artists['swarm'][i].set_values(grouped[i])
+        sample_legend(handle.ax, artists['swarm'], grouped.labels)
+    if 'connect_pairs' in artists:
+        with stage('connect_pairs', handle.ax):
+            artists['connect_pairs'] = update_connect_pairs(handle.ax, artists['connect_pairs'], grouped,
+                                                            grouped.labels)
+
+
+def _composite_geometry(summaries, violin_stats, bias, widths):
+    """
+    Polygons and line segments of every group, computed at once.
+
+    Returns the half-violins then the boxes (as polygons), and the lower and
+    upper whiskers, lower and upper caps and medians (as (5k, 2, 2) segments).
+    """
+    k = len(summaries)
+    q1, q3, med, whislo, whishi = (np.array([s[name] for s in summaries], dtype=float)
+                                   for name in ('q1', 'q3', 'med', 'whislo', 'whishi'))
+    # Boxes left of the group position, as ax.bxp draws them
+    center = np.arange(k) - bias - widths/2
+    left, right = center - widths/2, center + widths/2
+    boxes = np.stack([np.column_stack(corner) for corner in
+                      ((left, q1), (right, q1), (right, q3), (left, q3))], axis=1)
+    cap_left, cap_right = center - widths/4, center + widths/4
+    segments = np.concatenate([
+        np.stack([np.column_stack((center, q1)), np.column_stack((center, whislo))], axis=1),
+        np.stack([np.column_stack((center, q3)), np.column_stack((center, whishi))], axis=1),
+        np.stack([np.column_stack((cap_left, whislo)), np.column_stack((cap_right, whislo))], axis=1),
+        np.stack([np.column_stack((cap_left, whishi)), np.column_stack((cap_right, whishi))], axis=1),
+        np.stack([np.column_stack((left, med)), np.column_stack((right, med))], axis=1),
+    ])
+
+    polygons = []
+    for i, stats in enumerate(violin_stats or []):
+        # Right half of the violin ax.violin(widths=0.6) would draw at i + bias
+        vals = np.asarray(stats['vals'], dtype=float)
+        coords = np.asarray(stats['coords'], dtype=float)
+        if vals.size == 0:
+            polygons.append(np.full((1, 2), np.nan))
+            continue
+        span = 0.5 * 0.6 * vals / vals.max()
+        polygons.append(np.concatenate((np.column_stack((np.full(coords.size, i + bias), coords)),
+                                        np.column_stack((i + bias + span, coords))[::-1])))
+    polygons.extend(boxes)
+    return polygons, segments
+
+
+def _draw_collections(ax, summaries, violin_stats, grouped, violin_palette, box_palette, swarm_palette,
+                      bias, widths, point_size, max_points=None):
+    """Draw every group as one polygon collection, one line collection and one swarm scatter."""
+    from matplotlib.collections import LineCollection, PolyCollection
+    from matplotlib.colors import to_rgba_array
+
+    from functions_swarm_collection_v0 import SwarmCollection
+
+    k = len(summaries)
+    polygons, segments = _composite_geometry(summaries, violin_stats, bias, widths)
+    n_violins = len(polygons) - k
+    # Half-violins without outline, then boxes with a black outline, all at half opacity
+    facecolors = np.concatenate((to_rgba_array(violin_palette[:n_violins]), to_rgba_array(box_palette[:k])))
+    facecolors[:, 3] = 0.5
+    edgecolors = np.zeros((len(polygons), 4))
+    edgecolors[n_violins:, 3] = 0.5
+    polys = PolyCollection(polygons, closed=True, facecolors=facecolors, edgecolors=edgecolors,
+                           linewidths=[1.0] * n_violins + [1.5] * k, zorder=2)
+    ax.add_collection(polys)
+
+    # Black whiskers and caps, medians in the box colour
+    colors = np.concatenate((np.tile(to_rgba_array('black'), (4 * k, 1)), to_rgba_array(box_palette[:k])))
+    lines = LineCollection(segments, colors=colors, linewidths=[1.5] * (4 * k) + [2.0] * k,
+                           capstyle='projecting', zorder=2.1)
+    ax.add_collection(lines)
+    artists = {'polygons': polys, 'lines': lines}
+
+    if grouped is not None:
+        swarm = SwarmCollection(grouped.values, np.repeat(np.arange(k), grouped.sizes), point_size=point_size,
+                                width=2 * bias, max_points=max_points, min_point_size=point_size / 2,
+                                facecolors=to_rgba_array(swarm_palette[:k])[grouped.codes()],
+                                offset_transform=ax.transData, zorder=10, alpha=0.9)
+        ax.add_collection(swarm)
+        artists['swarm'] = swarm
+    ax.autoscale_view()
+    return artists
+
+
+def _update_collections(handle, changed, bias, widths, swarm_palette, kde_grid_size, kde_tol):
+    """Move the collections of plot_half_violin_box_swarm(single_collection=True) to new samples."""
+    from matplotlib.colors import to_rgba_array
+
+    grouped, keys, artists = handle.grouped, handle.keys, handle.artists
+    # Only the changed groups miss the cache
+    with stage('box_statistics'):
+        summaries = [cached_box_summary(g, key=key) for g, key in zip(grouped, keys)]
+    with stage('kde'):
+        violin_stats = cached_violin_stats(grouped, keys, grid_size=kde_grid_size, tol=kde_tol)
+    with stage('collections', handle.ax):
+        polygons, segments = _composite_geometry(summaries, violin_stats, bias, widths)
+        artists['polygons'].set_verts(polygons)
+        artists['lines'].set_segments(segments)
+        artists['swarm'].set_values(grouped.values, np.repeat(np.arange(len(grouped)), grouped.sizes),
+                                    facecolors=to_rgba_array(swarm_palette[:len(grouped)])[grouped.codes()])
+        sample_legend(handle.ax, [artists['swarm']], grouped.labels)
+    if 'connect_pairs' in artists:
+        with stage('connect_pairs', handle.ax):
+            artists['connect_pairs'] = update_connect_pairs(handle.ax, artists['connect_pairs'], grouped,
+                                                            grouped.labels)
@@ -1,8 +1,19 @@
-import pandas as pd
-import seaborn as sns
-import scipy.stats as stats
-import matplotlib.pyplot as plt
-
+from functions_cache_v0 import cached_box_summary, cached_pairwise_tests, group_key
+from functions_drawing_v0 import (connect_pairs_collection, resolve_palette, summary_boxes, update_box,
+                                  update_connect_pairs)
+from functions_export_v0 import DEFAULT_FORMATS, RASTERIZE_POINTS, save_figure
+from functions_grouped_v0 import GroupedData
+from functions_handle_v0 import PlotHandle
+from functions_lazy_v0 import lazy_import
+from functions_profile_v0 import profiled, stage
+from functions_stats_v0 import significance_asterisks
+from functions_style_v0 import apply_context, plotting_context
+from functions_summary_v0 import summarize_groups
+from functions_swarm_v0 import sample_legend, swarm_scatter
+
+plt = lazy_import('matplotlib.pyplot')
+
+@profiled
 def plot_boxes_W_N3(ax, data,
                  font_scale=1.4,
                  metric='metric?',
@@ -12,76 +23,85 @@ def plot_boxes_W_N3(ax, data,
                  legends=True,
                  saveplot=0,
                  filename='filename',
-                 dpi=300):
-
-    sns.set_context('notebook', font_scale=font_scale)
+                 dpi=300,
+                 save_formats=DEFAULT_FORMATS,
+                 rasterize_above=RASTERIZE_POINTS,
+                 test='ranksums',
+                 test_kws=None,
+                 max_points=None):
 
     box_palette = {'W': '#FFE994', 'N3': '#9BDDF9'}
     swarmplot_palette = {'W': '#FF6600', 'N3': '#2A7FFF'}
 
-    sns.boxplot(y="value", x="cond", data=data, linewidth=1.5, hue="cond",
-                palette=box_palette, saturation=1.0, showmeans=True, meanline=True,
-                legend=False, meanprops=dict(linestyle='dashed', color='gray', linewidth=2),
-                medianprops=dict(linestyle=None, linewidth=2), ax=ax)
-
-    sns.swarmplot(y="value", x="cond", data=data, s=point_size,
-                  palette=swarmplot_palette, hue="cond", legend=False, ax=ax)
-
-    # Optional: connect i-th elements
-    if connect_pairs:
-        group_W = data[data['cond'] == 'W']['value'].to_numpy()
-        group_N3 = data[data['cond'] == 'N3']['value'].to_numpy()
-        if len(group_W) == len(group_N3):
-            for y1, y2 in zip(group_W, group_N3):
-                ax.plot([0, 1], [y1, y2], color='gray', alpha=0.4, linewidth=1)
+    # `data` is long-form, or {'W': ..., 'N3': ...} with samples, summaries or
+    # out-of-core groups (chunk iterators, memmaps)
+    summaries = None
+    grouped = None
+    swarms = []
+    with stage('group_data'):
+        if isinstance(data, dict):
+            summaries = summarize_groups([data['W'], data['N3']])
+            if summaries is None:
+                grouped = GroupedData.from_dataset([data['W'], data['N3']], ['W', 'N3'])
         else:
-            print("⚠️ Cannot connect pairs: groups have different lengths.")
-
-    # Calculate means #############################
-    means = data.groupby("cond")["value"].mean()
-    means = means.iloc[::-1]
-    datax0W = data[data["cond"] == "W"]
-    datax0N = data[data["cond"] == "N3"]
-    dataxW = datax0W[["value"]].to_numpy()
-    dataxN = datax0N[["value"]].to_numpy()
-    datax = [dataxW, dataxN]
+            # Split the groups once; every stage below slices into it
+            grouped = GroupedData.from_frame(data, value='value', group='cond', order=['W', 'N3'])
+    if grouped is not None:
+        with stage('box_statistics'):
+            # Content hash of each group: its statistics are reused from the cache on re-renders
+            keys = [group_key(g) for g in grouped]
+            summaries = [cached_box_summary(g, key=key) for g, key in zip(grouped, keys)]
+
+    # Drawn like sns.boxplot, from the (cached) statistics
+    with stage('boxes', ax):
+        summary_boxes(ax, summaries, resolve_palette(box_palette, 2, ['W', 'N3']),
+                      linewidth=1.5, showmeans=True, meanline=True,
+                      meanprops=dict(linestyle='dashed', color='gray', linewidth=2),
+                      medianprops=dict(linewidth=2))
+
+    if grouped is not None:
+        # Deterministic beeswarm, laid out at draw time
+        with stage('swarm', ax):
+            swarms = swarm_scatter(ax, grouped, resolve_palette(swarmplot_palette, 2, grouped.labels),
+                                   point_size=point_size, max_points=max_points)
+
+        # Optional: connect i-th elements
+        if connect_pairs:
+            with stage('connect_pairs', ax):
+                connect_pairs_collection(ax, grouped, ['W', 'N3'])
+    elif connect_pairs:
+        print("⚠️ Cannot connect pairs: the groups are summaries, not samples.")
 
     if legends:
         handles, labels = ax.get_legend_handles_labels()
-        ax.legend(loc='lower left')
-
-    # Calculate statistical significance between 'W' and 'N3' groups ###############
-    stat_test = stats.ranksums(data[data['cond'] == 'W']['value'], data[data['cond'] == 'N3']['value'])
-    # Calculate significance level (adjust p-value if necessary)
-    p_value = stat_test.pvalue
-    if p_value < 0.00001:
-        significance_asterisks = '*****'
-    elif p_value < 0.0001:
-        significance_asterisks = '****'
-    elif p_value < 0.001:
-        significance_asterisks = '***'
-    elif p_value < 0.01:
-        significance_asterisks = '**'
-    elif p_value < 0.05:
-        significance_asterisks = '*'
-    else:
-        significance_asterisks = '(n.s.)'
-
-    # Add a bar or bracket between the box plots
-    (miny, maxy) = ax.get_ylim()
-    yposition = maxy
-    maxy = maxy + 0.1 * (maxy - miny)
-    ax.set_ylim(miny, maxy)
-    endwidth = (maxy - miny) / 100
-    ax.plot([0, 1], [yposition, yposition], color='black', lw=1.5, zorder=20)  # Adjust the coordinates and style as needed
-    ax.plot([0, 0], [yposition - endwidth, yposition + endwidth], color='black', lw=1.5, zorder=20)
-    ax.plot([1, 1], [yposition - endwidth, yposition + endwidth], color='black', lw=1.5, zorder=20)
-    # Add significance annotation to the plot
-    if p_value < 0.05:
-        ax.annotate(f'{significance_asterisks}', xy=(0.5, yposition + endwidth), ha='center', fontsize=12)
+        # With max_points, the fraction of the points drawn of each downsampled group
+        if sample_legend(ax, swarms, ['W', 'N3']) is None:
+            ax.legend(loc='lower left')
+
+    if grouped is None:
+        print("⚠️ The p-value needs the samples of each group; it is not shown for summaries.")
     else:
-        ax.annotate(f'p = {p_value:.5f} {significance_asterisks}', xy=(0.5, yposition + endwidth), ha='center', fontsize=12)
-    ################################################################################
+        # Calculate statistical significance between 'W' and 'N3' groups ###############
+        with stage('significance'):
+            p_value = cached_pairwise_tests(grouped, keys, test, **(test_kws or {}))[0, 1]
+            asterisks = significance_asterisks(p_value)
+
+        # Add a bar or bracket between the box plots
+        with stage('brackets', ax):
+            (miny, maxy) = ax.get_ylim()
+            yposition = maxy
+            maxy = maxy + 0.1 * (maxy - miny)
+            ax.set_ylim(miny, maxy)
+            endwidth = (maxy - miny) / 100
+            ax.plot([0, 1], [yposition, yposition], color='black', lw=1.5, zorder=20)  # Adjust the coordinates and style as needed
+            ax.plot([0, 0], [yposition - endwidth, yposition + endwidth], color='black', lw=1.5, zorder=20)
+            ax.plot([1, 1], [yposition - endwidth, yposition + endwidth], color='black', lw=1.5, zorder=20)
+            # Add significance annotation to the plot
+            if p_value < 0.05:
+                ax.annotate(f'{asterisks}', xy=(0.5, yposition + endwidth), ha='center', fontsize=12)
+            else:
+                ax.annotate(f'p = {p_value:.5f} {asterisks}', xy=(0.5, yposition + endwidth), ha='center', fontsize=12)
+        ################################################################################
 
     # Change axis labels, ticks, and title
     ax.set_xticks([0, 1])
@@ -94,17 +114,25 @@ def plot_boxes_W_N3(ax, data,
         ax.grid(axis='y')
         ax.set_axisbelow(True)
 
+    # Fonts, ticks and spines of this Axes only (no global sns.set_context);
+    # None keeps the styling of rcParams
+    if font_scale is not None:
+        apply_context(ax, plotting_context(font_scale))
+
     if saveplot == 1:
-        # Save plots
-        plt.savefig(filename + '.pdf', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.svg', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.png', bbox_inches='tight', dpi=dpi)
-        plt.tight_layout()
-        plt.show()
+        # Save plots (formats written in parallel from the figure that owns ax)
+        save_figure(ax, filename, formats=save_formats, dpi=dpi,
+                    rasterize_above=rasterize_above)
+        ax.figure.tight_layout()
+        # Only figures of pyplot's registry are shown; not those made with
+        # matplotlib.figure.Figure (e.g. render_batch(threads=True))
+        if ax.figure.canvas.manager is not None:
+            plt.show()
 
 
 ###########################################################
 
+@profiled
 def plot_boxes_generalized(ax, dataset, labels,
                            y_min=None, y_max=None,
                            h_line=None,
@@ -118,84 +146,60 @@ def plot_boxes_generalized(ax, dataset, labels,
                            connect_pairs=False,
                            saveplot=False,
                            filename='filename',
-                           dpi=300):
-
-    sns.set_context('notebook', font_scale=font_scale)
-
-    all_data = []
-    for data, label in zip(dataset, labels):
-        temp_df = pd.DataFrame(data, columns=['value'])
-        temp_df['cond'] = label
-        all_data.append(temp_df)
-    data = pd.concat(all_data, ignore_index=True)
-
-    if box_palette is None:
-        box_palette = sns.color_palette("deep")[0:len(dataset)]
-    if swarmplot_palette is None:
-        swarmplot_palette = sns.color_palette("deep")[0:len(dataset)]
-
-    sns.boxplot(y="value", x="cond", data=data, linewidth=1.5, hue="cond",
-                palette=box_palette, saturation=1.0, showmeans=True, meanline=True,
-                legend=False, boxprops=dict(alpha=0.5),
-                meanprops=dict(linestyle='dashed', color='gray', linewidth=2),
-                medianprops=dict(linestyle=None, linewidth=2), ax=ax, order=labels)
-
-    sns.swarmplot(y="value", x="cond", data=data, s=point_size,
-                  palette=swarmplot_palette, hue="cond", legend=False, ax=ax, order=labels)
-
-    # Optional: connect i-th elements between consecutive groups
-    if connect_pairs:
-        for i in range(len(labels) - 1):
-            g1 = data[data['cond'] == labels[i]]['value'].to_numpy()
-            g2 = data[data['cond'] == labels[i+1]]['value'].to_numpy()
-            if len(g1) == len(g2):
-                for y1, y2 in zip(g1, g2):
-                    ax.plot([i, i+1], [y1, y2], color='gray', alpha=0.4, linewidth=1)
-            else:
-                print(f"⚠️ Cannot connect pairs between '{labels[i]}' and '{labels[i+1]}': different lengths.")
-
-    # Compute significance for each pair of conditions
-    pairs = [(labels[i], labels[j]) for i in range(len(labels)) for j in range(i+1, len(labels))]
-    (miny, maxy) = ax.get_ylim()
-    y_increment = 0.1 * (maxy - miny)
-    yposition = maxy
-
-    h=0
-    if show_p_values:
-        for pair in pairs:
-            group1 = data[data['cond'] == pair[0]]['value']
-            group2 = data[data['cond'] == pair[1]]['value']
-
-            # Perform statistical test
-            stat_test = stats.ranksums(group1, group2)
-            p_value = stat_test.pvalue
-
-            # Determine significance level
-            if p_value < 1e-5:
-                significance_asterisks = '*****'
-            elif p_value < 1e-4:
-                significance_asterisks = '****'
-            elif p_value < 1e-3:
-                significance_asterisks = '***'
-            elif p_value < 1e-2:
-                significance_asterisks = '**'
-            elif p_value < 0.05:
-                significance_asterisks = '*'
-            else:
-                significance_asterisks = '(n.s.)'
-
-            # Add significance bar and annotation
-            x_start = labels.index(pair[0])
-            x_end = labels.index(pair[1])
-            y = yposition * 1.0
-            h = data['value'].max() * 0.01
-            ax.plot([x_start, x_start, x_end, x_end], 
-                    [y, y + h, y + h, y-h], 
-                    color='black', lw=1.5, zorder=20)
-            ax.text((x_start + x_end) / 2, y + h * 1.05, significance_asterisks,
-                ha='center', va='bottom', fontsize=14, color='black')
-            ax.set_ylim(top=y + h * 2)
-            yposition += y_increment
+                           dpi=300,
+                           save_formats=DEFAULT_FORMATS,
+                           rasterize_above=RASTERIZE_POINTS,
+                           test='ranksums',
+                           test_kws=None,
+                           pairs=None,
+                           significant_only=False,
+                           max_points=None):
+
+    # Precomputed summaries or out-of-core groups (chunk iterators, memmaps): boxes from statistics
+    grouped = None
+    keys = None
+    with stage('group_data'):
+        summaries = summarize_groups(dataset)
+        if summaries is None:
+            # Contiguous values + group offsets
+            grouped = GroupedData.from_dataset(dataset, labels)
+    if grouped is not None:
+        with stage('box_statistics'):
+            # Content hash of each group: its statistics are reused from the cache on re-renders
+            keys = [group_key(g) for g in grouped]
+            summaries = [cached_box_summary(g, key=key) for g, key in zip(grouped, keys)]
+
+    # Drawn like sns.boxplot, from the (cached) statistics
+    with stage('boxes', ax):
+        boxes = summary_boxes(ax, summaries, resolve_palette(box_palette, len(labels), labels),
+                              linewidth=1.5, showmeans=True, meanline=True, boxprops=dict(alpha=0.5),
+                              meanprops=dict(linestyle='dashed', color='gray', linewidth=2),
+                              medianprops=dict(linewidth=2))
+    # Kept by the returned handle, to move them when the data change
+    artists = {'boxes': boxes}
+
+    if grouped is not None:
+        # Deterministic beeswarm, laid out at draw time
+        with stage('swarm', ax):
+            artists['swarm'] = swarm_scatter(ax, grouped,
+                                             resolve_palette(swarmplot_palette, len(labels), labels),
+                                             point_size=point_size, max_points=max_points)
+            # Fraction of the points drawn of each downsampled group
+            sample_legend(ax, artists['swarm'], labels)
+
+        # Optional: connect i-th elements between consecutive groups (one LineCollection)
+        if connect_pairs:
+            with stage('connect_pairs', ax):
+                artists['connect_pairs'] = connect_pairs_collection(ax, grouped, labels)
+    elif connect_pairs:
+        print("⚠️ Cannot connect pairs: the groups are summaries, not samples.")
+
+    # Compute significance for each selected pair of conditions (all by default), then the y limits
+    handle = PlotHandle(ax, grouped, keys, artists, _update_groups)
+    if show_p_values and grouped is None:
+        print("⚠️ p-values need the samples of each group; they are not shown for summaries.")
+    handle.annotate(show_p_values and grouped is not None, test, test_kws, pairs, significant_only,
+                    y_min, y_max, pad=6)
 
     # Change axis labels, ticks, and title
     ax.set_xlabel('')
@@ -204,23 +208,40 @@ def plot_boxes_generalized(ax, dataset, labels,
     ax.set_xticklabels(labels)
     ax.set_title(plot_title)
 
-    # Update axis limits
-    if y_max is None:
-        y_max = yposition
-    else:
-        y_max = max(y_max, yposition)
-    ax.set_ylim(y_min, y_max+6*h)
-
     # Plot horizontal line
     if h_line is not None:
-        ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.75)
+        artists['h_line'] = ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.75)
 
     # Add horizontal grid
     if ygrid:
         ax.grid(axis='y')
         ax.set_axisbelow(True)
 
+    # Fonts, ticks and spines of this Axes only (no global sns.set_context), so figures can be
+    # built in several threads at once; None keeps the styling of rcParams
+    if font_scale is not None:
+        apply_context(ax, plotting_context(font_scale))
+
     if saveplot:
-        plt.savefig(filename + '.pdf', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.svg', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.png', bbox_inches='tight', dpi=dpi)
+        save_figure(ax, filename, formats=save_formats, dpi=dpi,
+                    rasterize_above=rasterize_above)
+
+    return handle
+
+
+def _update_groups(handle, changed):
+    """Move the box, swarm and paired lines of the changed groups of plot_boxes_generalized."""
+    grouped, keys, artists = handle.grouped, handle.keys, handle.artists
+    with stage('box_statistics'):
+        summaries = {i: cached_box_summary(grouped[i], key=keys[i]) for i in changed}
+    with stage('boxes', handle.ax):
+        for i in changed:
+            update_box(artists['boxes'][i], summaries[i], i)
+    with stage('swarm', handle.ax):
+        for i in changed:
+            artists['swarm'][i].set_values(grouped[i])
+        sample_legend(handle.ax, artists['swarm'], grouped.labels)
+    if 'connect_pairs' in artists:
+        with stage('connect_pairs', handle.ax):
+            artists['connect_pairs'] = update_connect_pairs(handle.ax, artists['connect_pairs'], grouped,
+                                                            grouped.labels)
@@ -0,0 +1,171 @@
+import numpy as np
+
+from functions_export_v0 import keep_vector
+
+def select_pairs(pairs, labels):
+    """
+    Normalise a selection of pairs of groups to sorted (i, j) index pairs with i < j.
+
+    Parameters
+    ----------
+    pairs : None or list of pairs
+        None selects every pair. A pair is two group labels or two indices
+        (a value that is a label is read as the label).
+    labels : list
+        Group labels, in plotting order.
+    """
+    k = len(labels)
+    if pairs is None:
+        return [(i, j) for i in range(k) for j in range(i + 1, k)]
+    positions = {label: i for i, label in enumerate(labels)}
+    selected = []
+    for pair in pairs:
+        if len(pair) != 2:
+            raise ValueError(f"A pair must have two groups, but got {pair!r}")
+        a, b = (positions[g] if g in positions else g for g in pair)
+        if not all(isinstance(g, (int, np.integer)) and 0 <= g < k for g in (a, b)) or a == b:
+            raise ValueError(f"{pair!r} is not a pair of two different groups among {list(labels)}")
+        pair = (min(a, b), max(a, b))
+        if pair not in selected:
+            selected.append(pair)
+    return selected
+
+
+def pack_brackets(pairs):
+    """
+    Row of each bracket, packing brackets that do not overlap into shared rows.
+
+    The brackets are placed from the shortest to the longest, each in the
+    lowest row that is above every bracket nested inside it and where it
+    overlaps (or touches) no other bracket. Nested brackets therefore never
+    cross, and adjacent pairs share two rows instead of taking one each.
+
+    Parameters
+    ----------
+    pairs : list of (int, int)
+        x positions of the two ends of each bracket, smallest first.
+
+    Returns
+    -------
+    list of int
+        Row of each bracket, from 0 (lowest), in the order of `pairs`.
+    """
+    if not pairs:
+        return []
+    starts, ends = np.asarray(pairs).T
+    rows = np.full(len(pairs), -1)
+    for index in np.lexsort((starts, ends - starts)):
+        start, end = starts[index], ends[index]
+        placed = rows >= 0
+        # Above the brackets it contains, which are shorter and so already placed
+        inside = placed & (starts >= start) & (ends <= end)
+        row = rows[inside].max() + 1 if inside.any() else 0
+        taken = set(rows[placed & (starts <= end) & (ends >= start)].tolist())
+        while row in taken:
+            row += 1
+        rows[index] = row
+    return rows.tolist()
+
+
+def draw_brackets(ax, pairs, texts, base, row_height, h, color='black', linewidth=1.5,
+                  fontsize=14, zorder=20):
+    """
+    Draw significance brackets with their annotations, all lines as one LineCollection.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    pairs : list of (int, int)
+        x positions of the two ends of each bracket.
+    texts : list of str
+        Annotation of each bracket (e.g. significance_asterisks).
+    base : float
+        y of the lowest row.
+    row_height : float
+        Distance between rows.
+    h : float
+        Height of the bracket legs.
+    color, linewidth, fontsize, zorder :
+        Style of the brackets and annotations.
+
+    Returns
+    -------
+    n_rows : int
+        Number of rows used.
+    lines : matplotlib.collections.LineCollection or None
+        The brackets (None when there are no pairs).
+    annotations : list of matplotlib.text.Text
+        The annotation of each bracket.
+    """
+    from matplotlib.collections import LineCollection
+
+    if not pairs:
+        return 0, None, []
+    rows = pack_brackets(pairs)
+    # Vector in exports even when there are many of them
+    lines = keep_vector(LineCollection(bracket_segments(pairs, rows, base, row_height, h),
+                                       colors=color, linewidths=linewidth, zorder=zorder))
+    ax.add_collection(lines)
+    annotations = [ax.text(x, y, text, ha='center', va='bottom', fontsize=fontsize, color=color)
+                   for (x, y), text in zip(_text_positions(pairs, rows, base, row_height, h), texts)]
+    return max(rows) + 1, lines, annotations
+
+
+def update_brackets(ax, brackets, pairs, texts, base, row_height, h, color='black', fontsize=14,
+                    **kwargs):
+    """
+    Move the brackets returned by draw_brackets to new pairs, texts and heights, in place.
+
+    The line collection and the annotations are reused; annotations are only
+    added or removed when the number of brackets changes.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes the brackets are drawn on.
+    brackets : tuple
+        (n_rows, lines, annotations), as returned by draw_brackets or by this function.
+    pairs, texts, base, row_height, h, color, fontsize, **kwargs :
+        As in draw_brackets.
+
+    Returns
+    -------
+    tuple
+        (n_rows, lines, annotations), as draw_brackets.
+    """
+    _, lines, annotations = brackets
+    if lines is None:
+        return draw_brackets(ax, pairs, texts, base, row_height, h, color=color, fontsize=fontsize,
+                             **kwargs)
+    rows = pack_brackets(pairs)
+    lines.set_segments(bracket_segments(pairs, rows, base, row_height, h) if pairs else [])
+    for annotation in annotations[len(pairs):]:
+        annotation.remove()
+    annotations = annotations[:len(pairs)]
+    for index, ((x, y), text) in enumerate(zip(_text_positions(pairs, rows, base, row_height, h), texts)):
+        if index < len(annotations):
+            annotations[index].set_position((x, y))
+            annotations[index].set_text(text)
+        else:
+            annotations.append(ax.text(x, y, text, ha='center', va='bottom', fontsize=fontsize,
+                                       color=color))
+    return (max(rows) + 1 if rows else 0), lines, annotations
+
+
+def bracket_segments(pairs, rows, base, row_height, h):
+    """(n, 4, 2) array of the vertices of each bracket, in the given rows."""
+    y = base + np.asarray(rows) * row_height
+    x = np.asarray(pairs, dtype=float)
+    # Left leg up, bar, right leg down to below the bar (as the brackets were always drawn)
+    return np.stack([
+        np.column_stack((x[:, 0], y)),
+        np.column_stack((x[:, 0], y + h)),
+        np.column_stack((x[:, 1], y + h)),
+        np.column_stack((x[:, 1], y - h)),
+    ], axis=1)
+
+
+def _text_positions(pairs, rows, base, row_height, h):
+    return [((x_start + x_end) / 2, base + row * row_height + h * 1.05)
+            for (x_start, x_end), row in zip(pairs, rows)]
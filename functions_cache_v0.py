@@ -0,0 +1,226 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from functions_kde_v0 import binned_kde, violin_stats
+from functions_resampling_v0 import pairwise_bootstrap, pairwise_permutation
+from functions_stats_v0 import pairwise_ranksums
+from functions_summary_v0 import box_summary
+
+class StatsCache:
+    """
+    Size-bounded LRU cache of computed statistics, keyed by the content of the data.
+
+    Keys start with the hash of each group involved (see group_key), so a
+    re-render with new palettes, titles or font_scale finds the statistics of
+    unchanged groups, whatever array objects hold them.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Approximate bound on the memory held by the cached values. The least
+        recently used entries are evicted first; 0 disables the cache.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Return the value cached under `key`, or compute(), store and return it."""
+        value = self.lookup(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def lookup(self, key, default=None):
+        """Return the value cached under `key` (marking it as recently used), or `default`."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        nbytes = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def items(self):
+        """(key, value) pairs of the cached entries, from the least recently used."""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f"StatsCache({len(self)} entries, {self.nbytes / 2 ** 20:.1f} of "
+                f"{self.max_bytes / 2 ** 20:.0f} MiB, {self.hits} hits, {self.misses} misses)")
+
+
+# Shared by all the plotting functions
+STATS_CACHE = StatsCache()
+
+_MISSING = object()
+
+
+def group_key(values):
+    """Hash of the contents (values, dtype and shape) of one group."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.sha1(memoryview(values.reshape(-1)).cast('B'), usedforsecurity=False)
+    digest.update(f'{values.dtype.str}{values.shape}'.encode())
+    return digest.hexdigest()
+
+
+def cached_box_summary(values, whis=1.5, key=None, cache=STATS_CACHE):
+    """box_summary of one group, cached by content. `key` is its group_key, if already known."""
+    key = group_key(values) if key is None else key
+    return cache.get(('box', key, whis), lambda: box_summary(values, whis))
+
+
+def cached_kde(values, key=None, cache=STATS_CACHE, **kde_kws):
+    """binned_kde of one group, cached by content and KDE parameters."""
+    key = group_key(values) if key is None else key
+    return cache.get(('kde', key, tuple(sorted(kde_kws.items()))), lambda: binned_kde(values, **kde_kws))
+
+
+def cached_violin_stats(groups, keys=None, cache=STATS_CACHE, **kde_kws):
+    """violin_stats of every group, each cached by content and KDE parameters."""
+    keys = [group_key(g) for g in groups] if keys is None else keys
+    params = tuple(sorted(kde_kws.items()))
+    return [cache.get(('violin', key, params), lambda g=g: violin_stats([g], **kde_kws)[0])
+            for g, key in zip(groups, keys)]
+
+
+def cached_pairwise_ranksums(groups, keys=None, cache=STATS_CACHE):
+    """
+    pairwise_ranksums with every pair cached by the contents of its two groups.
+
+    Only the groups involved in pairs missing from the cache are tested, so
+    changing one group recomputes the pairs it belongs to.
+    """
+    keys = [group_key(g) for g in groups] if keys is None else keys
+    k = len(keys)
+    p_values = np.ones((k, k))
+    missing = set()
+    for i in range(k):
+        for j in range(i + 1, k):
+            p_value = cache.lookup(('ranksums', keys[i], keys[j]), _MISSING)
+            if p_value is _MISSING:
+                missing.update((i, j))
+            else:
+                p_values[i, j] = p_values[j, i] = p_value
+
+    if missing:
+        involved = sorted(missing)
+        sub = pairwise_ranksums([groups[i] for i in involved])
+        for a, i in enumerate(involved):
+            for b in range(a + 1, len(involved)):
+                j = involved[b]
+                p_values[i, j] = p_values[j, i] = sub[a, b]
+                cache.put(('ranksums', keys[i], keys[j]), float(sub[a, b]))
+    # Groups that cannot be tested are NaN on the diagonal too, as in pairwise_ranksums
+    for i, g in enumerate(groups):
+        g = np.asarray(g, dtype=float)
+        if g.size == 0 or np.isnan(g).any():
+            p_values[i, i] = np.nan
+    return p_values
+
+
+def cached_pairwise_tests(groups, keys=None, test='ranksums', pairs=None, cache=STATS_CACHE, **test_kws):
+    """
+    p-values of every pair of groups with the selected test, each pair cached by content.
+
+    Parameters
+    ----------
+    groups : sequence of array-like
+        The samples of each group (e.g. a GroupedData).
+    keys : list of str, optional
+        group_key of each group, if already computed.
+    test : {'ranksums', 'permutation', 'bootstrap'}
+        Wilcoxon rank-sum test (pairwise_ranksums), permutation test of the
+        difference in means (pairwise_permutation) or percentile bootstrap of
+        it (pairwise_bootstrap).
+    pairs : list of (int, int), optional
+        Pairs to test, i < j; defaults to every pair. The resampling tests
+        leave the other pairs NaN (the rank-sum test covers every pair in one
+        pass anyway).
+    **test_kws :
+        Passed to the permutation or bootstrap engine (paired, n_resamples,
+        seed, max_workers...). They are part of the cache key.
+
+    Returns
+    -------
+    ndarray, shape (k, k)
+        Symmetric matrix of p-values, as pairwise_ranksums returns it.
+    """
+    if test == 'ranksums':
+        if test_kws:
+            raise TypeError(f"The rank-sum test takes no options, but got {sorted(test_kws)}")
+        return cached_pairwise_ranksums(groups, keys, cache)
+    if test not in ('permutation', 'bootstrap'):
+        raise ValueError(f"test must be 'ranksums', 'permutation' or 'bootstrap', but got {test!r}")
+    keys = [group_key(g) for g in groups] if keys is None else keys
+    # The number of workers does not change the result
+    params = tuple(sorted((name, value) for name, value in test_kws.items() if name != 'max_workers'))
+    k = len(keys)
+    if pairs is None:
+        pairs = [(i, j) for i in range(k) for j in range(i + 1, k)]
+    p_values = np.full((k, k), np.nan)
+    np.fill_diagonal(p_values, 1.0)
+    missing = []
+    for i, j in pairs:
+        # The p-value of a pair does not depend on its direction
+        p_value = cache.lookup((test, *sorted((keys[i], keys[j])), params), _MISSING)
+        if p_value is _MISSING:
+            missing.append((i, j))
+        else:
+            p_values[i, j] = p_values[j, i] = p_value
+
+    if missing:
+        if test == 'permutation':
+            computed = pairwise_permutation(groups, pairs=missing, **test_kws)
+        else:
+            computed = pairwise_bootstrap(groups, pairs=missing, **test_kws)[0]
+        for i, j in missing:
+            p_values[i, j] = p_values[j, i] = computed[i, j]
+            cache.put((test, *sorted((keys[i], keys[j])), params), float(computed[i, j]))
+    for i, g in enumerate(groups):
+        g = np.asarray(g, dtype=float)
+        if g.size == 0 or np.isnan(g).any():
+            p_values[i, i] = np.nan
+    return p_values
+
+
+def _nbytes(value):
+    """Approximate memory held by a cached value."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value) + 64
+    return 64
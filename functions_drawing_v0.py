@@ -0,0 +1,387 @@
+import numpy as np
+
+from functions_cache_v0 import cached_box_summary, cached_kde, group_key
+from functions_profile_v0 import stage
+
+# seaborn's "deep" palette, the default colours of the groups (seaborn is only imported for other names)
+DEEP_PALETTE = ('#4c72b0', '#dd8452', '#55a868', '#c44e52', '#8172b3',
+                '#937860', '#da8bc3', '#8c8c8c', '#ccb974', '#64b5cd')
+
+def resolve_palette(palette, n, labels=None):
+    """
+    Turn a palette argument into a list of `n` colours.
+
+    Parameters
+    ----------
+    palette : None, str, list or dict
+        None uses seaborn's "deep" palette (DEEP_PALETTE, cycled beyond 10
+        groups), a string is any seaborn palette name, a list gives the colours in group order and a dict maps each
+        label to its colour.
+    n : int
+        Number of groups.
+    labels : list, optional
+        Group labels, needed when `palette` is a dict.
+    """
+    if palette is None or palette == 'deep':
+        from matplotlib.colors import to_rgb
+
+        return [to_rgb(DEEP_PALETTE[i % len(DEEP_PALETTE)]) for i in range(n)]
+    elif isinstance(palette, str):
+        import seaborn as sns
+
+        return sns.color_palette(palette, n)
+    elif isinstance(palette, dict):
+        return [palette[label] for label in labels]
+    elif isinstance(palette, (list, tuple)):
+        if len(palette) < n:
+            raise ValueError(f"Palette has fewer colors ({len(palette)}) than number of groups ({n})")
+        return list(palette)
+    else:
+        raise TypeError(f"Palette must be a string, list, dict, or None, but got {type(palette)}")
+
+
+
+def auto_linecolor(colors):
+    """Seaborn's automatic outline grey: 60% of the lightness of the darkest colour."""
+    from colorsys import rgb_to_hls
+
+    from matplotlib.colors import to_rgb
+
+    lightness = min(rgb_to_hls(*to_rgb(color))[1] for color in colors) * 0.6
+    return (lightness, lightness, lightness)
+
+def connect_pairs_collection(ax, groups, labels, positions=None,
+                             color='gray', alpha=0.4, linewidth=1, **kwargs):
+    """
+    Join the i-th elements of adjacent groups with straight lines, as one LineCollection.
+
+    The segments of each pair of adjacent groups are built as one (n, 2, 2)
+    array, so the cost grows with the number of points instead of with the
+    number of Line2D artists.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    groups : sequence of array-like
+        Samples of each group (e.g. a GroupedData).
+    labels : list of str
+        Group labels, used in the warning for groups of different lengths.
+    positions : array-like, optional
+        x position of each group. Defaults to 0, 1, ..., k - 1.
+    color, alpha, linewidth :
+        Line style.
+    **kwargs :
+        Passed to matplotlib.collections.LineCollection.
+
+    Returns
+    -------
+    matplotlib.collections.LineCollection or None
+        The collection, or None if no pair of adjacent groups could be joined.
+    """
+    from matplotlib.collections import LineCollection
+
+    segments = _pair_segments(groups, labels, positions)
+    if segments is None:
+        return None
+    lines = LineCollection(segments, colors=color, alpha=alpha, linewidths=linewidth, **kwargs)
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    return lines
+
+
+def update_connect_pairs(ax, lines, groups, labels, positions=None, **kwargs):
+    """
+    Move the lines of connect_pairs_collection to new samples, in place.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes the lines are drawn on.
+    lines : matplotlib.collections.LineCollection or None
+        The collection returned by connect_pairs_collection. When None, the
+        lines are drawn by connect_pairs_collection (with `kwargs`).
+    groups, labels, positions :
+        As in connect_pairs_collection.
+
+    Returns
+    -------
+    matplotlib.collections.LineCollection or None
+        The collection.
+    """
+    if lines is None:
+        return connect_pairs_collection(ax, groups, labels, positions, **kwargs)
+    segments = _pair_segments(groups, labels, positions)
+    lines.set_segments([] if segments is None else segments)
+    return lines
+
+
+def _pair_segments(groups, labels, positions):
+    """(n, 2, 2) segments joining the i-th elements of adjacent groups of equal lengths, or None."""
+    if positions is None:
+        positions = np.arange(len(groups))
+    segments = []
+    for i in range(len(groups) - 1):
+        g1 = np.asarray(groups[i], dtype=float)
+        g2 = np.asarray(groups[i+1], dtype=float)
+        if len(g1) != len(g2):
+            print(f"⚠️ Cannot connect pairs between '{labels[i]}' and '{labels[i+1]}': different lengths.")
+            continue
+        pair_segments = np.empty((len(g1), 2, 2))
+        pair_segments[:, 0, 0] = positions[i]
+        pair_segments[:, 0, 1] = g1
+        pair_segments[:, 1, 0] = positions[i+1]
+        pair_segments[:, 1, 1] = g2
+        segments.append(pair_segments)
+    return np.concatenate(segments) if segments else None
+
+
+def kde_violins(ax, groups, colors, positions=None, width=0.8, linewidth=1.5, linecolor='auto',
+                inner_box=True, kde_grid_size=256, kde_tol=1e-3, keys=None, **kwargs):
+    """
+    Violins drawn like seaborn's violinplot(inner='box'), with densities from binned_kde.
+
+    The densities and quartiles are cached by the content of each group
+    (functions_cache_v0), so re-drawing the same data only draws.
+
+    Each body spans `width` at its own peak density (what sns.violinplot does
+    with hue equal to x) and extends two bandwidths beyond the data.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    groups : sequence of array-like
+        Samples of each group (e.g. a GroupedData).
+    colors : list
+        One fill colour per group.
+    positions : array-like, optional
+        x position of each group. Defaults to 0, 1, ..., k - 1.
+    width : float
+        Maximum width of each violin in data units.
+    linewidth : float
+        Width of the outlines; the inner box is 4.5 times as wide.
+    linecolor : color or 'auto'
+        Colour of the outlines and the inner box. 'auto' uses seaborn's grey,
+        60% of the lightness of the darkest fill colour.
+    inner_box : bool
+        Draw the whiskers, interquartile range and median inside each violin.
+    kde_grid_size, kde_tol :
+        Passed to binned_kde as grid_size and tol.
+    keys : list of str, optional
+        group_key of each group, if already computed.
+    **kwargs :
+        Passed to Axes.fill_betweenx for the bodies (alpha, zorder...).
+
+    Returns
+    -------
+    list of dict
+        The artists of each group: 'bodies' (the PolyCollection, for a group
+        with spread), 'flat' (the line drawn for a group without spread) and
+        'whiskers', 'box', 'median' (the inner box); each a list of zero or
+        one artist.
+    """
+    if positions is None:
+        positions = np.arange(len(groups))
+    if linecolor == 'auto':
+        linecolor = auto_linecolor(colors[:len(groups)])
+
+    with stage('kde'):
+        group_stats, kdes = _violin_statistics(groups, keys, kde_grid_size, kde_tol)
+
+    return [_draw_violin(ax, stats, kde, position, color, width, linewidth, linecolor, inner_box, kwargs)
+            for stats, kde, position, color in zip(group_stats, kdes, positions, colors)]
+
+
+def update_kde_violins(ax, artists, groups, indices, colors, positions=None, width=0.8, linewidth=1.5,
+                       linecolor='auto', inner_box=True, kde_grid_size=256, kde_tol=1e-3, keys=None,
+                       **kwargs):
+    """
+    Move the violins of some groups, drawn by kde_violins, to new samples, in place.
+
+    A group whose violin changes kind (from a body to a flat line, say) has
+    its artists replaced instead.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes the violins are drawn on.
+    artists : list of dict
+        As returned by kde_violins; the entries of `indices` are updated.
+    groups : sequence of array-like
+        Samples of every group.
+    indices : list of int
+        Groups to update.
+    colors, positions, width, linewidth, linecolor, inner_box, kde_grid_size, kde_tol, keys, **kwargs :
+        As given to kde_violins.
+    """
+    if positions is None:
+        positions = np.arange(len(groups))
+    if linecolor == 'auto':
+        linecolor = auto_linecolor(colors[:len(groups)])
+    keys = None if keys is None else [keys[i] for i in indices]
+
+    with stage('kde'):
+        group_stats, kdes = _violin_statistics([groups[i] for i in indices], keys, kde_grid_size, kde_tol)
+
+    for i, stats, kde in zip(indices, group_stats, kdes):
+        violin = artists[i]
+        position = positions[i]
+        drawn = 'bodies' if violin['bodies'] else 'flat' if violin['flat'] else None
+        kind = None if kde is None else 'bodies' if kde[0].size else 'flat'
+        if kind != drawn:
+            for artist in (a for layer in violin.values() for a in layer):
+                artist.remove()
+            artists[i] = _draw_violin(ax, stats, kde, position, colors[i], width, linewidth, linecolor,
+                                      inner_box, kwargs)
+        elif violin['flat']:
+            violin['flat'][0].set_ydata([stats['mean']] * 2)
+        elif violin['bodies']:
+            support, density = kde
+            span = density / density.max() * width / 2
+            set_betweenx(violin['bodies'][0], support, position - span, position + span)
+            if violin['box']:
+                violin['whiskers'][0].set_ydata([stats['whislo'], stats['whishi']])
+                violin['box'][0].set_ydata([stats['q1'], stats['q3']])
+                violin['median'][0].set_ydata([stats['med']])
+
+
+def set_betweenx(body, y, x1, x2):
+    """Move a polygon drawn by Axes.fill_betweenx to new curves, in place."""
+    if hasattr(body, 'set_data'):
+        # FillBetweenPolyCollection (matplotlib >= 3.10) also keeps its data limits
+        body.set_data(y, x1, x2)
+    else:
+        body.set_verts([np.concatenate((np.column_stack((x1, y)), np.column_stack((x2, y))[::-1]))])
+
+
+def _violin_statistics(groups, keys, kde_grid_size, kde_tol):
+    if keys is None:
+        # Content hash: the KDE and quartiles of unchanged groups come from the cache
+        keys = [group_key(values) for values in groups]
+    group_stats = [cached_box_summary(values, key=key) for values, key in zip(groups, keys)]
+    kdes = [cached_kde(values, key=key, grid_size=kde_grid_size, tol=kde_tol)
+            if np.isfinite(stats['med']) else None
+            for values, key, stats in zip(groups, keys, group_stats)]
+    return group_stats, kdes
+
+
+def _draw_violin(ax, stats, kde, position, color, width, linewidth, linecolor, inner_box, kwargs):
+    violin = {'bodies': [], 'flat': [], 'whiskers': [], 'box': [], 'median': []}
+    if kde is None:
+        return violin
+    box_width = linewidth * 4.5
+    support, density = kde
+    if support.size == 0:
+        # No spread: a flat line at the value, as seaborn draws it
+        violin['flat'] = ax.plot([position - width / 2, position + width / 2], [stats['mean']] * 2,
+                                 color=linecolor, linewidth=linewidth)
+        return violin
+    span = density / density.max() * width / 2
+    violin['bodies'] = [ax.fill_betweenx(support, position - span, position + span,
+                                         facecolor=color, edgecolor=linecolor,
+                                         linewidth=linewidth, **kwargs)]
+    if inner_box:
+        # Whiskers at the furthest samples within 1.5 IQR of the box, as in Axes.boxplot
+        violin['whiskers'] = ax.plot([position, position], [stats['whislo'], stats['whishi']],
+                                     color=linecolor, linewidth=box_width / 3)
+        violin['box'] = ax.plot([position, position], [stats['q1'], stats['q3']],
+                                color=linecolor, linewidth=box_width)
+        violin['median'] = ax.plot([position], [stats['med']], marker='_', markersize=box_width / 1.2,
+                                   markeredgewidth=box_width / 5, markeredgecolor='w', markerfacecolor='w',
+                                   color=linecolor)
+    return violin
+
+
+def summary_boxes(ax, stats, colors, positions=None, width=0.8, linewidth=1.5, linecolor='auto',
+                  boxprops=None, medianprops=None, meanprops=None, showmeans=False, meanline=False):
+    """
+    Box plots drawn like seaborn's boxplot, from box statistics instead of samples.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    stats : list of dict
+        Statistics of each group (see functions_summary_v0.summarize_groups).
+    colors : list
+        One fill colour per group.
+    positions : array-like, optional
+        x position of each group. Defaults to 0, 1, ..., k - 1.
+    width : float
+        Box width in data units.
+    linewidth : float
+        Width of the box outlines, whiskers, caps and median.
+    linecolor : color or 'auto'
+        Colour of the lines. 'auto' uses seaborn's grey (see auto_linecolor).
+    boxprops, medianprops, meanprops, showmeans, meanline :
+        As in Axes.bxp; the means are only drawn for groups whose statistics
+        have one.
+
+    Returns
+    -------
+    list of dict
+        The artists of each group, as returned by Axes.bxp.
+    """
+    if positions is None:
+        positions = np.arange(len(stats))
+    if linecolor == 'auto':
+        linecolor = auto_linecolor(colors[:len(stats)])
+    line = dict(color=linecolor, linewidth=linewidth)
+    artists = []
+    for group_stats, position, color in zip(stats, positions, colors):
+        artists.append(ax.bxp(
+            [group_stats], positions=[position], widths=width, capwidths=width / 2,
+            patch_artist=True, manage_ticks=False,
+            showmeans=showmeans and np.isfinite(group_stats.get('mean', np.nan)),
+            meanline=meanline,
+            boxprops={'facecolor': color, 'edgecolor': linecolor, 'linewidth': linewidth, **(boxprops or {})},
+            medianprops={**line, 'solid_capstyle': 'butt', **(medianprops or {})},
+            meanprops=meanprops,
+            whiskerprops={**line, 'solid_capstyle': 'butt'},
+            capprops=line,
+            flierprops={'markeredgecolor': linecolor},
+        ))
+    return artists
+
+
+def update_box(artists, stats, position, width=0.8, capwidth=None):
+    """
+    Move the artists of one box, as returned by Axes.bxp, to new statistics, in place.
+
+    Parameters
+    ----------
+    artists : dict
+        The artists of the box (one group), as returned by Axes.bxp.
+    stats : dict
+        New statistics (see functions_summary_v0.box_summary).
+    position, width :
+        x position and width the box was drawn with.
+    capwidth : float, optional
+        Width of the caps. Defaults to half the box width, as in Axes.bxp.
+    """
+    from matplotlib.path import Path
+
+    if capwidth is None:
+        capwidth = width / 2
+    left, right = position - width / 2, position + width / 2
+    (box,) = artists['boxes']
+    xs, ys = [left, right, right, left, left], [stats['q1'], stats['q1'], stats['q3'], stats['q3'], stats['q1']]
+    if hasattr(box, 'set_path'):
+        box.set_path(Path(np.column_stack((xs, ys)), closed=True))
+    else:
+        box.set_data(xs, ys)
+    whisker_lo, whisker_hi = artists['whiskers']
+    whisker_lo.set_ydata([stats['q1'], stats['whislo']])
+    whisker_hi.set_ydata([stats['q3'], stats['whishi']])
+    cap_lo, cap_hi = artists['caps'] or (None, None)
+    if cap_lo is not None:
+        cap_lo.set_data([position - capwidth / 2, position + capwidth / 2], [stats['whislo']] * 2)
+        cap_hi.set_data([position - capwidth / 2, position + capwidth / 2], [stats['whishi']] * 2)
+    for median in artists['medians']:
+        median.set_ydata([stats['med']] * len(median.get_xdata()))
+    for mean in artists['means']:
+        mean.set_ydata([stats.get('mean', np.nan)] * len(mean.get_xdata()))
+    for fliers in artists['fliers']:
+        values = np.asarray(stats.get('fliers', []), dtype=float)
+        fliers.set_data(np.full(len(values), position, dtype=float), values)
@@ -0,0 +1,214 @@
+import pickle
+import weakref
+
+from functions_profile_v0 import stage
+from functions_workers_v0 import usable_cpus
+
+DEFAULT_FORMATS = ('png', 'pdf', 'svg')
+VECTOR_FORMATS = ('pdf', 'svg', 'svgz', 'eps', 'ps')
+# Collections with more points than this are rasterized in vector exports
+RASTERIZE_POINTS = 5000
+
+# Artists that stay vector whatever their size (e.g. the significance brackets)
+_KEEP_VECTOR = weakref.WeakSet()
+# Pool of the parallel exports, started on the first one and reused afterwards
+_EXPORT_POOL = None
+
+def save_figure(fig, filename, formats=DEFAULT_FORMATS, dpi=300, parallel=None, executor=None,
+                rasterize_above=RASTERIZE_POINTS):
+    """
+    Save a figure in several formats, writing them at the same time in worker processes.
+
+    The tight bounding box is computed once (one layout pass) and reused for
+    every format, so each format is rendered exactly once. With `parallel`,
+    the figure is pickled once and each format is written by its own worker
+    process; figures that cannot be pickled are written one after the other.
+
+    In vector formats (PDF, SVG, EPS), each collection of more than
+    `rasterize_above` points (swarm scatters, connect_pairs lines, violin
+    bodies...) is embedded as an image at `dpi`, while the axes, text and
+    brackets stay vector, so files of tens of thousands of points stay small
+    and quick to write and open.
+
+    Parameters
+    ----------
+    fig : matplotlib.figure.Figure or matplotlib.axes.Axes
+        Figure to save. For an Axes, the figure that owns it is saved (not
+        pyplot's current figure).
+    filename : str
+        Output path without extension.
+    formats : str or sequence of str
+        Formats to write, e.g. ('png', 'pdf', 'svg'), or 'png' for quick looks.
+    dpi : int
+        Resolution of the raster outputs.
+    parallel : bool, optional
+        Write the formats in worker processes when there is more than one.
+        Defaults to True when the process can use at least 2 CPUs (its CPU
+        affinity and cgroup quota, see functions_workers_v0.usable_cpus) and
+        this is the main thread of a process that is not already a worker
+        (e.g. of render_batch); forking from a worker thread could deadlock.
+        With a single usable CPU the formats are written one after the other:
+        the workers would only take turns on it, after pickling the figure.
+    executor : concurrent.futures.Executor, optional
+        Pool to submit the writes to (see export_pool). By default a pool
+        shared by all the calls is started on the first parallel export and
+        reused afterwards, so its start-up is paid once per process.
+    rasterize_above : int, optional
+        Point count above which a collection is rasterized in vector formats
+        (markers for scatters, vertices for lines and polygons). None keeps
+        everything vector.
+
+    Returns
+    -------
+    list of str
+        The written paths, in the order of `formats`.
+    """
+    fig = _root_figure(fig)
+    if isinstance(formats, str):
+        formats = (formats,)
+    with stage('savefig', fig):
+        rasterized = []
+        if rasterize_above is not None and any(fmt in VECTOR_FORMATS for fmt in formats):
+            rasterized = rasterize_heavy_artists(fig, rasterize_above)
+        try:
+            return _save_figure(fig, filename, formats, dpi, parallel, executor)
+        finally:
+            # Rasterizing is only for the export; the figure is left as it was
+            for artist in rasterized:
+                artist.set_rasterized(False)
+
+
+def rasterize_heavy_artists(fig, threshold=RASTERIZE_POINTS):
+    """
+    Rasterize the collections of a figure that have more than `threshold` points.
+
+    Only affects vector outputs: raster formats are rendered the same way.
+    Collections already rasterized, and artists marked with keep_vector, are
+    left alone.
+
+    Returns
+    -------
+    list of matplotlib.collections.Collection
+        The collections that were switched to rasterized.
+    """
+    from matplotlib.collections import Collection
+
+    rasterized = []
+    for ax in _root_figure(fig).axes:
+        for artist in ax.get_children():
+            if (isinstance(artist, Collection) and not artist.get_rasterized()
+                    and artist not in _KEEP_VECTOR and _count_points(artist) > threshold):
+                artist.set_rasterized(True)
+                rasterized.append(artist)
+    return rasterized
+
+
+def keep_vector(artist):
+    """Keep `artist` vector in exports, however many points it has."""
+    _KEEP_VECTOR.add(artist)
+    return artist
+
+
+def _count_points(collection):
+    # A scatter draws its marker at each offset; lines and polygons draw their vertices
+    offsets = collection.get_offsets()
+    if len(offsets) > 1:
+        return len(offsets)
+    return sum(len(path.vertices) for path in collection.get_paths())
+
+
+def _save_figure(fig, filename, formats, dpi, parallel, executor):
+    paths = [f'{filename}.{fmt}' for fmt in formats]
+    with stage('tight_bbox', fig):
+        bbox = _tight_bbox(fig)
+    if parallel is None:
+        import multiprocessing
+        import threading
+
+        parallel = (usable_cpus() > 1 and multiprocessing.parent_process() is None
+                    and threading.current_thread() is threading.main_thread())
+
+    if parallel and (len(formats) > 1 or executor is not None):
+        try:
+            figure_bytes = pickle.dumps(fig)
+        except Exception:
+            figure_bytes = None
+        if figure_bytes is not None:
+            from concurrent.futures.process import BrokenProcessPool
+
+            shared = executor is None
+            if shared:
+                executor = _shared_export_pool()
+            try:
+                futures = [executor.submit(_save_pickled_figure, figure_bytes, path, fmt, dpi, bbox)
+                           for path, fmt in zip(paths, formats)]
+                return [future.result() for future in futures]
+            except BrokenProcessPool:
+                if not shared:
+                    raise
+                # A worker died (e.g. killed): start a new pool next time and write here
+                _discard_shared_export_pool()
+
+    for path, fmt in zip(paths, formats):
+        fig.savefig(path, format=fmt, dpi=dpi, bbox_inches=bbox)
+    return paths
+
+
+def export_pool(max_workers=None):
+    """
+    Process pool whose workers render on the Agg backend, for save_figure(executor=...).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_export_worker)
+
+
+def _shared_export_pool():
+    global _EXPORT_POOL
+
+    if _EXPORT_POOL is None:
+        # Workers are started on demand, up to one per usable CPU
+        _EXPORT_POOL = export_pool(usable_cpus())
+    return _EXPORT_POOL
+
+
+def _discard_shared_export_pool():
+    global _EXPORT_POOL
+
+    if _EXPORT_POOL is not None:
+        _EXPORT_POOL.shutdown(wait=False, cancel_futures=True)
+        _EXPORT_POOL = None
+
+
+def _root_figure(fig):
+    """Return the top-level Figure of a Figure, SubFigure or Axes."""
+    # Axes -> (Sub)Figure -> root Figure; the .figure of a Figure is itself
+    fig = getattr(fig, 'figure', fig)
+    return getattr(fig, 'figure', fig)
+
+
+def _tight_bbox(fig):
+    """Padded tight bounding box in inches, as savefig(bbox_inches='tight') computes it."""
+    import matplotlib as mpl
+
+    fig.draw_without_rendering()
+    bbox = fig.get_tightbbox()
+    return bbox.padded(mpl.rcParams['savefig.pad_inches'])
+
+
+def _init_export_worker():
+    import matplotlib
+
+    matplotlib.use('Agg', force=True)
+
+
+def _save_pickled_figure(figure_bytes, path, fmt, dpi, bbox):
+    fig = pickle.loads(figure_bytes)
+    try:
+        fig.savefig(path, format=fmt, dpi=dpi, bbox_inches=bbox)
+    finally:
+        import sys
+
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close(fig)
+    return path
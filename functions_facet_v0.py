@@ -0,0 +1,277 @@
+from collections import namedtuple
+
+import numpy as np
+
+from functions_brackets_v0 import select_pairs
+from functions_cache_v0 import (STATS_CACHE, StatsCache, cached_box_summary, cached_kde, cached_pairwise_tests,
+                                cached_violin_stats, group_key)
+from functions_export_v0 import DEFAULT_FORMATS, RASTERIZE_POINTS, save_figure
+from functions_grouped_v0 import GroupedData
+from functions_lazy_v0 import lazy_import
+from functions_profile_v0 import profiled, stage
+from functions_workers_v0 import usable_cpus
+
+plt = lazy_import('matplotlib.pyplot')
+
+# Plot kinds and the plotting function (module, name) that draws each panel
+FACET_KINDS = {
+    'boxes': ('functions_boxplots_v3', 'plot_boxes_generalized'),
+    'violins': ('functions_violinplots_v3', 'plot_violins_generalized'),
+    'half_violins': ('functions_box_swarm_halfviolin_v1', 'plot_half_violin_box_swarm'),
+}
+
+Facets = namedtuple('Facets', ['figure', 'axes', 'handles', 'rows', 'cols'])
+Facets.__doc__ = """
+Grid drawn by plot_facets.
+
+figure : the Figure; axes : 2-D array of Axes, one per (row, col) panel;
+handles : 2-D array of the PlotHandle of each panel (to update it); rows,
+cols : values of the row and column keys, in grid order ([None] without key).
+"""
+
+
+@profiled
+def plot_facets(data, kind='boxes', value='value', group='cond', row=None, col=None,
+                order=None, row_order=None, col_order=None,
+                sharey=False,
+                panel_size=(5, 4),
+                font_scale=1.4,
+                y_axis_label=None,
+                show_p_values=True,
+                test='ranksums',
+                test_kws=None,
+                pairs=None,
+                max_workers=1,
+                saveplot=False,
+                filename='filename',
+                dpi=300,
+                save_formats=DEFAULT_FORMATS,
+                rasterize_above=RASTERIZE_POINTS,
+                **plot_kws):
+    """
+    Grid of box, violin or half-violin plots, one panel per (row, col) of a long-form table.
+
+    The table is split into panels and groups in one grouping pass, the
+    statistics of every panel (box statistics, KDEs, p-values) are computed
+    in one pass before drawing (optionally in worker processes) and cached
+    by content. Each panel is then drawn by the plotting function of `kind`.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Long-form table.
+    kind : {'boxes', 'violins', 'half_violins'}
+        Plot of each panel: plot_boxes_generalized, plot_violins_generalized
+        or plot_half_violin_box_swarm.
+    value, group : str
+        Columns holding the samples and the groups compared within a panel.
+    row, col : str, optional
+        Columns whose values give the rows and columns of the grid.
+    order, row_order, col_order : list, optional
+        Groups, rows and columns to show, in this order. Default to the
+        order of appearance in the table. Every panel shows every group.
+    sharey : bool or {'row', 'col'}
+        Give the panels (all of them, or those of each row or column) the
+        same y limits, with their brackets laid out from the same height.
+        The y tick labels are then only shown on the first column (for True
+        and 'row').
+    panel_size : (float, float)
+        Size of each panel in inches.
+    font_scale : float
+        Seaborn's font scale of every panel (applied to each Axes, without
+        sns.set_context).
+    y_axis_label : str, optional
+        Label of the y axes of the first column. Defaults to `value`.
+    show_p_values, test, test_kws, pairs :
+        As in the plotting functions.
+    max_workers : int, optional
+        Processes the statistics of the panels are computed in; None uses
+        every usable CPU. With 1, everything runs in this process.
+    saveplot, filename, dpi, save_formats, rasterize_above :
+        Save the whole figure (see save_figure).
+    **plot_kws :
+        Passed to the plotting function of every panel (palettes,
+        point_size, connect_pairs, significant_only, kde_grid_size...).
+
+    Returns
+    -------
+    Facets
+        The figure, its axes and the handle of each panel.
+    """
+    import importlib
+
+    if kind not in FACET_KINDS:
+        raise ValueError(f"kind must be one of {list(FACET_KINDS)}, but got {kind!r}")
+    module, name = FACET_KINDS[kind]
+    plot = getattr(importlib.import_module(module), name)
+
+    with stage('group_data'):
+        rows, cols, panels = facet_groups(data, value, group, row, col, order, row_order, col_order)
+    labels = next(iter(panels.values())).labels if panels else []
+
+    with stage('statistics'):
+        panel_statistics(panels, kind, show_p_values, test, test_kws, pairs, max_workers,
+                         kde_grid_size=plot_kws.get('kde_grid_size', 256),
+                         kde_tol=plot_kws.get('kde_tol', 1e-3))
+
+    fig, axes = plt.subplots(len(rows), len(cols), squeeze=False,
+                             figsize=(panel_size[0] * len(cols), panel_size[1] * len(rows)))
+    handles = np.empty(axes.shape, dtype=object)
+    if y_axis_label is None:
+        y_axis_label = value
+    for i, row_value in enumerate(rows):
+        for j, col_value in enumerate(cols):
+            title = ' | '.join(f'{key} = {key_value}' for key, key_value in ((row, row_value), (col, col_value))
+                               if key is not None)
+            with stage('panel', axes[i, j]):
+                handles[i, j] = plot(axes[i, j], panels[(row_value, col_value)], labels,
+                                     font_scale=font_scale,
+                                     plot_title=title,
+                                     y_axis_label=y_axis_label if j == 0 else '',
+                                     show_p_values=show_p_values,
+                                     test=test,
+                                     test_kws=test_kws,
+                                     pairs=pairs,
+                                     **plot_kws)
+
+    if sharey:
+        with stage('share_y', fig):
+            share_ylim(handles, sharey)
+        if sharey in (True, 'row'):
+            for ax in axes[:, 1:].ravel():
+                ax.tick_params(labelleft=False)
+
+    fig.tight_layout()
+    if saveplot:
+        save_figure(fig, filename, formats=save_formats, dpi=dpi, rasterize_above=rasterize_above)
+    return Facets(fig, axes, handles, rows, cols)
+
+
+def facet_groups(data, value='value', group='cond', row=None, col=None, order=None, row_order=None,
+                 col_order=None):
+    """
+    Split a long-form table into the GroupedData of each panel, in one grouping pass.
+
+    Returns
+    -------
+    rows, cols : list
+        Values of the row and column keys, in grid order ([None] without key).
+    panels : dict
+        GroupedData of each (row, col), with every group of `order` (empty
+        where the panel has no samples of it).
+    """
+    import pandas as pd
+
+    keys = [key for key in (row, col) if key is not None] + [group]
+    indices = {k if isinstance(k, tuple) else (k,): v
+               for k, v in data.groupby(keys, sort=False).indices.items()}
+    if order is None:
+        order = list(pd.unique(data[group]))
+    if row_order is None:
+        row_order = [None] if row is None else list(pd.unique(data[row]))
+    if col_order is None:
+        col_order = [None] if col is None else list(pd.unique(data[col]))
+    rows, cols = list(row_order), list(col_order)
+
+    values = data[value].to_numpy(dtype=float)
+    empty = np.empty(0, dtype=np.intp)
+    panels = {}
+    for row_value in rows:
+        for col_value in cols:
+            prefix = tuple(v for key, v in ((row, row_value), (col, col_value)) if key is not None)
+            positions = [indices.get(prefix + (label,), empty) for label in order]
+            offsets = np.concatenate(([0], np.cumsum([p.size for p in positions])))
+            panels[(row_value, col_value)] = GroupedData(
+                values[np.concatenate(positions)] if positions else np.empty(0), offsets, order)
+    return rows, cols, panels
+
+
+def panel_statistics(panels, kind, show_p_values=True, test='ranksums', test_kws=None, pairs=None,
+                     max_workers=1, kde_grid_size=256, kde_tol=1e-3, cache=STATS_CACHE):
+    """
+    Compute the statistics the plotting function of `kind` needs for every panel, into `cache`.
+
+    The panels are then drawn from the cache. With several workers, each
+    panel is computed in a worker process and its statistics are stored in
+    `cache` as they come back.
+
+    Parameters
+    ----------
+    panels : dict
+        GroupedData of each panel (see facet_groups).
+    kind, show_p_values, test, test_kws, pairs :
+        As in plot_facets.
+    max_workers : int, optional
+        Worker processes; None uses every usable CPU (functions_workers_v0.usable_cpus),
+        1 computes in this process.
+    kde_grid_size, kde_tol :
+        KDE parameters of the violins.
+    """
+    options = dict(show_p_values=show_p_values, test=test, test_kws=test_kws or {}, pairs=pairs,
+                   kde_grid_size=kde_grid_size, kde_tol=kde_tol)
+    if max_workers is None:
+        max_workers = usable_cpus()
+    if max_workers <= 1 or len(panels) <= 1:
+        for grouped in panels.values():
+            _panel_statistics(grouped, kind, options, cache)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(panels))) as executor:
+        futures = [executor.submit(_worker_statistics, grouped.values, grouped.offsets, grouped.labels,
+                                   kind, options)
+                   for grouped in panels.values()]
+        for future in futures:
+            for key, value in future.result():
+                cache.put(key, value)
+
+
+def share_ylim(handles, sharey=True):
+    """
+    Give the panels the same y range, and their brackets the same heights.
+
+    Parameters
+    ----------
+    handles : 2-D array of PlotHandle
+        Handle of each panel.
+    sharey : True, 'row' or 'col'
+        Share across all the panels, or within each row or column.
+    """
+    if sharey == 'row':
+        sharing = [list(line) for line in handles]
+    elif sharey == 'col':
+        sharing = [list(line) for line in handles.T]
+    else:
+        sharing = [list(handles.ravel())]
+    for panel_handles in sharing:
+        # Brackets from the top of the highest data, the y range of all the data
+        ranges = np.array([handle.data_ylim() for handle in panel_handles])
+        common = (ranges[:, 0].min(), ranges[:, 1].max())
+        for handle in panel_handles:
+            handle.relayout(common)
+        limits = np.array([handle.ax.get_ylim() for handle in panel_handles])
+        for handle in panel_handles:
+            handle.ax.set_ylim(limits[:, 0].min(), limits[:, 1].max())
+
+
+def _panel_statistics(grouped, kind, options, cache):
+    # The same statistics, with the same cache keys, as the plotting functions compute
+    keys = [group_key(g) for g in grouped]
+    summaries = [cached_box_summary(g, key=key, cache=cache) for g, key in zip(grouped, keys)]
+    kde_kws = dict(grid_size=options['kde_grid_size'], tol=options['kde_tol'])
+    if kind == 'violins':
+        for g, key, stats in zip(grouped, keys, summaries):
+            if np.isfinite(stats['med']):
+                cached_kde(g, key=key, cache=cache, **kde_kws)
+    elif kind == 'half_violins':
+        cached_violin_stats(grouped, keys, cache=cache, **kde_kws)
+    if options['show_p_values']:
+        cached_pairwise_tests(grouped, keys, options['test'], select_pairs(options['pairs'], grouped.labels),
+                              cache=cache, **options['test_kws'])
+
+
+def _worker_statistics(values, offsets, labels, kind, options):
+    cache = StatsCache(max_bytes=float('inf'))
+    _panel_statistics(GroupedData(values, offsets, labels), kind, options, cache)
+    return cache.items()
@@ -0,0 +1,144 @@
+import numpy as np
+
+class GroupedData:
+    """
+    Samples of several groups stored as one contiguous array plus group offsets.
+
+    Group i is ``values[offsets[i]:offsets[i + 1]]``, so every group is an O(1)
+    view and no stage has to filter a long-form table to get it back.
+
+    Parameters
+    ----------
+    values : array-like
+        1-D array with the samples of all the groups, one group after another.
+    offsets : array-like of int
+        k + 1 increasing offsets into `values`, starting at 0 and ending at
+        len(values).
+    labels : list, optional
+        One label per group. Defaults to 0, 1, ..., k - 1.
+    """
+
+    def __init__(self, values, offsets, labels=None):
+        self.values = np.asarray(values, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        if self.values.ndim != 1:
+            raise ValueError(f"values must be 1-D, but got {self.values.ndim} dimensions")
+        if (self.offsets.ndim != 1 or self.offsets.size == 0 or self.offsets[0] != 0
+                or self.offsets[-1] != self.values.size or np.any(np.diff(self.offsets) < 0)):
+            raise ValueError("offsets must increase from 0 to len(values)")
+        n_groups = self.offsets.size - 1
+        self.labels = list(range(n_groups)) if labels is None else list(labels)
+        if len(self.labels) != n_groups:
+            raise ValueError(f"Got {len(self.labels)} labels for {n_groups} groups")
+
+    @classmethod
+    def from_dataset(cls, dataset, labels=None):
+        """
+        Build the container from the `dataset` argument of the plotting functions.
+
+        A 2-D array (one row per group) and groups that are consecutive views of
+        one float array (e.g. from np.split) are wrapped without copying. Any
+        other list of arrays is copied once into a single contiguous buffer.
+        """
+        if isinstance(dataset, cls):
+            if labels is not None and list(labels) != dataset.labels:
+                return cls(dataset.values, dataset.offsets, labels)
+            return dataset
+
+        if isinstance(dataset, np.ndarray) and dataset.ndim == 2:
+            n_groups, n_values = dataset.shape
+            values = np.ascontiguousarray(dataset, dtype=float).reshape(-1)
+            return cls(values, np.arange(n_groups + 1) * n_values, labels)
+
+        groups = [np.asarray(g, dtype=float).reshape(-1) for g in dataset]
+        offsets = np.concatenate(([0], np.cumsum([g.size for g in groups])))
+        values = _adjacent_views(groups)
+        if values is None:
+            values = np.empty(offsets[-1])
+            if groups:
+                np.concatenate(groups, out=values)
+        return cls(values, offsets, labels)
+
+    @classmethod
+    def from_frame(cls, data, value='value', group='cond', order=None):
+        """
+        Build the container from a long-form DataFrame in one grouping pass.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame
+            Long-form table.
+        value, group : str
+            Columns holding the samples and the group labels.
+        order : list, optional
+            Groups to keep, in this order. Defaults to the order of appearance.
+        """
+        indices = data.groupby(group, sort=False).indices
+        if order is None:
+            order = list(indices)
+        empty = np.empty(0, dtype=np.intp)
+        positions = [indices.get(label, empty) for label in order]
+        offsets = np.concatenate(([0], np.cumsum([p.size for p in positions])))
+        values = data[value].to_numpy(dtype=float)[np.concatenate(positions)] if positions else np.empty(0)
+        return cls(values, offsets, order)
+
+    def __len__(self):
+        return self.offsets.size - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"group index {i} out of range for {len(self)} groups")
+        i %= len(self)
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def sizes(self):
+        """Number of samples in each group."""
+        return np.diff(self.offsets)
+
+    def codes(self):
+        """Group index of every sample in `values`."""
+        return np.repeat(np.arange(len(self)), self.sizes)
+
+    def to_frame(self, value='value', group='cond'):
+        """
+        Long-form DataFrame view for seaborn.
+
+        The value column shares memory with `values` when pandas allows it; the
+        group column holds references to the labels (a plain column, not a
+        categorical, so seaborn does not dodge hue == x plots).
+        """
+        import pandas as pd
+
+        groups = np.asarray(self.labels, dtype=object)[self.codes()]
+        return pd.DataFrame({value: self.values, group: groups}, copy=False)
+
+
+def _adjacent_views(groups):
+    """Return one view spanning `groups` if they are back-to-back in the same buffer."""
+    if not groups or any(g.dtype != np.float64 or not g.flags.c_contiguous for g in groups):
+        return None
+    bases = {id(g.base if g.base is not None else g) for g in groups}
+    if len(bases) != 1:
+        return None
+    base = groups[0].base if groups[0].base is not None else groups[0]
+    if not (isinstance(base, np.ndarray) and base.dtype == np.float64 and base.flags.c_contiguous):
+        return None
+
+    non_empty = [g for g in groups if g.size]
+    if not non_empty:
+        return None
+    itemsize = base.itemsize
+    base_start = base.__array_interface__['data'][0]
+    start = non_empty[0].__array_interface__['data'][0]
+    position = start
+    for g in non_empty:
+        if g.__array_interface__['data'][0] != position:
+            return None
+        position += g.size * itemsize
+    first = (start - base_start) // itemsize
+    return base.reshape(-1)[first:first + (position - start) // itemsize]
@@ -0,0 +1,166 @@
+import numpy as np
+
+from functions_brackets_v0 import select_pairs, update_brackets
+from functions_cache_v0 import cached_pairwise_tests, group_key
+from functions_grouped_v0 import GroupedData
+from functions_profile_v0 import stage
+from functions_stats_v0 import significance_asterisks
+
+class PlotHandle:
+    """
+    Artists and statistics of a plot, to redraw it in place as its data change.
+
+    Returned by plot_boxes_generalized, plot_violins_generalized and
+    plot_half_violin_box_swarm. update() compares the content hash of each
+    new group with the one drawn: only the groups that changed get new
+    statistics and have their artists (boxes, violins, swarm...) moved in
+    place, the p-values of pairs of unchanged groups come from the cache, and
+    the brackets and y limits follow the new data. No artist is rebuilt, so
+    a live view refreshed every few seconds only pays for what changed.
+
+    Attributes
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes the plot is drawn on.
+    grouped : GroupedData or None
+        Samples drawn (None when the plot was drawn from summaries).
+    keys : list of str
+        group_key of each group.
+    artists : dict
+        Artists of each layer ('boxes', 'violins', 'swarm', 'connect_pairs',
+        'brackets', 'h_line'), as returned by the functions that drew them.
+    p_values : ndarray or None
+        Matrix of p-values of the last significance tests.
+    """
+
+    def __init__(self, ax, grouped, keys, artists, update_groups=None):
+        self.ax = ax
+        self.grouped = grouped
+        self.keys = keys
+        self.artists = artists
+        self.p_values = None
+        self._update_groups = update_groups
+        self._annotation = None
+
+    def __repr__(self):
+        n_groups = len(self.keys) if self.keys is not None else len(self.artists.get('boxes', []))
+        return f"PlotHandle({n_groups} groups, layers: {', '.join(self.artists)})"
+
+    def annotate(self, show_p_values=True, test='ranksums', test_kws=None, pairs=None,
+                 significant_only=False, y_min=None, y_max=None, pad=6):
+        """
+        Draw the significance brackets above the data and set the y limits.
+
+        The last step of the plotting functions (see them for the parameters);
+        update() repeats it with the same settings. The brackets start one
+        tenth of the y range above the current y limits, and `pad` legs
+        heights are left above the highest one.
+        """
+        self._annotation = dict(show_p_values=show_p_values, test=test, test_kws=test_kws or {},
+                                pairs=pairs, significant_only=significant_only, y_min=y_min,
+                                y_max=y_max, pad=pad)
+        self._annotate(self.ax.get_ylim())
+
+    def update(self, dataset, draw=True):
+        """
+        Show new samples of the same groups, recomputing and moving only what changed.
+
+        Parameters
+        ----------
+        dataset : list of array-like, 2-D array or GroupedData
+            The new samples, one group per label, in the order of the plot.
+            The sizes of the groups may change.
+        draw : bool
+            Ask the canvas to redraw (draw_idle) when something changed.
+
+        Returns
+        -------
+        list of int
+            Indices of the groups whose samples changed.
+        """
+        if self.grouped is None:
+            raise ValueError("This plot was drawn from summaries; only plots of samples can be updated.")
+        with stage('update', self.ax):
+            with stage('group_data'):
+                grouped = GroupedData.from_dataset(dataset, self.grouped.labels)
+                keys = [group_key(g) for g in grouped]
+            changed = [i for i, (key, old) in enumerate(zip(keys, self.keys)) if key != old]
+            if not changed:
+                return changed
+            self.grouped, self.keys = grouped, keys
+            with stage('groups', self.ax):
+                self._update_groups(self, changed)
+            if self._annotation is not None:
+                self.relayout()
+        if draw:
+            self.ax.figure.canvas.draw_idle()
+        return changed
+
+    def relayout(self, ylim=None):
+        """
+        Lay the brackets out again from the y range `ylim`, and set the y limits.
+
+        By default from the range of the plotted data (data_ylim); a range
+        common to several panels gives them brackets at the same heights.
+        """
+        self._annotate(self.data_ylim() if ylim is None else ylim)
+
+    def _annotate(self, ylim):
+        settings = self._annotation
+        ax = self.ax
+        (miny, maxy) = ylim
+        y_increment = 0.1 * (maxy - miny)
+        yposition = maxy
+
+        h = 0
+        brackets = self.artists.get('brackets', (0, None, []))
+        if settings['show_p_values']:
+            # All pairwise tests in one pass (pairs of unchanged groups are cached)
+            pairs = select_pairs(settings['pairs'], self.grouped.labels)
+            with stage('significance'):
+                self.p_values = cached_pairwise_tests(self.grouped, self.keys, settings['test'], pairs,
+                                                      **settings['test_kws'])
+            if settings['significant_only']:
+                pairs = [(i, j) for i, j in pairs if self.p_values[i, j] < 0.05]
+            if pairs or brackets[1] is not None:
+                with stage('brackets', ax):
+                    # Brackets that do not overlap share a row; all lines are one collection
+                    h = np.nanmax(self.grouped.values) * 0.01 if pairs else 0
+                    brackets = update_brackets(ax, brackets, pairs,
+                                               [significance_asterisks(self.p_values[i, j]) for i, j in pairs],
+                                               yposition, y_increment, h)
+                    self.artists['brackets'] = brackets
+                    yposition += brackets[0] * y_increment
+                if brackets[1] is not None and ax.get_autoscaley_on():
+                    # As Axes.add_collection does: the margins below the data include the brackets
+                    ax.update_datalim(brackets[1].get_datalim(ax.transData).get_points())
+                    ax.autoscale_view(scalex=False)
+
+        # Update axis limits
+        y_max = settings['y_max']
+        if y_max is None:
+            y_max = yposition
+        else:
+            y_max = max(y_max, yposition)
+        ax.set_ylim(settings['y_min'], y_max + settings['pad'] * h)
+
+    def data_ylim(self):
+        """y limits autoscaled to the plotted data, leaving out the brackets and the h_line."""
+        ax = self.ax
+        _, lines, annotations = self.artists.get('brackets', (0, None, []))
+        hidden = [artist for artist in [lines, self.artists.get('h_line'), *annotations]
+                  if artist is not None and artist.get_visible()]
+        for artist in hidden:
+            artist.set_visible(False)
+        try:
+            # relim skips collections: add the visible ones as Axes.add_collection does
+            ax.relim(visible_only=True)
+            for collection in ax.collections:
+                if collection.get_visible():
+                    ax.update_datalim(collection.get_datalim(ax.transData).get_points())
+            ax.set_autoscaley_on(True)
+            ax.autoscale_view(scalex=False)
+            return ax.get_ylim()
+        finally:
+            for artist in hidden:
+                artist.set_visible(True)
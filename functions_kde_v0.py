@@ -0,0 +1,133 @@
+import numpy as np
+
+def kde_bandwidth(values, bw_method='scott', bw_adjust=1):
+    """
+    Gaussian kernel bandwidth, as scipy.stats.gaussian_kde (and seaborn) choose it.
+
+    Parameters
+    ----------
+    values : ndarray
+        Finite samples.
+    bw_method : 'scott', 'silverman' or float
+        Rule for the bandwidth factor, or the factor itself.
+    bw_adjust : float
+        Multiplies the bandwidth (as in seaborn).
+    """
+    n = values.size
+    if bw_method == 'scott':
+        factor = n ** (-1 / 5)
+    elif bw_method == 'silverman':
+        factor = (n * 3 / 4) ** (-1 / 5)
+    elif np.isscalar(bw_method) and not isinstance(bw_method, str):
+        factor = float(bw_method)
+    else:
+        raise ValueError(f"bw_method must be 'scott', 'silverman' or a number, but got {bw_method!r}")
+    return factor * values.std(ddof=1) * bw_adjust
+
+
+def binned_kde(values, grid_size=256, bw_method='scott', bw_adjust=1, cut=2, tol=1e-3):
+    """
+    Gaussian kernel density estimate on a regular grid, by linear binning and FFT convolution.
+
+    The samples are spread linearly onto the two nearest grid points (one
+    O(n) pass), and the binned counts are convolved with the Gaussian kernel
+    sampled on the same grid through an FFT. The cost is O(n + g log g) for g
+    grid points, instead of O(n g) for the exact sum, so 10^7 samples take a
+    fraction of a second.
+
+    Parameters
+    ----------
+    values : array-like
+        Samples. NaN and infinite values are ignored.
+    grid_size : int
+        Minimum number of grid points. The grid is refined when needed to
+        meet `tol`.
+    bw_method, bw_adjust :
+        Bandwidth, see kde_bandwidth.
+    cut : float
+        The grid extends `cut` bandwidths beyond the extreme samples (seaborn
+        uses 2, matplotlib's violinplot 0).
+    tol : float
+        Approximate maximum error, relative to the peak density. The kernel is
+        truncated where it falls below `tol` of its peak, and the grid spacing
+        is kept below sqrt(6 tol) bandwidths (the binning error stays below
+        about (spacing / bandwidth)^2 / 6).
+
+    Returns
+    -------
+    support : ndarray
+        Grid points, in increasing order.
+    density : ndarray
+        Density at each grid point. Both arrays are empty when there are fewer
+        than two distinct finite samples.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if not np.isfinite(values).all():
+        values = values[np.isfinite(values)]
+    if values.size < 2:
+        return np.empty(0), np.empty(0)
+    bandwidth = kde_bandwidth(values, bw_method, bw_adjust)
+    if not bandwidth > 0:
+        return np.empty(0), np.empty(0)
+
+    low = values.min() - cut * bandwidth
+    high = values.max() + cut * bandwidth
+    # Enough points for the binning error, capped so a far outlier cannot blow up the grid
+    n_grid = int(np.clip(np.ceil((high - low) / (bandwidth * np.sqrt(6 * tol))) + 1, grid_size, 2 ** 20))
+    support = np.linspace(low, high, n_grid)
+    step = support[1] - support[0]
+
+    # === Linear binning ===
+    position = (values - low) / step
+    left = np.minimum(position.astype(np.intp), n_grid - 2)
+    weight = position - left
+    counts = np.bincount(left, 1 - weight, n_grid) + np.bincount(left + 1, weight, n_grid)
+
+    # === Convolution with the truncated kernel ===
+    reach = min(int(np.ceil(np.sqrt(2 * np.log(1 / tol)) * bandwidth / step)), n_grid - 1)
+    offsets = np.arange(-reach, reach + 1) * (step / bandwidth)
+    kernel = np.exp(-0.5 * offsets ** 2) / (values.size * bandwidth * np.sqrt(2 * np.pi))
+    n_fft = 1 << int(n_grid + 2 * reach - 1).bit_length()
+    density = np.fft.irfft(np.fft.rfft(counts, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)
+    density = density[reach:reach + n_grid]
+    # FFT round-off can leave tiny negative values far from the data
+    np.maximum(density, 0, out=density)
+    return support, density
+
+
+def violin_stats(groups, grid_size=256, tol=1e-3, cut=0, **kde_kws):
+    """
+    Per-group statistics for matplotlib's Axes.violin, with the densities from binned_kde.
+
+    Parameters
+    ----------
+    groups : sequence of array-like
+        Samples of each group (e.g. a GroupedData).
+    grid_size, tol, cut, **kde_kws :
+        Passed to binned_kde. cut=0 limits each violin to its data range,
+        as Axes.violinplot does.
+
+    Returns
+    -------
+    list of dict
+        One dict per group with the keys of matplotlib.cbook.violin_stats
+        ('coords', 'vals', 'mean', 'median', 'min', 'max'). A group without
+        spread gets a flat violin at its value.
+    """
+    stats = []
+    for values in groups:
+        values = np.asarray(values, dtype=float)
+        if not np.isfinite(values).all():
+            values = values[np.isfinite(values)]
+        coords, vals = binned_kde(values, grid_size=grid_size, tol=tol, cut=cut, **kde_kws)
+        if coords.size == 0 and values.size:
+            coords, vals = np.full(2, values.mean()), np.ones(2)
+        stats.append({
+            'coords': coords,
+            'vals': vals,
+            'mean': values.mean() if values.size else np.nan,
+            'median': np.median(values) if values.size else np.nan,
+            'min': values.min() if values.size else np.nan,
+            'max': values.max() if values.size else np.nan,
+        })
+    return stats
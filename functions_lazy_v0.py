@@ -0,0 +1,37 @@
+"""
+Lazy imports of the heavy plotting dependencies.
+
+The plotting modules bind matplotlib.pyplot (and seaborn, where a palette
+or context name needs it) at module level with lazy_import, so importing
+them stays cheap and the import is paid by the first call that uses it. Other matplotlib classes are imported inside
+the functions that use them.
+"""
+import importlib
+import sys
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    ``sns = lazy_import('seaborn')`` at the top of a plotting module keeps
+    seaborn (and what it pulls in: matplotlib, pandas, scipy) out of the
+    import of the module itself; the cost is paid by the first call that
+    uses it, once per process.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Not sys.modules: while another thread imports the module, it is there
+        # half-initialised; import_module waits for that import to finish
+        return getattr(importlib.import_module(self._name), attr)
+
+    def __repr__(self):
+        state = 'imported' if self._name in sys.modules else 'not imported yet'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return the module if it is already imported, else a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
@@ -0,0 +1,194 @@
+import contextlib
+import contextvars
+import functools
+import time
+import tracemalloc
+from collections import namedtuple
+
+StageRecord = namedtuple('StageRecord', ['function', 'stage', 'path', 'start', 'seconds', 'artists', 'bytes'])
+StageRecord.__doc__ = """
+Measurements of one stage of a plot.
+
+function : outermost stage, normally the plotting function; stage : name of
+the stage; path : names of the enclosing stages and of this one, joined by
+'/'; start : seconds from the start of the profile_stages block to the
+start of the stage; seconds : wall time; artists : artists added to the
+figure's axes during the stage (None when the stage has no figure); bytes :
+peak memory allocated during the stage, above what was allocated when it
+started (None unless profile_stages was called with memory=True).
+"""
+
+# Profile collecting the stages of the current thread / task, if any
+_ACTIVE = contextvars.ContextVar('plot_profile', default=None)
+_NO_STAGE = contextlib.nullcontext()
+
+
+class PlotProfile:
+    """
+    Stage records collected by profile_stages, in the order the stages ended.
+
+    Printing the profile gives a table of the stages, nested under the
+    stages that enclose them.
+
+    Attributes
+    ----------
+    records : list of StageRecord
+        Nested stages end before the stage that encloses them.
+    """
+
+    def __init__(self, callback=None, memory=False):
+        self.records = []
+        self.callback = callback
+        self.memory = memory
+        self._open = []
+        self._origin = time.perf_counter()
+
+    def totals(self):
+        """Total seconds per stage path (summed over the plots drawn in the block)."""
+        totals = {}
+        for record in self.records:
+            totals[record.path] = totals.get(record.path, 0.0) + record.seconds
+        return totals
+
+    def as_dicts(self):
+        """The records as plain dicts, e.g. to send them to a metrics system."""
+        return [record._asdict() for record in self.records]
+
+    def __str__(self):
+        lines = [f"{'stage':48} {'seconds':>9} {'artists':>8} {'MiB':>8}"]
+        # Each stage above the stages it encloses
+        for record in sorted(self.records, key=lambda r: (r.start, r.path.count('/'))):
+            depth = record.path.count('/')
+            artists = '' if record.artists is None else record.artists
+            mib = '' if record.bytes is None else f'{record.bytes / 2 ** 20:.1f}'
+            lines.append(f"{'  ' * depth + record.stage:48} {record.seconds:9.4f} {artists:>8} {mib:>8}")
+        return '\n'.join(lines)
+
+    @contextlib.contextmanager
+    def _stage(self, name, owner):
+        figure = _root_figure(owner)
+        artists = _count_artists(figure)
+        if self.memory:
+            if self._open:
+                # Keep the peak of the enclosing stage before this one resets it
+                parent = self._open[-1]
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        entry = {'name': name, 'peak': 0}
+        self._open.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._open.pop()
+            allocated = None
+            if self.memory:
+                entry['peak'] = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                allocated = max(entry['peak'] - start_bytes, 0)
+                if self._open:
+                    self._open[-1]['peak'] = max(self._open[-1]['peak'], entry['peak'])
+            path = '/'.join([e['name'] for e in self._open] + [name])
+            record = StageRecord(
+                function=path.split('/', 1)[0],
+                stage=name,
+                path=path,
+                start=start - self._origin,
+                seconds=seconds,
+                artists=None if artists is None else _count_artists(figure) - artists,
+                bytes=allocated,
+            )
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+
+@contextlib.contextmanager
+def profile_stages(callback=None, memory=False):
+    """
+    Collect per-stage timings of the plots drawn inside the block.
+
+    The plotting functions report their stages (grouping the data, box
+    statistics, KDE, swarm, significance tests, brackets, saving...), and
+    the swarm layout, done when the figure is drawn, reports its own. The
+    collection is scoped to the current thread (or asyncio task), so
+    concurrent renders do not mix. Outside this block, the stages cost
+    nothing measurable.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with each StageRecord as soon as its stage ends, e.g. to
+        forward it to a metrics system.
+    memory : bool
+        Also record the peak memory allocated by each stage, with tracemalloc
+        (started for the block if it is not already tracing). Tracing slows
+        the plot down several times, so timings taken with memory=True are
+        not representative.
+
+    Yields
+    ------
+    PlotProfile
+        Holds the records once the block has ended.
+
+    Examples
+    --------
+    >>> with profile_stages() as profile:
+    ...     plot_violins_generalized(ax, dataset, labels, saveplot=True)
+    >>> print(profile)
+    >>> profile.totals()['plot_violins_generalized/violins/kde']
+    """
+    profile = PlotProfile(callback, memory)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    token = _ACTIVE.set(profile)
+    try:
+        yield profile
+    finally:
+        _ACTIVE.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def stage(name, owner=None):
+    """
+    Context manager measuring one stage of a plot, when a profile_stages block is active.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage.
+    owner : Axes or Figure, optional
+        Where the stage draws; the artists added to its figure are counted.
+    """
+    profile = _ACTIVE.get()
+    if profile is None:
+        return _NO_STAGE
+    return profile._stage(name, owner)
+
+
+def profiled(func):
+    """Decorator reporting a whole plotting function as a stage, with the Axes it is given."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _ACTIVE.get() is None:
+            return func(*args, **kwargs)
+        with stage(func.__name__, kwargs.get('ax', args[0] if args else None)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _root_figure(owner):
+    if owner is None or not hasattr(owner, 'get_children'):
+        return None
+    # Axes -> (Sub)Figure -> root Figure; the .figure of a Figure is itself
+    figure = getattr(owner, 'figure', owner)
+    return getattr(figure, 'figure', figure)
+
+
+def _count_artists(figure):
+    if figure is None:
+        return None
+    return sum(len(ax.get_children()) for ax in figure.axes)
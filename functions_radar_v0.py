@@ -1,66 +1,169 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import itertools
 
-def plot_radar(groups, rsn_labels, title="Radar Chart", colors=None):
+from functions_export_v0 import DEFAULT_FORMATS, RASTERIZE_POINTS, save_figure
+from functions_lazy_v0 import lazy_import
+from functions_profile_v0 import profiled, stage
+
+plt = lazy_import('matplotlib.pyplot')
+
+@profiled
+def plot_radar(groups, rsn_labels, title="Radar Chart", colors=None,
+               ax=None,
+               labels=None,
+               show_mean=False,
+               band='std',
+               mean_color='black',
+               linewidth=2.0,
+               markersize=6,
+               line_alpha=1.0,
+               fill_alpha=0.1,
+               saveplot=False,
+               filename='filename',
+               dpi=300,
+               save_formats=DEFAULT_FORMATS,
+               rasterize_above=RASTERIZE_POINTS):
     """
     Plot a radar (spider) chart for any number of groups.
 
+    All the profiles are drawn as one polygon collection (the fills), one
+    line collection (the outlines) and one scatter (the markers), so
+    thousands of profiles (e.g. one per subject) draw quickly.
+
     Parameters
     ----------
-    groups : list of dict
+    groups : list of dict or array-like of shape (n_profiles, n_axes)
         Each dict should have:
             - "label": name of the group (str)
             - "values": list/array of values (len = number of RSNs)
+        or one row of values per profile (see `labels`).
     rsn_labels : list of str
         Labels for the RSNs (must match the length of "values" for each group).
     title : str, optional
         Title of the chart.
-    colors : list of str, optional
-        List of matplotlib color names or hex codes. If None, uses tab colors.
+    colors : list of str, or array of shape (n_profiles, 3 or 4), optional
+        List of matplotlib color names or hex codes, cycled over the profiles,
+        or one RGB(A) row per profile. If None, uses tab colors.
+    ax : matplotlib.axes.Axes, optional
+        Polar Axes to draw on (e.g. plt.subplots(subplot_kw=dict(polar=True))).
+        By default a new figure is created, laid out and shown; with `ax`,
+        the caller decides what to do with its figure.
+    labels : list of str, optional
+        Legend label of each row when `groups` is an array. Without labels,
+        array rows get no legend.
+    show_mean : bool
+        Overlay the mean profile with a band of ± one `band` around it.
+    band : {'std', 'sem', None}
+        Width of the band: standard deviation or standard error of the mean
+        across profiles, or no band.
+    mean_color : color
+        Colour of the mean profile and its band.
+    linewidth, markersize : float
+        Width of the profile outlines and size of the markers at each axis
+        (0 hides the markers).
+    line_alpha, fill_alpha : float
+        Opacity of the outlines (and markers) and of the fills (0 hides them).
+    saveplot : bool
+        Save the figure as `filename` in each of `save_formats`, at `dpi`.
+        In vector formats, collections of more than `rasterize_above` points
+        are rasterized (see save_figure).
     """
+    import matplotlib as mpl
+    from matplotlib.collections import LineCollection, PolyCollection
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import PathPatch
+    from matplotlib.path import Path
 
     num_vars = len(rsn_labels)
 
-    # Check that all groups have the same number of values as RSNs
-    for g in groups:
-        if len(g["values"]) != num_vars:
-            raise ValueError(f"Group '{g['label']}' has {len(g['values'])} values, "
-                             f"but there are {num_vars} RSNs.")
+    if isinstance(groups, (list, tuple)) and groups and isinstance(groups[0], dict):
+        # Check that all groups have the same number of values as RSNs
+        for g in groups:
+            if len(g["values"]) != num_vars:
+                raise ValueError(f"Group '{g['label']}' has {len(g['values'])} values, "
+                                 f"but there are {num_vars} RSNs.")
+        labels = [g["label"] for g in groups]
+        values = np.array([np.asarray(g["values"], dtype=float) for g in groups]).reshape(-1, num_vars)
+    else:
+        values = np.atleast_2d(np.asarray(groups, dtype=float))
+        if values.shape[1] != num_vars:
+            raise ValueError(f"The profiles have {values.shape[1]} values, but there are {num_vars} RSNs.")
+        if labels is not None and len(labels) != len(values):
+            raise ValueError(f"There are {len(labels)} labels for {len(values)} profiles.")
+    n_profiles = len(values)
 
     # Default color cycle if none provided
     if colors is None:
-        colors = plt.cm.tab10.colors  # 10 distinct colors
-    color_cycle = itertools.cycle(colors)
+        colors = mpl.colormaps['tab10'].colors  # 10 distinct colors
+    rgba = to_rgba_array(colors)
+    rgba = rgba[np.arange(n_profiles) % len(rgba)]
 
     # Compute max value for scaling
-    max_val = max(max(g["values"]) for g in groups)
+    max_val = np.nanmax(values)
 
     # Angles for each RSN axis
-    angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False).tolist()
-    angles += angles[:1]  # close the loop
+    angles = np.linspace(0, 2 * np.pi, num_vars, endpoint=False)
 
     # --- PLOT ---
-    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
+    own_figure = ax is None
+    if own_figure:
+        fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(polar=True))
+
+    with stage('profiles', ax):
+        # (n_profiles, n_axes + 1, 2) closed outlines in (angle, value)
+        outlines = np.empty((n_profiles, num_vars + 1, 2))
+        outlines[:, :-1, 0] = angles
+        outlines[:, -1, 0] = angles[0]
+        outlines[:, :-1, 1] = values
+        outlines[:, -1, 1] = values[:, 0]
+        if fill_alpha:
+            fills = rgba.copy()
+            fills[:, 3] *= fill_alpha
+            ax.add_collection(PolyCollection(outlines[:, :-1], facecolors=fills, edgecolors=fills,
+                                             linewidths=1.0, zorder=1))
+        lines = rgba.copy()
+        lines[:, 3] *= line_alpha
+        ax.add_collection(LineCollection(outlines, colors=lines, linewidths=linewidth, zorder=2))
+        if markersize:
+            ax.scatter(outlines[:, :-1, 0].ravel(), values.ravel(), s=markersize ** 2,
+                       c=np.repeat(lines, num_vars, axis=0), linewidths=1.0, zorder=2)
 
-    for g, color in zip(groups, color_cycle):
-        values = list(g["values"]) + [g["values"][0]]  # close loop
-        ax.plot(angles, values, 'o-', markersize=6, linewidth=2.0, label=g["label"], color=color)
-        ax.fill(angles, values, alpha=0.1, color=color)
+    if show_mean:
+        with stage('mean_band', ax):
+            mean = values.mean(axis=0)
+            closed_angles = np.append(angles, angles[0])
+            if band is not None and n_profiles > 1:
+                spread = values.std(axis=0, ddof=1)
+                if band == 'sem':
+                    spread = spread / np.sqrt(n_profiles)
+                elif band != 'std':
+                    raise ValueError(f"band must be 'std', 'sem' or None, but got {band!r}")
+                # Ring between the lower and upper profiles: outer loop, then inner loop reversed
+                upper = np.append(mean + spread, mean[0] + spread[0])
+                lower = np.maximum(np.append(mean - spread, mean[0] - spread[0]), 0)
+                vertices = np.concatenate((np.column_stack((closed_angles, upper)),
+                                           np.column_stack((closed_angles, lower))[::-1]))
+                codes = np.full(len(vertices), Path.LINETO)
+                codes[[0, num_vars + 1]] = Path.MOVETO
+                ax.add_patch(PathPatch(Path(vertices, codes), facecolor=mean_color, edgecolor='none',
+                                       alpha=0.2, zorder=3))
+            ax.plot(closed_angles, np.append(mean, mean[0]), color=mean_color, linewidth=linewidth * 1.5,
+                    zorder=4, label='Mean')
 
     # Set positions of RSN labels
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels([''] * num_vars)  # Hide default labels
-    for angle, label in zip(angles[:-1], rsn_labels):
-        angle_deg = np.rad2deg(angle)
-        ha = 'center'
-        if 95 < angle_deg < 265:
-            ha = 'right'
-        elif angle_deg < 85 or angle_deg > 275:
-            ha = 'left'
-        ax.text(angle, max_val * 1.05, label,
-                size=12, horizontalalignment=ha, verticalalignment='center',
-                rotation=0, rotation_mode='anchor')
+    with stage('axis_labels', ax):
+        ax.set_xticks(angles)
+        ax.set_xticklabels([''] * num_vars)  # Hide default labels
+        for angle, label in zip(angles, rsn_labels):
+            angle_deg = np.rad2deg(angle)
+            ha = 'center'
+            if 95 < angle_deg < 265:
+                ha = 'right'
+            elif angle_deg < 85 or angle_deg > 275:
+                ha = 'left'
+            ax.text(angle, max_val * 1.05, label,
+                    size=12, horizontalalignment=ha, verticalalignment='center',
+                    rotation=0, rotation_mode='anchor')
 
     # Y-axis settings
     yticks = np.linspace(0, max_val, 5)
@@ -69,8 +172,22 @@ def plot_radar(groups, rsn_labels, title="Radar Chart", colors=None):
     ax.set_yticklabels([f'{v:.2f}' for v in yticks])
     ax.set_ylim(0, max_val)
 
-    # Title and legend
-    plt.title(title, size=14, pad=20)
-    plt.legend(loc='upper right', bbox_to_anchor=(1.2, 1.1))
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    # Title and legend (one entry per labelled profile, and the mean)
+    ax.set_title(title, size=14, pad=20)
+    handles = []
+    if labels is not None:
+        handles = [Line2D([], [], color=color, marker='o' if markersize else None, markersize=markersize,
+                          linewidth=linewidth, label=label)
+                   for label, color in zip(labels, lines)]
+    if show_mean:
+        handles.append(ax.lines[-1])
+    if handles:
+        ax.legend(handles=handles, loc='upper right', bbox_to_anchor=(1.2, 1.1))
+    if own_figure:
+        with stage('tight_layout', fig):
+            fig.tight_layout()
+    if saveplot:
+        save_figure(ax, filename, formats=save_formats, dpi=dpi,
+                    rasterize_above=rasterize_above)
+    if own_figure:
+        plt.show()
@@ -0,0 +1,307 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from functions_cache_v0 import group_key
+
+# Libraries whose version changes what a figure looks like
+LIBRARIES = ('numpy', 'matplotlib', 'seaborn', 'scipy', 'pandas')
+# rcParams (prefixes) of the backend and GUI windows, which do not change the files written
+IGNORED_RCPARAMS = ('backend', 'interactive', 'toolbar', 'figure.raise_window', 'savefig.directory',
+                    'webagg.', 'tk.', 'macosx.')
+
+class RenderCache:
+    """
+    On-disk cache of rendered figures, keyed by the content of everything that makes them.
+
+    The key of a render hashes the plotting function, its data (by content),
+    labels, every styling and saving option, the matplotlib rcParams (e.g. a
+    style or font set by the user), the versions of the plotting libraries
+    and the source of this package. The manifest
+    (`directory/manifest.json`) records, for each output filename, the key
+    it was rendered with and the hash of each file written; a copy of each
+    file is kept in `directory/objects`, addressed by its hash. A render is
+    skipped (a hit) when its key matches the manifest and every output file
+    is present and unchanged; missing or modified outputs are restored from
+    the copies.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the manifest and the copies (created if needed).
+    max_bytes : int, optional
+        Bound on the size of the copies; the least recently used entries are
+        removed by cleanup() (called by save()) beyond it. None keeps all.
+
+    Attributes
+    ----------
+    hits, misses : int
+        Renders skipped and renders done since the cache was opened.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        self._entries = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._entries = json.load(f).get('entries', {})
+
+    def __repr__(self):
+        return (f"RenderCache({self.directory!r}, {len(self._entries)} entries, {self.nbytes():,} bytes, "
+                f"{self.hits} hits, {self.misses} misses)")
+
+    def key(self, plot, dataset, labels=None, options=None, **extra):
+        """
+        Key of a render, or None when its data cannot be hashed (e.g. an iterator of chunks).
+
+        Parameters
+        ----------
+        plot : str or callable
+            Plotting function (or its name in PLOT_FUNCTIONS).
+        dataset, labels, options :
+            As passed to the plotting function; `options` holds its keyword arguments.
+        **extra :
+            Anything else the figure depends on (e.g. figsize).
+        """
+        digest = hashlib.sha1(usedforsecurity=False)
+        try:
+            for value in (plot, dataset, labels, options or {}, extra, _rc_digest(), library_versions(),
+                          _package_digest()):
+                _update_digest(digest, value)
+        except TypeError:
+            return None
+        return digest.hexdigest()
+
+    def lookup(self, filename, key, formats):
+        """
+        Paths of `filename` in each format if they are the outputs of `key`, else None.
+
+        Counts a hit or a miss. Outputs that are missing or were modified are
+        restored from the cached copies.
+        """
+        entry = self._entries.get(os.path.abspath(filename))
+        paths = [f'{filename}.{fmt}' for fmt in formats]
+        if key is None or entry is None or entry['key'] != key or not set(formats) <= set(entry['files']):
+            self.misses += 1
+            return None
+        for path, fmt in zip(paths, formats):
+            record = entry['files'][fmt]
+            if not _unchanged(path, record):
+                copy = self._object_path(record['sha1'])
+                if not os.path.exists(copy):
+                    self.misses += 1
+                    return None
+                shutil.copyfile(copy, path)
+                record.update(_file_stat(path))
+        entry['last_used'] = time.time()
+        self.hits += 1
+        return paths
+
+    def store(self, filename, key, paths):
+        """Record `paths` (the files written for `filename`) as the outputs of `key`, and copy them."""
+        if key is None:
+            return
+        files = {}
+        for path in paths:
+            sha1 = _file_digest(path)
+            copy = self._object_path(sha1)
+            if not os.path.exists(copy):
+                shutil.copyfile(path, copy)
+            files[os.path.splitext(path)[1][1:]] = dict(sha1=sha1, **_file_stat(path))
+        self._entries[os.path.abspath(filename)] = dict(key=key, files=files, last_used=time.time())
+
+    def save(self):
+        """Write the manifest (after a cleanup when max_bytes is set)."""
+        if self.max_bytes is not None:
+            self.cleanup(self.max_bytes)
+        temporary = f'{self._manifest_path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'version': 1, 'entries': self._entries}, f, indent=1)
+        # Atomic, so a concurrent reader never sees a partial manifest
+        os.replace(temporary, self._manifest_path)
+
+    def nbytes(self):
+        """Size of the cached copies, in bytes."""
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(self.directory, 'objects', '*')))
+
+    def cleanup(self, max_bytes):
+        """
+        Remove the least recently used entries until the copies fit in `max_bytes`.
+
+        The copies of an entry are deleted with it unless another entry uses
+        them; copies no entry uses are always deleted.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        removed = 0
+        size = self.nbytes()
+        for filename, entry in sorted(self._entries.items(), key=lambda item: item[1]['last_used']):
+            if size <= max_bytes:
+                break
+            del self._entries[filename]
+            removed += 1
+            in_use = {record['sha1'] for other in self._entries.values() for record in other['files'].values()}
+            for record in entry['files'].values():
+                copy = self._object_path(record['sha1'])
+                if record['sha1'] not in in_use and os.path.exists(copy):
+                    size -= os.path.getsize(copy)
+                    os.remove(copy)
+        # Copies of outputs rendered again since, or left by interrupted runs
+        in_use = {record['sha1'] for entry in self._entries.values() for record in entry['files'].values()}
+        for copy in glob.glob(os.path.join(self.directory, 'objects', '*')):
+            if os.path.basename(copy) not in in_use:
+                os.remove(copy)
+        return removed
+
+    def _object_path(self, sha1):
+        return os.path.join(self.directory, 'objects', sha1)
+
+
+def render_cached(plot, dataset, labels, cache, figsize=(10, 7), **options):
+    """
+    Render one figure with a plotting function, unless the cache holds its outputs.
+
+    Parameters
+    ----------
+    plot : str or callable
+        Plotting function, as for render_batch.
+    dataset, labels :
+        As for the plotting function.
+    cache : RenderCache or str
+        The cache, or its directory.
+    figsize : tuple
+        Figure size in inches.
+    **options :
+        Keyword arguments of the plotting function (filename, save_formats...).
+        saveplot defaults to True.
+
+    Returns
+    -------
+    BatchResult
+        With `cached` True when the render was skipped.
+    """
+    from functions_batch_v0 import BatchResult, _formats, _render_job
+
+    if isinstance(cache, str):
+        cache = RenderCache(cache)
+    options.setdefault('saveplot', True)
+    filename = options.get('filename', 'filename')
+    formats = _formats(options)
+    key = cache.key(plot, dataset, labels, options, figsize=figsize)
+    paths = cache.lookup(filename, key, formats)
+    if paths is not None:
+        cache.save()
+        return BatchResult(0, filename, paths, None, 0.0, True)
+    result = _render_job(0, plot, dataset, labels, options, figsize)
+    if result.error is None:
+        cache.store(filename, key, result.paths)
+        cache.save()
+    return result
+
+
+@lru_cache(maxsize=None)
+def library_versions():
+    """Installed version of each of LIBRARIES (None when missing), read without importing them."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+@lru_cache(maxsize=None)
+def _package_digest():
+    # Any change to the plotting code renders again
+    digest = hashlib.sha1(usedforsecurity=False)
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'functions_*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _rc_digest():
+    # Read now, not cached: rcParams change at run time (styles, rc_context)
+    import matplotlib as mpl
+
+    digest = hashlib.sha1(usedforsecurity=False)
+    for name in sorted(mpl.rcParams):
+        if not name.startswith(IGNORED_RCPARAMS):
+            digest.update(f'{name}={mpl.rcParams[name]!r};'.encode())
+    return digest.hexdigest()
+
+
+def _update_digest(digest, value):
+    """Feed `value` to `digest` by content; raises TypeError for what cannot be hashed so."""
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        digest.update(f'{type(value).__name__}:{value!r};'.encode())
+    elif isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            _update_digest(digest, value.tolist())
+        else:
+            digest.update(f'array:{group_key(value)};'.encode())
+    elif isinstance(value, dict):
+        digest.update(f'dict:{len(value)}:'.encode())
+        for item_key in sorted(value, key=repr):
+            _update_digest(digest, item_key)
+            _update_digest(digest, value[item_key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}:{len(value)}:'.encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif callable(value) and hasattr(value, '__qualname__'):
+        digest.update(f'callable:{value.__module__}.{value.__qualname__};'.encode())
+    elif hasattr(value, 'columns') and hasattr(value, 'dtypes'):
+        # DataFrame: columns, index and values
+        digest.update(b'frame:')
+        _update_digest(digest, [str(column) for column in value.columns])
+        _update_digest(digest, value.index.to_numpy())
+        for column in value.columns:
+            _update_digest(digest, value[column].to_numpy())
+    elif hasattr(value, 'to_numpy'):
+        _update_digest(digest, value.to_numpy())
+    elif hasattr(value, 'values') and hasattr(value, 'offsets') and hasattr(value, 'labels'):
+        # GroupedData
+        _update_digest(digest, (value.values, value.offsets, list(value.labels)))
+    else:
+        raise TypeError(f"cannot hash {type(value).__name__} by content")
+
+
+def _file_digest(path):
+    digest = hashlib.sha1(usedforsecurity=False)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+
+def _unchanged(path, record):
+    """Whether the file at `path` is the one recorded (size and mtime, or its hash when they differ)."""
+    if not os.path.exists(path):
+        return False
+    stat = _file_stat(path)
+    if stat['size'] != record['size']:
+        return False
+    return stat['mtime_ns'] == record['mtime_ns'] or _file_digest(path) == record['sha1']
@@ -0,0 +1,266 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from functions_stats_v0 import SIGNIFICANCE_LEVELS
+from functions_workers_v0 import usable_cpus
+
+# Values drawn per batch matrix at most, so one batch of a large group stays small
+BATCH_ELEMENTS = 2 ** 22
+
+def pairwise_permutation(groups, pairs=None, paired=False, n_resamples=10000, batch_size=1000,
+                         seed=0, max_workers=1, early_stop=True, confidence=0.999):
+    """
+    Two-sided permutation test of the difference in means for pairs of groups.
+
+    Unpaired, the pooled samples of a pair are reshuffled between the two
+    groups; paired (the i-th samples of both groups belong together), the
+    sign of each difference is flipped at random. Each batch of resamples is
+    one matrix (one row per resample), drawn from a seed derived from `seed`
+    and the content of the two groups, so the p-value of a pair depends
+    neither on `max_workers` nor on where the groups sit or which other pairs
+    are tested.
+
+    Parameters
+    ----------
+    groups : sequence of array-like
+        The samples, one 1-D array per group.
+    pairs : list of (int, int), optional
+        Pairs of group indices to test. Defaults to every pair.
+    paired : bool
+        Paired samples (groups of equal length, e.g. the same subjects in two
+        conditions). Pairs of groups of different lengths are NaN.
+    n_resamples : int
+        Maximum number of resamples per pair. The smallest p-value it can
+        give is 1 / (n_resamples + 1): '*****' (p < 1e-5) needs at least
+        100000.
+    batch_size : int
+        Resamples per batch (fewer for large groups, see BATCH_ELEMENTS).
+    seed : int
+        Seed of the random resamples.
+    max_workers : int, optional
+        Processes the batches are spread over; None uses every usable CPU. With 1,
+        everything runs in this process.
+    early_stop : bool
+        Stop drawing resamples for a pair once its significance level is
+        settled: when the `confidence` interval of its p-value no longer
+        contains any of SIGNIFICANCE_LEVELS (or lies below the smallest).
+        The asterisks are then those of the full run with that confidence.
+    confidence : float
+        Confidence of the interval used by `early_stop`.
+
+    Returns
+    -------
+    p_values : ndarray, shape (k, k)
+        Symmetric matrix of p-values, (extreme + 1) / (resamples + 1), with
+        ones on the diagonal. Pairs not tested, or involving an empty group
+        or a group containing NaN, are NaN.
+    """
+    results = _resample_pairs('permutation', groups, pairs, paired, n_resamples, batch_size,
+                              seed, max_workers, early_stop, confidence)
+    return _p_value_matrix(len(groups), results)
+
+
+def pairwise_bootstrap(groups, pairs=None, paired=False, n_resamples=10000, batch_size=1000,
+                       seed=0, max_workers=1, early_stop=True, confidence=0.999, ci=0.95):
+    """
+    Percentile bootstrap of the difference in means for pairs of groups.
+
+    Both groups of a pair are resampled with replacement (paired: the
+    differences are). The p-value is that of the test whose acceptance
+    region is the percentile interval: twice the fraction of the resampled
+    differences on the far side of zero, so p < 1 - ci exactly when the ci
+    interval excludes zero. Batches, seeds, workers and early stopping are
+    as in pairwise_permutation; the smallest p-value is 2 / (n_resamples + 1),
+    so '*****' needs n_resamples of at least 200000.
+
+    Parameters
+    ----------
+    groups, pairs, paired, n_resamples, batch_size, seed, max_workers, early_stop, confidence :
+        See pairwise_permutation.
+    ci : float
+        Coverage of the confidence intervals. With early stopping, they are
+        taken from the resamples drawn until the p-value was settled.
+
+    Returns
+    -------
+    p_values : ndarray, shape (k, k)
+        As in pairwise_permutation.
+    intervals : ndarray, shape (k, k, 2)
+        intervals[i, j] is the interval of mean(i) - mean(j); NaN where the
+        p-value is NaN.
+    """
+    results = _resample_pairs('bootstrap', groups, pairs, paired, n_resamples, batch_size,
+                              seed, max_workers, early_stop, confidence)
+    k = len(groups)
+    intervals = np.full((k, k, 2), np.nan)
+    for (i, j), (_, draws) in results.items():
+        if draws is not None:
+            low, high = np.quantile(draws, [(1 - ci) / 2, (1 + ci) / 2])
+            intervals[i, j] = low, high
+            intervals[j, i] = -high, -low
+    return _p_value_matrix(k, results), intervals
+
+
+def resample_batch(kind, x, y, paired, seed, size):
+    """
+    One batch of `size` resampled differences in means of x and y.
+
+    For 'permutation', under the null hypothesis (shuffled labels, or flipped
+    signs when paired); for 'bootstrap', resampled with replacement.
+    """
+    rng = np.random.default_rng(seed)
+    if paired:
+        d = x - y
+        if kind == 'permutation':
+            signs = rng.integers(0, 2, (size, d.size), dtype=np.int8) * 2 - 1
+            return (signs * d).mean(axis=1)
+        return d[rng.integers(0, d.size, (size, d.size))].mean(axis=1)
+    if kind == 'permutation':
+        shuffled = rng.permuted(np.broadcast_to(np.concatenate((x, y)), (size, x.size + y.size)), axis=1)
+        return shuffled[:, :x.size].mean(axis=1) - shuffled[:, x.size:].mean(axis=1)
+    return (x[rng.integers(0, x.size, (size, x.size))].mean(axis=1)
+            - y[rng.integers(0, y.size, (size, y.size))].mean(axis=1))
+
+
+def _resample_pairs(kind, groups, pairs, paired, n_resamples, batch_size, seed, max_workers,
+                    early_stop, confidence):
+    """{pair: (p-value, bootstrap draws or None)} for every requested pair."""
+    # functions_cache_v0 imports this module
+    from functions_cache_v0 import group_key
+
+    groups = [np.asarray(g, dtype=float).ravel() for g in groups]
+    if pairs is None:
+        pairs = [(i, j) for i in range(len(groups)) for j in range(i + 1, len(groups))]
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    results, states, streams, keys = {}, {}, {}, {}
+    for i, j in pairs:
+        x, y = groups[i], groups[j]
+        if x.size == 0 or y.size == 0 or np.isnan(x).any() or np.isnan(y).any():
+            results[(i, j)] = (np.nan, None)
+        elif paired and x.size != y.size:
+            print(f"⚠️ Cannot test groups {i} and {j} as paired samples: different lengths.")
+            results[(i, j)] = (np.nan, None)
+        else:
+            n = x.size if paired else x.size + y.size
+            rows = max(1, min(batch_size, BATCH_ELEMENTS // n))
+            for index in (i, j):
+                if index not in keys:
+                    keys[index] = group_key(groups[index])
+            # Resampled in the order of the content hashes, from seeds derived
+            # from them: the same two groups give the same draws in any position
+            first, second = (i, j) if keys[i] <= keys[j] else (j, i)
+            streams[(i, j)] = (first, second, int(keys[first], 16), int(keys[second], 16))
+            states[(i, j)] = _PairState(kind, groups[first].mean() - groups[second].mean(), rows,
+                                        -(-n_resamples // rows))
+
+    executor = None
+    if max_workers is None:
+        max_workers = usable_cpus()
+    if max_workers > 1 and states:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                       initargs=(groups,))
+    try:
+        while True:
+            active = [pair for pair, state in states.items() if not state.done]
+            if not active:
+                break
+            # Enough batches to keep the workers busy; results are consumed in
+            # batch order and the surplus of a settled pair is discarded
+            ahead = 1 if executor is None else -(-2 * max_workers // len(active))
+            tasks = []
+            for pair in active:
+                state = states[pair]
+                first, second, first_key, second_key = streams[pair]
+                for b in range(state.next_batch, min(state.next_batch + ahead, state.n_batches)):
+                    rows = min(state.rows, n_resamples - b * state.rows)
+                    key = np.random.SeedSequence(seed, spawn_key=(first_key, second_key, b))
+                    if executor is None:
+                        task = resample_batch(kind, groups[first], groups[second], paired, key, rows)
+                    else:
+                        task = executor.submit(_worker_batch, kind, first, second, paired, key, rows)
+                    tasks.append((pair, task))
+            for pair, task in tasks:
+                state = states[pair]
+                if not state.done:
+                    state.add(task if executor is None else task.result())
+                    state.done = (state.next_batch >= state.n_batches
+                                  or early_stop and state.settled(z))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    for pair, state in states.items():
+        draws = None
+        if kind == 'bootstrap':
+            # Differences of the pair's own order, mean(i) - mean(j)
+            draws = np.concatenate(state.draws) * (1 if streams[pair][0] == pair[0] else -1)
+        results[pair] = (state.p_value(), draws)
+    return results
+
+
+class _PairState:
+    """Running tally of the resamples of one pair."""
+
+    def __init__(self, kind, observed, rows, n_batches):
+        self.kind = kind
+        self.observed = observed
+        self.rows = rows
+        self.n_batches = n_batches
+        self.next_batch = 0
+        self.drawn = 0
+        self.extreme = 0
+        self.below = self.above = 0
+        self.draws = []
+        self.done = False
+
+    def add(self, differences):
+        self.next_batch += 1
+        self.drawn += differences.size
+        if self.kind == 'permutation':
+            # At least as far from zero as observed (with a relative tolerance for round-off)
+            threshold = abs(self.observed) - 1e-12 * max(1.0, abs(self.observed))
+            self.extreme += int(np.count_nonzero(np.abs(differences) >= threshold))
+        else:
+            self.draws.append(differences)
+            self.below += int(np.count_nonzero(differences <= 0))
+            self.above += int(np.count_nonzero(differences >= 0))
+            # The smaller tail: resampled differences on the far side of zero
+            self.extreme = min(self.below, self.above)
+
+    def p_value(self):
+        p = (self.extreme + 1) / (self.drawn + 1)
+        return min(1.0, 2 * p) if self.kind == 'bootstrap' else p
+
+    def settled(self, z):
+        """True when the Wilson interval of the p-value lies between two significance levels."""
+        n = self.drawn
+        q = self.extreme / n
+        centre = (q + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+        half = z * np.sqrt(q * (1 - q) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+        scale = 2 if self.kind == 'bootstrap' else 1
+        low, high = scale * (centre - half), scale * (centre + half)
+        return high < SIGNIFICANCE_LEVELS[0] or not any(low <= level <= high for level in SIGNIFICANCE_LEVELS)
+
+
+def _p_value_matrix(k, results):
+    p_values = np.full((k, k), np.nan)
+    np.fill_diagonal(p_values, 1.0)
+    for (i, j), (p_value, _) in results.items():
+        p_values[i, j] = p_values[j, i] = p_value
+    return p_values
+
+
+_WORKER_GROUPS = None
+
+
+def _init_worker(groups):
+    global _WORKER_GROUPS
+    _WORKER_GROUPS = groups
+
+
+def _worker_batch(kind, i, j, paired, seed, size):
+    return resample_batch(kind, _WORKER_GROUPS[i], _WORKER_GROUPS[j], paired, seed, size)
@@ -0,0 +1,316 @@
+"""
+Local render server: keeps warm worker processes (imports, fonts and statistics caches) between figures.
+
+    python functions_server_v0.py serve --port 8765 --workers 4
+    python functions_server_v0.py render job.json [more_jobs.json ...]
+    python functions_server_v0.py status
+    python functions_server_v0.py stop
+
+A job is a JSON object:
+
+    {"plot": "plot_violins_generalized",
+     "dataset": [[0.1, 0.4, ...], [0.3, ...]]            # inline samples, one list per group
+                | "groups.npy" | ["W.npy", "N1.npy"]     # or .npy files (2-D array or one per group)
+                | {"path": "table.parquet", "value": "value", "group": "cond"},  # or a long-form table
+     "labels": ["W", "N1"],
+     "options": {"filename": "out/metric_1", "plot_title": "Metric 1"},
+     "figsize": [10, 7]}
+
+as for render_batch (saveplot defaults to true). Relative paths are taken
+from the directory the client runs in.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from functions_batch_v0 import PLOT_FUNCTIONS, BatchResult, _init_batch_worker, _render_job
+from functions_workers_v0 import usable_cpus
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class RenderServer:
+    """
+    Pool of warm worker processes rendering job specs with the plotting functions.
+
+    Each worker imports matplotlib (Agg), seaborn, scipy and the plotting
+    modules, and builds the font cache, once when it starts; it then keeps its
+    statistics cache (STATS_CACHE) between jobs, so a figure re-rendered with
+    unchanged groups reuses their box statistics, KDEs and p-values. A worker
+    that dies is replaced by a new pool; the jobs it was running are reported
+    as failed.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of worker processes. Defaults to the number of usable CPUs
+        (functions_workers_v0.usable_cpus).
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or usable_cpus()
+        self.started = time.time()
+        self.jobs = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._start_pool()
+
+    def _start_pool(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_server_worker)
+        # Start (and warm) every worker now rather than on the first jobs
+        for future in [self._executor.submit(os.getpid) for _ in range(self.max_workers)]:
+            future.result()
+
+    def render(self, specs):
+        """
+        Render job specs (see the module docstring) on the workers.
+
+        Returns
+        -------
+        list of BatchResult
+            One per spec, in the order of `specs`.
+        """
+        with self._lock:
+            executor = self._executor
+        futures = [executor.submit(_serve_job, index, spec) for index, spec in enumerate(specs)]
+        results = []
+        for index, (future, spec) in enumerate(zip(futures, specs)):
+            filename = (spec.get('options') or {}).get('filename', 'filename')
+            try:
+                results.append(future.result())
+            except Exception:
+                # The worker died (e.g. killed or out of memory): report it like any other failure
+                results.append(BatchResult(index, filename, [], traceback.format_exc(), None))
+        with self._lock:
+            self.jobs += len(results)
+            self.failures += sum(result.error is not None for result in results)
+            if executor is self._executor and any(isinstance(f.exception(), BrokenProcessPool) for f in futures):
+                executor.shutdown(wait=False)
+                self._start_pool()
+        return results
+
+    def status(self):
+        """Workers, uptime in seconds and jobs rendered (and failed) so far."""
+        with self._lock:
+            return dict(pid=os.getpid(), workers=self.max_workers, uptime=time.time() - self.started,
+                        jobs=self.jobs, failures=self.failures)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, max_workers=None):
+    """
+    Serve render jobs over HTTP until a client asks the server to stop.
+
+    Endpoints: POST /render (a job or a list of jobs, as JSON; answers the
+    list of results), GET /status and POST /stop. The server only listens on
+    `host`, by default the local interface.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    renderer = RenderServer(max_workers)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/status':
+                self._reply(200, renderer.status())
+            else:
+                self._reply(404, {'error': f'unknown endpoint {self.path}'})
+
+        def do_POST(self):
+            if self.path == '/stop':
+                self._reply(200, {'stopping': True})
+                threading.Thread(target=httpd.shutdown).start()
+                return
+            if self.path != '/render':
+                self._reply(404, {'error': f'unknown endpoint {self.path}'})
+                return
+            try:
+                specs = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError as error:
+                self._reply(400, {'error': f'invalid JSON: {error}'})
+                return
+            if isinstance(specs, dict):
+                specs = [specs]
+            self._reply(200, [result._asdict() for result in renderer.render(specs)])
+
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    print(f"Rendering on http://{host}:{port} with {renderer.max_workers} warm workers")
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        renderer.close()
+
+
+def render_remote(specs, url=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}', timeout=None):
+    """
+    Render job specs on a running server.
+
+    Parameters
+    ----------
+    specs : dict or list of dict
+        Job specs (see the module docstring). Relative data and output paths
+        are made absolute from the current directory.
+    url : str
+        Address of the server.
+    timeout : float, optional
+        Seconds to wait for the whole request.
+
+    Returns
+    -------
+    list of BatchResult
+        One per spec, in order.
+    """
+    if isinstance(specs, dict):
+        specs = [specs]
+    body = json.dumps([_absolute_paths(spec) for spec in specs]).encode()
+    request = urllib.request.Request(f'{url}/render', data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return [BatchResult(**result) for result in json.loads(response.read())]
+
+
+def load_dataset(dataset, labels=None):
+    """
+    Samples of a job spec: inline lists, .npy paths or a Parquet table.
+
+    Parameters
+    ----------
+    dataset : list, str or dict
+        One list of values (or one .npy path) per group; a .npy path holding
+        a 2-D array (one row per group); a .parquet path, read as the
+        long-form DataFrame (e.g. for plot_boxes_W_N3); or a dict with 'path'
+        to a .parquet table and its 'value' and 'group' columns, split into
+        the groups named by `labels`.
+    labels : list, optional
+        Group labels, in plotting order.
+    """
+    import numpy as np
+
+    if isinstance(dataset, dict):
+        import pandas as pd
+
+        table = pd.read_parquet(dataset['path'])
+        indices = table.groupby(dataset.get('group', 'cond'), sort=False).indices
+        if labels is None:
+            labels = list(indices)
+        values = table[dataset.get('value', 'value')].to_numpy(dtype=float)
+        return [values[indices.get(label, [])] for label in labels]
+    if isinstance(dataset, str):
+        if dataset.endswith('.parquet'):
+            import pandas as pd
+
+            return pd.read_parquet(dataset)
+        return np.load(dataset, allow_pickle=False)
+    return [np.load(group, allow_pickle=False) if isinstance(group, str) else np.asarray(group, dtype=float)
+            for group in dataset]
+
+
+def _absolute_paths(spec):
+    spec = dict(spec)
+    dataset = spec.get('dataset')
+    if isinstance(dataset, str):
+        spec['dataset'] = os.path.abspath(dataset)
+    elif isinstance(dataset, dict):
+        spec['dataset'] = dict(dataset, path=os.path.abspath(dataset['path']))
+    elif isinstance(dataset, list):
+        spec['dataset'] = [os.path.abspath(group) if isinstance(group, str) else group for group in dataset]
+    options = dict(spec.get('options') or {})
+    options['filename'] = os.path.abspath(options.get('filename', 'filename'))
+    spec['options'] = options
+    return spec
+
+
+def _init_server_worker():
+    import importlib
+    import io
+
+    _init_batch_worker()
+    import matplotlib.pyplot as plt
+    import scipy.stats  # noqa: F401
+    import seaborn  # noqa: F401
+
+    for module in set(PLOT_FUNCTIONS.values()):
+        importlib.import_module(module)
+    # Builds the font cache and loads the fonts the figures use
+    fig, ax = plt.subplots()
+    ax.set_title('warm-up')
+    fig.savefig(io.BytesIO(), format='png')
+    plt.close(fig)
+
+
+def _serve_job(index, spec):
+    options = dict(spec.get('options') or {})
+    try:
+        labels = spec.get('labels')
+        dataset = load_dataset(spec['dataset'], labels)
+        plot = spec.get('plot', 'plot_boxes_generalized')
+        if plot not in PLOT_FUNCTIONS:
+            raise ValueError(f"plot must be one of {list(PLOT_FUNCTIONS)}, but got {plot!r}")
+    except Exception:
+        return BatchResult(index, options.get('filename', 'filename'), [], traceback.format_exc(), None)
+    return _render_job(index, plot, dataset, labels, options, tuple(spec.get('figsize', (10, 7))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}', help='server address (clients)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='start the server')
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, help='worker processes (default: number of usable CPUs)')
+    render_parser = commands.add_parser('render', help='render job files (JSON: a job or a list of jobs)')
+    render_parser.add_argument('jobs', nargs='+')
+    commands.add_parser('status', help='print the state of the server')
+    commands.add_parser('stop', help='stop the server')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.host, args.port, args.workers)
+        return 0
+    if args.command in ('status', 'stop'):
+        request = urllib.request.Request(f'{args.url}/{args.command}',
+                                         data=b'' if args.command == 'stop' else None)
+        with urllib.request.urlopen(request) as response:
+            print(json.dumps(json.loads(response.read()), indent=2))
+        return 0
+
+    specs = []
+    for path in args.jobs:
+        with open(path) as f:
+            loaded = json.load(f)
+        specs.extend(loaded if isinstance(loaded, list) else [loaded])
+    failed = False
+    for result in render_remote(specs, args.url):
+        if result.error is None:
+            print('\n'.join(result.paths))
+        else:
+            failed = True
+            print(f"⚠️ {result.filename} failed:\n{result.error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import numpy as np
+
+# Boundaries between the asterisk levels of significance_asterisks
+SIGNIFICANCE_LEVELS = (1e-5, 1e-4, 1e-3, 1e-2, 0.05)
+
+def significance_asterisks(p_value):
+    """
+    Translate a p-value into the asterisk notation used on the brackets.
+
+    Parameters
+    ----------
+    p_value : float
+        p-value of the test. NaN is reported as not significant.
+
+    Returns
+    -------
+    str
+        From '*' (p < 0.05) up to '*****' (p < 1e-5), or '(n.s.)'.
+    """
+    # One asterisk per level the p-value is below (NaN is below none)
+    for stars, level in zip(range(len(SIGNIFICANCE_LEVELS), 0, -1), SIGNIFICANCE_LEVELS):
+        if p_value < level:
+            return '*' * stars
+    return '(n.s.)'
+
+
+def pairwise_ranksums(groups):
+    """
+    Wilcoxon rank-sum test (scipy.stats.ranksums) for every pair of groups.
+
+    Each group is sorted once. The rank sums of all the pairs are then obtained
+    with one batched searchsorted per group over the pooled data, instead of
+    ranking the concatenation of every pair separately.
+
+    Parameters
+    ----------
+    groups : sequence of array-like
+        The samples, one 1-D array per group.
+
+    Returns
+    -------
+    p_values : ndarray, shape (k, k)
+        Two-sided p-values. p_values[i, j] is the p-value of group i against
+        group j (the matrix is symmetric, with ones on the diagonal). Pairs
+        involving an empty group or a group containing NaN are NaN, as in scipy.
+    """
+    from scipy.special import ndtr
+
+    sorted_groups = [np.sort(np.asarray(g, dtype=float).ravel()) for g in groups]
+    k = len(sorted_groups)
+    n = np.array([g.size for g in sorted_groups], dtype=float)
+    offsets = np.concatenate(([0], np.cumsum([g.size for g in sorted_groups]))).astype(int)
+    pooled = np.concatenate(sorted_groups) if k else np.empty(0)
+
+    # u[i, j] = #{(x, y): x in i, y in j, x > y} + 0.5 * #{x == y}, i.e. the
+    # Mann-Whitney U of group i against group j.
+    u = np.zeros((k, k))
+    for j, group in enumerate(sorted_groups):
+        if group.size == 0:
+            continue
+        below = np.searchsorted(group, pooled, side='left')
+        below_or_tied = np.searchsorted(group, pooled, side='right')
+        cumulative = np.concatenate(([0.0], np.cumsum(0.5 * (below + below_or_tied))))
+        u[:, j] = cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+    n_i = n[:, None]
+    n_j = n[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Rank sum of i minus its expectation is U - n_i * n_j / 2
+        z = (u - n_i * n_j / 2) / np.sqrt(n_i * n_j * (n_i + n_j + 1) / 12)
+    p_values = 2 * ndtr(-np.abs(z))
+
+    invalid = (n == 0) | np.array([g.size > 0 and np.isnan(g[-1]) for g in sorted_groups], dtype=bool)
+    p_values[invalid, :] = np.nan
+    p_values[:, invalid] = np.nan
+    return p_values
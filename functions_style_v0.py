@@ -0,0 +1,72 @@
+from functions_lazy_v0 import lazy_import
+
+sns = lazy_import('seaborn')
+
+# seaborn's "notebook" plotting context, which the other named contexts scale
+_NOTEBOOK_CONTEXT = {
+    'axes.linewidth': 1.25, 'grid.linewidth': 1, 'lines.linewidth': 1.5, 'lines.markersize': 6,
+    'patch.linewidth': 1, 'xtick.major.width': 1.25, 'ytick.major.width': 1.25,
+    'xtick.minor.width': 1, 'ytick.minor.width': 1, 'xtick.major.size': 6, 'ytick.major.size': 6,
+    'xtick.minor.size': 4, 'ytick.minor.size': 4, 'font.size': 12, 'axes.labelsize': 12,
+    'axes.titlesize': 12, 'xtick.labelsize': 11, 'ytick.labelsize': 11, 'legend.fontsize': 11,
+    'legend.title_fontsize': 12,
+}
+_CONTEXT_SCALES = {'paper': 0.8, 'notebook': 1, 'talk': 1.5, 'poster': 2}
+# Only the font sizes follow font_scale
+_FONT_KEYS = ('font.size', 'axes.labelsize', 'axes.titlesize', 'xtick.labelsize', 'ytick.labelsize',
+              'legend.fontsize', 'legend.title_fontsize')
+
+def plotting_context(font_scale=1.4, context='notebook'):
+    """
+    rc values of a seaborn plotting context (fonts, line widths, tick sizes), without setting them.
+
+    Unlike sns.set_context, nothing global changes: the values are applied
+    to one Axes by apply_context. The named contexts ('paper', 'notebook',
+    'talk', 'poster') are computed here, as seaborn does, so plotting does not
+    import seaborn; other contexts (a dict, or None for the current one) are
+    passed to sns.plotting_context.
+    """
+    if not isinstance(context, str) or context not in _CONTEXT_SCALES:
+        return dict(sns.plotting_context(context, font_scale=font_scale))
+    rc = {key: value * _CONTEXT_SCALES[context] for key, value in _NOTEBOOK_CONTEXT.items()}
+    for key in _FONT_KEYS:
+        rc[key] *= font_scale
+    return rc
+
+
+def apply_context(ax, rc):
+    """
+    Style one Axes from plotting context rc values, leaving rcParams untouched.
+
+    The title, axis labels, tick labels, ticks, spines, grid lines and legend
+    of `ax` get the sizes sns.set_context would have given them had it been
+    called before the figure was created. Figures styled this way can be
+    built at the same time in several threads, each with its own font scale.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to style, after its labels and legend are set.
+    rc : dict
+        Values returned by plotting_context.
+    """
+    import matplotlib as mpl
+
+    ax.title.set_fontsize(rc['axes.titlesize'])
+    ax.xaxis.label.set_fontsize(rc['axes.labelsize'])
+    ax.yaxis.label.set_fontsize(rc['axes.labelsize'])
+    for axis in ('x', 'y'):
+        ax.tick_params(axis=axis, which='major', labelsize=rc[f'{axis}tick.labelsize'],
+                       width=rc[f'{axis}tick.major.width'], length=rc[f'{axis}tick.major.size'])
+        ax.tick_params(axis=axis, which='minor', width=rc[f'{axis}tick.minor.width'],
+                       length=rc[f'{axis}tick.minor.size'])
+    ax.tick_params(grid_linewidth=rc['grid.linewidth'])
+    for spine in ax.spines.values():
+        spine.set_linewidth(rc['axes.linewidth'])
+
+    legend = ax.get_legend()
+    if legend is not None:
+        # Relative sizes ('small'...) were resolved against rcParams['font.size']
+        scale = rc['font.size'] / mpl.rcParams['font.size']
+        for text in [*legend.get_texts(), legend.get_title()]:
+            text.set_fontsize(text.get_fontsize() * scale)
@@ -0,0 +1,223 @@
+import numpy as np
+
+# Values read per step when a memory-mapped array is streamed
+CHUNK_SIZE = 2 ** 22
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (a merging t-digest) for data that does not fit in memory.
+
+    The samples are summarised by weighted centroids, small at the tails and
+    larger in the middle, so quantiles are accurate everywhere and extremes
+    are nearly exact. The count, sum, minimum and maximum are kept exactly.
+    Sketches of different chunks (or processes) can be merged, and the result
+    does not depend on how the data was split beyond the approximation.
+
+    Parameters
+    ----------
+    compression : float
+        Number of centroids is about `compression`; the rank error of the
+        median is about 1 / compression.
+
+    Examples
+    --------
+    >>> sketch = QuantileSketch()
+    >>> for chunk in chunks:
+    ...     sketch.update(chunk)
+    >>> sketch.quantile([0.25, 0.5, 0.75])
+    """
+
+    def __init__(self, compression=500):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, chunk):
+        """Add the finite values of `chunk`; returns the sketch."""
+        chunk = np.asarray(chunk, dtype=float).ravel()
+        if not np.isfinite(chunk).all():
+            chunk = chunk[np.isfinite(chunk)]
+        if chunk.size == 0:
+            return self
+        self.count += chunk.size
+        self.total += chunk.sum()
+        self.min = min(self.min, chunk.min())
+        self.max = max(self.max, chunk.max())
+        # Two sorted runs, which the stable sort in _compress merges in linear time
+        self._compress(np.concatenate((self.means, np.sort(chunk))),
+                       np.concatenate((self.weights, np.ones(chunk.size))))
+        return self
+
+    def merge(self, other):
+        """Fold the sketch `other` into this one; returns the sketch."""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate((self.means, other.means)),
+                       np.concatenate((self.weights, other.weights)))
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def quantile(self, q):
+        """Estimated quantile(s) at `q` in [0, 1]."""
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+        # Each centroid sits at the middle of its rank range; the extremes are exact
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(q * self.count, np.concatenate(([0], ranks, [self.count])),
+                         np.concatenate(([self.min], self.means, [self.max])))
+
+    def summary(self, whis=1.5):
+        """Box-plot statistics, in the format of box_summary."""
+        if self.count == 0:
+            return _empty_summary()
+        q1, med, q3 = self.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        low, high = q1 - whis * iqr, q3 + whis * iqr
+        whislo = self.min if self.min >= low else self._whisker(low, upper=False)
+        whishi = self.max if self.max <= high else self._whisker(high, upper=True)
+        return {
+            'mean': self.mean, 'iqr': iqr, 'q1': q1, 'med': med, 'q3': q3,
+            'whislo': max(min(whislo, q1), self.min), 'whishi': min(max(whishi, q3), self.max),
+            'cilo': med - 1.57 * iqr / np.sqrt(self.count), 'cihi': med + 1.57 * iqr / np.sqrt(self.count),
+            'fliers': np.empty(0),
+        }
+
+    def _whisker(self, fence, upper):
+        """Estimated furthest sample on the inner side of `fence`."""
+        # Centroids next to the fence: the last one inside and the first one outside
+        inside = np.searchsorted(self.means, fence, side='right') - 1 if upper else np.searchsorted(self.means, fence)
+        outside = inside + 1 if upper else inside - 1
+        neighbours = [i for i in (inside, outside) if 0 <= i < self.means.size]
+        if 0 <= inside < self.means.size and all(self.weights[i] == 1 for i in neighbours):
+            # Single samples around the fence (sparse tail): the whisker is one of them
+            return self.means[inside]
+        # Dense around the fence: samples lie arbitrarily close to it
+        return fence
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        if means.size <= self.compression:
+            self.means, self.weights = means, weights
+            return
+        # Centroids whose left rank falls in the same unit of the k1 scale
+        # function (arcsin) are merged; units are narrow near q = 0 and 1
+        left = (np.cumsum(weights) - weights) / self.count
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * left - 1))
+        starts = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+
+def box_summary(values, whis=1.5):
+    """
+    Exact box-plot statistics of the finite samples in `values`.
+
+    Returns
+    -------
+    dict
+        The statistics Axes.bxp draws, as matplotlib.cbook.boxplot_stats
+        returns them: 'q1', 'med', 'q3', 'whislo', 'whishi', 'mean', 'iqr',
+        'cilo', 'cihi' and 'fliers'.
+    """
+    from matplotlib.cbook import boxplot_stats
+
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return _empty_summary()
+    stats = boxplot_stats(values, whis=whis)[0]
+    stats.pop('label', None)
+    return stats
+
+
+def summarize_groups(dataset, whis=1.5, compression=500, chunk_size=CHUNK_SIZE):
+    """
+    Box-plot statistics of each group, or None if every group is an in-memory array.
+
+    A group may be:
+
+    - a dict of precomputed statistics with at least 'q1', 'med', 'q3',
+      'whislo' and 'whishi' ('mean' and 'fliers' are optional);
+    - a QuantileSketch;
+    - an iterator of chunks (e.g. a generator reading a file piece by piece),
+      streamed once through a QuantileSketch;
+    - a numpy.memmap (e.g. np.load(path, mmap_mode='r')), streamed the same
+      way `chunk_size` values at a time;
+    - an in-memory array, summarised exactly.
+
+    Parameters
+    ----------
+    dataset : list or numpy.memmap
+        One entry per group, as above, or a 2-D memory-mapped array with one
+        group per row. Anything else (e.g. a 2-D in-memory array) is left to
+        the sample-based path.
+    whis : float
+        Whisker reach, in interquartile ranges.
+    compression : float
+        Compression of the sketches built from chunks.
+    chunk_size : int
+        Values read per step from a memory-mapped array.
+
+    Returns
+    -------
+    list of dict or None
+        Statistics in the format of box_summary.
+    """
+    if isinstance(dataset, np.memmap):
+        # One group per row, each still memory-mapped
+        dataset = list(dataset)
+    elif not isinstance(dataset, (list, tuple)):
+        return None
+    if not any(_is_summary_input(group) for group in dataset):
+        return None
+
+    stats = []
+    for group in dataset:
+        if isinstance(group, dict):
+            missing = {'q1', 'med', 'q3', 'whislo', 'whishi'} - set(group)
+            if missing:
+                raise ValueError(f"Summary is missing {sorted(missing)}")
+            stats.append({'fliers': np.empty(0), **group})
+        elif isinstance(group, QuantileSketch):
+            stats.append(group.summary(whis))
+        elif isinstance(group, np.memmap):
+            flat = group.reshape(-1)
+            sketch = QuantileSketch(compression)
+            for start in range(0, flat.size, chunk_size):
+                sketch.update(flat[start:start + chunk_size])
+            stats.append(sketch.summary(whis))
+        elif _is_iterator(group):
+            sketch = QuantileSketch(compression)
+            for chunk in group:
+                sketch.update(chunk)
+            stats.append(sketch.summary(whis))
+        else:
+            stats.append(box_summary(group, whis))
+    return stats
+
+
+def _is_iterator(group):
+    return hasattr(group, '__next__') and iter(group) is group
+
+
+def _is_summary_input(group):
+    return isinstance(group, (dict, QuantileSketch, np.memmap)) or _is_iterator(group)
+
+
+def _empty_summary():
+    stats = dict.fromkeys(['mean', 'iqr', 'q1', 'med', 'q3', 'whislo', 'whishi', 'cilo', 'cihi'], np.nan)
+    stats['fliers'] = np.empty(0)
+    return stats
@@ -0,0 +1,192 @@
+import numpy as np
+from matplotlib.artist import allow_rasterization
+from matplotlib.collections import PathCollection
+from matplotlib.markers import MarkerStyle
+from matplotlib.transforms import IdentityTransform
+
+from functions_profile_v0 import stage
+from functions_swarm_v0 import beeswarm_offsets, level_of_detail
+
+class SwarmCollection(PathCollection):
+    """
+    Scatter of one or more swarms whose layout is computed at draw time.
+
+    The layout is done in display coordinates when the figure is drawn (as
+    seaborn does), so it stays free of overlaps after the axis limits or the
+    figure size change. It is only recomputed when the axis scales changed
+    relative to the marker size since the last draw.
+
+    Parameters
+    ----------
+    values : array-like
+        y value of every point.
+    centers : array-like or float
+        x position of the swarm each point belongs to.
+    point_size : float
+        Marker diameter in points (as in seaborn's swarmplot).
+    width : float
+        Width available to each swarm, in data units.
+    marker : str
+        Matplotlib marker.
+    max_points : int, optional
+        Level of detail: draw at most this many points per swarm (at least
+        2), chosen by functions_swarm_v0.level_of_detail. Per-point face
+        colours are subsampled with the points.
+    min_point_size : float, optional
+        Fit the swarms to their width: while more than 5% of the points of a
+        swarm cannot be placed, the markers shrink by steps, down to this
+        diameter in points. By default they keep point_size.
+    **kwargs :
+        Passed to matplotlib.collections.PathCollection (facecolors, alpha...).
+
+    Attributes
+    ----------
+    sample_counts : list of (int, int)
+        Points drawn and points given for each swarm, by increasing centre.
+    """
+
+    def __init__(self, values, centers, point_size=6, width=0.8, marker='o', max_points=None,
+                 min_point_size=None, **kwargs):
+        # As given (e.g. one centre for the whole swarm), so set_values can change the number of points
+        self._given_centers = np.asarray(centers, dtype=float)
+        self._max_points = max_points
+        self._select(values)
+        facecolors = kwargs.get('facecolors')
+        if self._shown is not None and np.ndim(facecolors) == 2 and len(facecolors) == self._n_given:
+            kwargs['facecolors'] = np.asarray(facecolors)[self._shown]
+        self._point_size = point_size
+        self._min_point_size = point_size if min_point_size is None else min(min_point_size, point_size)
+        self._half_width = width / 2
+        self._layout_key = None
+        self._fit_group = None
+        self._warned = False
+        marker = MarkerStyle(marker)
+        path = marker.get_path().transformed(marker.get_transform())
+        kwargs.setdefault('linewidths', 0)
+        # Marker paths are in points (as in ax.scatter), only the offsets are in data units
+        kwargs.setdefault('transform', IdentityTransform())
+        super().__init__((path,), sizes=[point_size ** 2],
+                         offsets=np.column_stack((self._centers, self._values)), **kwargs)
+
+    def set_values(self, values, centers=None, facecolors=None):
+        """
+        Replace the points (and optionally their swarm centres); the layout is redone on the next draw.
+
+        Without `centers`, the centres given before are kept; the number of
+        points can only change if they were given as one centre. `facecolors`
+        (one per point given) is subsampled as the points are.
+        """
+        if centers is not None:
+            self._given_centers = np.asarray(centers, dtype=float)
+        self._select(values)
+        # The swarms fitted with this one may get another marker size
+        for swarm in self._fit_group or [self]:
+            swarm._layout_key = None
+        self.set_offsets(np.column_stack((self._centers, self._values)))
+        if facecolors is not None:
+            self.set_facecolor(facecolors if self._shown is None else np.asarray(facecolors)[self._shown])
+
+    def swarm_colors(self):
+        """Face colour of each swarm (of its first point), by increasing centre."""
+        facecolors = self.get_facecolor()
+        if len(facecolors) <= 1:
+            return [facecolors[0] if len(facecolors) else None] * len(self.sample_counts)
+        _, first = np.unique(self._centers, return_index=True)
+        return list(facecolors[first])
+
+    def _select(self, values):
+        # Points drawn: all of them, or the level-of-detail subsample of each swarm
+        values = np.asarray(values, dtype=float).ravel()
+        centers = np.broadcast_to(self._given_centers, values.shape)
+        self._n_given = values.size
+        self._shown = None
+        unique, totals = np.unique(centers, return_counts=True)
+        self.sample_counts = [(int(total), int(total)) for total in totals]
+        if self._max_points is not None and totals.size and totals.max() > self._max_points:
+            shown = []
+            for index, center in enumerate(unique):
+                members = np.flatnonzero(centers == center)
+                members = members[level_of_detail(values[members], self._max_points)]
+                self.sample_counts[index] = (members.size, int(totals[index]))
+                shown.append(members)
+            self._shown = np.sort(np.concatenate(shown))
+            values, centers = values[self._shown], centers[self._shown]
+        self._values = values
+        self._centers = centers.copy()
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if self.get_visible():
+            self._layout(renderer)
+        super().draw(renderer)
+
+    def _layout(self, renderer):
+        transform = self.get_offset_transform()
+        diameter = renderer.points_to_pixels(self._point_size)
+        if self._values.size == 0 or diameter <= 0:
+            return
+        # The layout in data units only depends on the axis scales relative to
+        # the marker size, not on translations (tight bbox) or on the dpi
+        matrix = transform.get_matrix()
+        key = (round(matrix[0, 0] / diameter, 9), round(matrix[1, 1] / diameter, 9))
+        if key == self._layout_key:
+            return
+        # Swarms fitted together (see swarm_scatter) are laid out at once, with
+        # one marker size: the largest that fits all of them
+        swarms = [swarm for swarm in self._fit_group or [self] if swarm._values.size]
+        with stage('swarm_layout'):
+            fits = [swarm._fit(transform, diameter) for swarm in swarms]
+            size = min(own_size for own_size, _ in fits)
+            for swarm, (own_size, placed) in zip(swarms, fits):
+                if own_size != size:
+                    placed = swarm._place(transform, size)
+                swarm._apply(placed, size / diameter)
+                swarm._layout_key = key
+
+    def _fit(self, transform, diameter):
+        """Largest marker diameter (in pixels, down to min_point_size) at which the points fit, and the layout."""
+        placed = self._place(transform, diameter)
+        smallest = diameter * self._min_point_size / self._point_size
+        if placed[1] <= 0.05 or smallest >= diameter:
+            return diameter, placed
+        fitted = self._place(transform, smallest)
+        if fitted[1] > 0.05:
+            return smallest, fitted
+        # To within a few percent (bisection of the diameter)
+        low, high = smallest, diameter
+        for _ in range(4):
+            middle = np.sqrt(low * high)
+            placed = self._place(transform, middle)
+            if placed[1] <= 0.05:
+                low, fitted = middle, placed
+            else:
+                high = middle
+        return low, fitted
+
+    def _apply(self, placed, scale):
+        x, overflow, center = placed
+        self.set_sizes([(self._point_size * scale) ** 2])
+        if overflow > 0.05 and not self._warned:
+            print(f"⚠️ {overflow:.0%} of the points at x = {center:g} cannot be placed in the swarm; "
+                  f"you may want to decrease point_size.")
+            self._warned = True
+        self._offsets = np.column_stack((x, self._values))
+
+    def _place(self, transform, diameter):
+        """x of every point laid out with markers of `diameter` pixels, and the worst overflow (and its swarm)."""
+        display = transform.transform(np.column_stack((self._centers, self._values)))
+        x = self._centers.copy()
+        worst, worst_center = 0.0, None
+        for center in np.unique(self._centers):
+            members = np.flatnonzero(self._centers == center)
+            (left, _), (right, _) = transform.transform([[center - self._half_width, 0],
+                                                         [center + self._half_width, 0]])
+            max_offset = max(abs(right - left) / 2 - diameter / 2, 0)
+            shifted = display[members].copy()
+            offsets = beeswarm_offsets(shifted[:, 1], diameter, max_offset)
+            shifted[:, 0] += offsets
+            x[members] = transform.inverted().transform(shifted)[:, 0]
+            overflow = np.mean(np.abs(offsets) >= max_offset) if max_offset > 0 else 0
+            if overflow > worst:
+                worst, worst_center = overflow, center
+        return x, worst, worst_center
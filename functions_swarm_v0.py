@@ -0,0 +1,215 @@
+import numpy as np
+
+def beeswarm_offsets(y, diameter, max_offset=np.inf):
+    """
+    Horizontal offsets that place circles of the given diameter without overlap.
+
+    Sorted-sweep layout: points are placed in increasing y order, each one at
+    the free position closest to the centre line. Only the already placed
+    points less than one diameter below can collide, and they are a contiguous
+    window of the sorted order, so the cost is near O(n log n) for the usual
+    swarm widths. The result is deterministic.
+
+    Parameters
+    ----------
+    y : array-like
+        Positions along the value axis, in the same units as `diameter`
+        (usually display pixels).
+    diameter : float
+        Marker diameter.
+    max_offset : float, optional
+        Offsets are clipped to [-max_offset, max_offset]; points that do not
+        fit overlap at the edges.
+
+    Returns
+    -------
+    offsets : ndarray
+        One offset per point, in the order of `y`. NaN values get offset 0.
+    """
+    y = np.asarray(y, dtype=float)
+    offsets = np.zeros(y.shape)
+    finite = np.flatnonzero(np.isfinite(y))
+    if finite.size == 0 or diameter <= 0:
+        return offsets
+
+    order = finite[np.argsort(y[finite], kind='stable')]
+    ys = y[order]
+    xs = np.zeros(ys.size)
+    # Points placed inside the swarm width, in y order. Points that overflow
+    # are clipped to the edge and kept out of it, so the collision window
+    # stays bounded by the swarm width.
+    placed_x = np.empty(ys.size)
+    placed_y = np.empty(ys.size)
+    n_placed = 0
+    first = 0
+    squared_diameter = diameter * diameter
+
+    for i, yi in enumerate(ys):
+        # Only placed points less than one diameter below can collide
+        while first < n_placed and placed_y[first] <= yi - diameter:
+            first += 1
+        x = 0.0
+        if first < n_placed:
+            dy = yi - placed_y[first:n_placed]
+            reach = np.sqrt(squared_diameter - dy * dy)
+            # Forbidden intervals (x - reach, x + reach), merged into disjoint blocks
+            left = placed_x[first:n_placed] - reach
+            by_left = np.argsort(left, kind='stable')
+            left = left[by_left]
+            right = np.maximum.accumulate((placed_x[first:n_placed] + reach)[by_left])
+            block_starts = np.flatnonzero(np.concatenate(([True], left[1:] > right[:-1])))
+            block = np.searchsorted(left[block_starts], 0.0, side='left') - 1
+            if block >= 0:
+                block_end = right[block_starts[block + 1] - 1] if block + 1 < block_starts.size else right[-1]
+                if block_end > 0.0:
+                    block_start = left[block_starts[block]]
+                    x = block_start if -block_start < block_end else block_end
+        if abs(x) > max_offset:
+            xs[i] = max_offset if x > 0 else -max_offset
+            continue
+        xs[i] = x
+        placed_x[n_placed] = x
+        placed_y[n_placed] = yi
+        n_placed += 1
+
+    offsets[order] = xs
+    return offsets
+
+
+def level_of_detail(values, max_points):
+    """
+    Indices of a subsample of at most `max_points` values that keeps their distribution.
+
+    Both extremes and every outlier (beyond 1.5 IQR from the quartiles, as
+    the box whiskers) are kept, as long as the outliers take at most half of
+    `max_points`. The other values are split into strata of equal counts in
+    sorted order and the median of each stratum is kept, so they keep their
+    quantiles and the swarm its shape, while the sparse outliers are all
+    drawn. With more outliers (heavy tails), the tails are thinned in the
+    same way as the rest. The selection is deterministic. NaNs are never
+    selected.
+
+    Parameters
+    ----------
+    values : array-like
+        Values of one group.
+    max_points : int
+        Number of points to keep, at least 2 (the two extremes).
+
+    Returns
+    -------
+    ndarray of int
+        Sorted indices into `values`, at most `max_points` of them.
+    """
+    if max_points < 2:
+        raise ValueError(f"max_points must be at least 2 (both extremes are kept), but got {max_points!r}")
+    values = np.asarray(values, dtype=float).ravel()
+    finite = np.flatnonzero(~np.isnan(values))
+    if finite.size <= max_points:
+        return finite
+    order = finite[np.argsort(values[finite], kind='stable')]
+    sorted_values = values[order]
+    q1, q3 = np.percentile(sorted_values, [25, 75])
+    spread = 1.5 * (q3 - q1)
+    # Outliers are at both ends of the sorted order; the extremes are always kept
+    low = max(np.searchsorted(sorted_values, q1 - spread, side='left'), 1)
+    high = min(np.searchsorted(sorted_values, q3 + spread, side='right'), order.size - 1)
+    if low + order.size - high > max_points // 2:
+        low, high = 1, order.size - 1
+    budget = max(max_points - (low + order.size - high), 0)
+    # Median rank of each of `budget` strata of equal counts
+    inner = low + ((np.arange(budget) + 0.5) * (high - low) / max(budget, 1)).astype(int)
+    return np.sort(np.concatenate((order[:low], order[inner], order[high:])))
+
+
+def sample_legend(ax, swarms, labels, **kwargs):
+    """
+    Legend giving the fraction of the points drawn for each downsampled group.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes of the swarms.
+    swarms : list of SwarmCollection
+        The swarms, whose groups (in order) match `labels`.
+    labels : list
+        Label of each group.
+    **kwargs :
+        Passed to ax.legend.
+
+    Returns
+    -------
+    matplotlib.legend.Legend or None
+        None (and no legend) when every point is drawn.
+    """
+    from matplotlib.lines import Line2D
+
+    counts = [count for swarm in swarms for count in swarm.sample_counts]
+    colors = [color for swarm in swarms for color in swarm.swarm_colors()]
+    handles = [Line2D([], [], linestyle='', marker='o', color=color,
+                      label=f"{label}: {shown:,} of {total:,} points ({shown / total:.1%})")
+               for label, color, (shown, total) in zip(labels, colors, counts) if shown < total]
+    legend = ax.get_legend()
+    if not handles:
+        if legend is not None and legend.get_title().get_text() == 'Points drawn':
+            legend.remove()
+        return None
+    # Outside the axes, clear of the data and the brackets (saved figures are cropped to fit it)
+    kwargs.setdefault('loc', 'upper left')
+    kwargs.setdefault('bbox_to_anchor', (1.01, 1))
+    kwargs.setdefault('borderaxespad', 0)
+    if legend is not None:
+        # Sizes of the legend it replaces, which may have been styled (see apply_context)
+        kwargs.setdefault('fontsize', legend.get_texts()[0].get_fontsize() if legend.get_texts() else 'small')
+        kwargs.setdefault('title_fontsize', legend.get_title().get_fontsize())
+    kwargs.setdefault('fontsize', 'small')
+    return ax.legend(handles=handles, title='Points drawn', **kwargs)
+
+
+def swarm_scatter(ax, groups, colors, positions=None, point_size=6, width=0.8, max_points=None, **kwargs):
+    """
+    Draw one beeswarm per group.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on.
+    groups : sequence of array-like
+        Samples of each group (e.g. a GroupedData).
+    colors : list
+        One colour per group.
+    positions : array-like, optional
+        x position of each group. Defaults to 0, 1, ..., k - 1.
+    point_size : float
+        Marker diameter in points.
+    width : float
+        Width of each swarm in data units.
+    max_points : int, optional
+        Draw at most this many points per group (plus its outliers), chosen
+        by level_of_detail; see sample_legend to report the fractions.
+    **kwargs :
+        Passed to functions_swarm_collection_v0.SwarmCollection (zorder,
+        alpha, min_point_size...). With min_point_size, the swarms of all the
+        groups shrink their markers to the same size.
+
+    Returns
+    -------
+    list of SwarmCollection
+        One collection per group.
+    """
+    from functions_swarm_collection_v0 import SwarmCollection
+
+    if positions is None:
+        positions = np.arange(len(groups))
+    # Same level as the box artists drawn by ax.bxp / sns.boxplot, added on top of them
+    kwargs.setdefault('zorder', 2)
+    swarms = []
+    for values, position, color in zip(groups, positions, colors):
+        swarm = SwarmCollection(values, position, point_size=point_size, width=width, max_points=max_points,
+                                facecolors=[color], offset_transform=ax.transData, **kwargs)
+        ax.add_collection(swarm)
+        swarms.append(swarm)
+    for swarm in swarms:
+        swarm._fit_group = swarms
+    ax.autoscale_view()
+    return swarms
@@ -1,8 +1,18 @@
-import pandas as pd
-import seaborn as sns
-import scipy.stats as stats
-import matplotlib.pyplot as plt
+import functools
 
+from functions_cache_v0 import group_key
+from functions_drawing_v0 import kde_violins, resolve_palette, update_kde_violins
+from functions_export_v0 import DEFAULT_FORMATS, RASTERIZE_POINTS, save_figure
+from functions_grouped_v0 import GroupedData
+from functions_handle_v0 import PlotHandle
+from functions_lazy_v0 import lazy_import
+from functions_profile_v0 import profiled, stage
+from functions_style_v0 import apply_context, plotting_context
+from functions_swarm_v0 import sample_legend, swarm_scatter
+
+plt = lazy_import('matplotlib.pyplot')
+
+@profiled
 def plot_violins_generalized(ax, dataset, labels,
                              y_min=None, y_max=None,
                              h_line=None,
@@ -16,96 +26,55 @@ def plot_violins_generalized(ax, dataset, labels,
                              xgrid=False,
                              saveplot=False,
                              filename='filename',
-                             dpi=300):
-    
-    sns.set_context('notebook', font_scale=font_scale)
+                             dpi=300,
+                             save_formats=DEFAULT_FORMATS,
+                             rasterize_above=RASTERIZE_POINTS,
+                             kde_grid_size=256,
+                             kde_tol=1e-3,
+                             test='ranksums',
+                             test_kws=None,
+                             pairs=None,
+                             significant_only=False,
+                             max_points=None):
     
-    # Combine dataset into a single DataFrame
-    all_data = []
-    for i, (data, label) in enumerate(zip(dataset, labels)):
-        temp_df = pd.DataFrame(data, columns=['value'])
-        temp_df['cond'] = label  # Condition labels
-        all_data.append(temp_df)
-    data = pd.concat(all_data, ignore_index=True)
+    with stage('group_data'):
+        # Combine dataset into contiguous values + group offsets
+        grouped = GroupedData.from_dataset(dataset, labels)
+        # Content hash of each group: its statistics are reused from the cache on re-renders
+        keys = [group_key(g) for g in grouped]
     
-    # Set default palettes if not provided
-    if violin_palette is None:
-        violin_palette = sns.color_palette("deep")[0:len(dataset)]
-    if swarmplot_palette is None:
-        swarmplot_palette = sns.color_palette("deep")[0:len(dataset)]
-    
-    violin_parts = sns.violinplot(
-        y="value",
-        x="cond",
-        data=data,
+    # Violin bodies from the binned/FFT KDE (seaborn's look, without its exact O(n * grid) KDE)
+    violin_kws = dict(
         linewidth=1.5,
-        hue="cond",
-        palette=violin_palette,
-        saturation=1.0,
-        legend=False,
-        ax=ax,
-        order=labels,
+        kde_grid_size=kde_grid_size,
+        kde_tol=kde_tol,
+        # Set transparency (alpha) for violins
+        alpha=0.6 if show_swarm_plot else None,
     )
-    # Set transparency (alpha) for violins
-    if show_swarm_plot:
-        for pc in violin_parts.collections:
-            pc.set_alpha(0.6)  # Adjust transparency level (0.0 = fully transparent, 1.0 = opaque)
+    violin_colors = resolve_palette(violin_palette, len(labels), labels)
+    with stage('violins', ax):
+        # Kept by the returned handle, to move them when the data change
+        artists = {'violins': kde_violins(ax, grouped, violin_colors, keys=keys, **violin_kws)}
+    ax.set_xlim(-0.5, len(labels) - 0.5)
 
     if show_swarm_plot:
-        sns.swarmplot(
-            y="value",
-            x="cond",
-            data=data,
-            s=point_size,
-            palette=swarmplot_palette,
-            hue="cond",
-            legend=False,
-            ax=ax,
-            order=labels,
-            zorder=1 # Plots the swarm between the violin and the inner box
-        )
+        # Deterministic beeswarm, laid out at draw time
+        with stage('swarm', ax):
+            artists['swarm'] = swarm_scatter(
+                ax,
+                grouped,
+                resolve_palette(swarmplot_palette, len(labels), labels),
+                point_size=point_size,
+                max_points=max_points,
+                zorder=1 # Plots the swarm between the violin and the inner box
+            )
+            # Fraction of the points drawn of each downsampled group
+            sample_legend(ax, artists['swarm'], labels)
         
-    # Compute significance tests
-    pairs = [(labels[i], labels[j]) for i in range(len(labels)) for j in range(i+1, len(labels))]
-    (miny, maxy) = ax.get_ylim()
-    y_increment = 0.1 * (maxy - miny)
-    yposition = maxy
-    
-    h=0
-    if show_p_values:
-        for pair in pairs:
-            group1 = data[data['cond'] == pair[0]]['value']
-            group2 = data[data['cond'] == pair[1]]['value']
-            
-            stat_test = stats.ranksums(group1, group2)
-            p_value = stat_test.pvalue
-            
-            # Significance asterisks
-            if p_value < 1e-5:
-                significance_asterisks = '*****'
-            elif p_value < 1e-4:
-                significance_asterisks = '****'
-            elif p_value < 1e-3:
-                significance_asterisks = '***'
-            elif p_value < 1e-2:
-                significance_asterisks = '**'
-            elif p_value < 0.05:
-                significance_asterisks = '*'
-            else:
-                significance_asterisks = '(n.s.)'
-            
-            # Add significance bar and annotation
-            x_start = labels.index(pair[0])
-            x_end = labels.index(pair[1])
-            y = yposition * 1.0
-            h = data['value'].max() * 0.01
-            ax.plot([x_start, x_start, x_end, x_end], 
-                    [y, y + h, y + h, y-h], 
-                    color='black', lw=1.5, zorder=20)
-            ax.text((x_start + x_end) / 2, y + h * 1.05, significance_asterisks,
-                ha='center', va='bottom', fontsize=14, color='black')
-            ax.set_ylim(top=y + h * 2)
-            yposition += y_increment
+    # Compute significance tests, then the y limits
+    handle = PlotHandle(ax, grouped, keys, artists,
+                        functools.partial(_update_groups, colors=violin_colors, violin_kws=violin_kws))
+    handle.annotate(show_p_values, test, test_kws, pairs, significant_only, y_min, y_max, pad=6)
     
     # Axis labels and title
     ax.set_xlabel('')
@@ -114,22 +83,32 @@ def plot_violins_generalized(ax, dataset, labels,
     ax.set_xticklabels(labels)
     ax.set_title(plot_title)
 
-    # Update axis limits
-    if y_max is None:
-        y_max = yposition
-    else:
-        y_max = max(y_max, yposition)
-    ax.set_ylim(y_min, y_max+6*h)
-
     # Plot horizontal line
     if h_line is not None:
-        ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.75)
+        artists['h_line'] = ax.axhline(h_line, color='gray', linestyle='-', linewidth=2, zorder=0, alpha=0.75)
 
     if xgrid:
         ax.grid(axis='y')
         ax.set_axisbelow(True)
     
+    # Seaborn's context on this Axes only (None keeps rcParams)
+    if font_scale is not None:
+        apply_context(ax, plotting_context(font_scale))
+    
     if saveplot:
-        plt.savefig(filename + '.pdf', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.svg', bbox_inches='tight', dpi=dpi)
-        plt.savefig(filename + '.png', bbox_inches='tight', dpi=dpi)
+        save_figure(ax, filename, formats=save_formats, dpi=dpi,
+                    rasterize_above=rasterize_above)
+
+    return handle
+
+
+def _update_groups(handle, changed, colors, violin_kws):
+    """Move the violins and swarms of the changed groups of plot_violins_generalized."""
+    with stage('violins', handle.ax):
+        update_kde_violins(handle.ax, handle.artists['violins'], handle.grouped, changed, colors,
+                           keys=handle.keys, **violin_kws)
+    if 'swarm' in handle.artists:
+        with stage('swarm', handle.ax):
+            for i in changed:
+                handle.artists['swarm'][i].set_values(handle.grouped[i])
+            sample_legend(handle.ax, handle.artists['swarm'], handle.grouped.labels)
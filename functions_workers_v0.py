@@ -0,0 +1,40 @@
+import math
+import os
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def usable_cpus():
+    """
+    Number of CPUs this process can actually use, to size worker pools.
+
+    os.cpu_count() counts the CPUs of the machine. The CPU affinity of the
+    process (taskset, cpusets of a container) and the CPU quota of its
+    cgroup (e.g. docker --cpus) can leave far fewer, and a pool sized from
+    the machine then only adds processes competing for the same CPUs.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(cpus, 1)
+
+
+def _cgroup_quota():
+    """CPUs allowed by the cgroup quota (cgroup v2, then v1), or None when unlimited or unknown."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 or period <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,74 @@
+"""
+Tests of the content-keyed statistics cache (functions_cache_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_cache_v0 import StatsCache, cached_box_summary, cached_pairwise_ranksums, group_key  # noqa: E402
+from functions_stats_v0 import pairwise_ranksums  # noqa: E402
+from functions_summary_v0 import box_summary  # noqa: E402
+
+
+def test_group_key_depends_on_the_content_only():
+    values = np.arange(20.0)
+    assert group_key(values) == group_key(values.copy()) == group_key(list(values))
+    # A strided view hashes like its contiguous copy
+    assert group_key(values[::2]) == group_key(values[::2].copy())
+    assert group_key(values) != group_key(values.astype(np.float32))
+    assert group_key(values) != group_key(values.reshape(4, 5))
+    changed = values.copy()
+    changed[7] += 1e-12
+    assert group_key(values) != group_key(changed)
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = StatsCache(max_bytes=3 * 800)
+    for name in 'abc':
+        cache.put(name, np.zeros(100))
+    assert cache.lookup('a') is not None  # 'b' is now the least recently used
+    cache.put('d', np.zeros(100))
+    assert [key for key, _ in cache.items()] == ['c', 'a', 'd']
+    assert cache.nbytes == 3 * 800
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_values_larger_than_the_bound_are_not_stored():
+    cache = StatsCache(max_bytes=1000)
+    cache.put('small', np.zeros(10))
+    cache.put('large', np.zeros(1000))
+    assert [key for key, _ in cache.items()] == ['small']
+    disabled = StatsCache(max_bytes=0)
+    calls = []
+    for _ in range(2):
+        disabled.get('key', lambda: calls.append(1) or np.zeros(3))
+    assert len(calls) == 2 and len(disabled) == 0
+
+
+def test_cached_statistics_are_reused_by_content():
+    cache = StatsCache()
+    rng = np.random.default_rng(9)
+    values = rng.normal(size=200)
+    first = cached_box_summary(values, cache=cache)
+    assert cached_box_summary(values.copy(), cache=cache) is first
+    assert first == pytest.approx(box_summary(values))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changing_one_group_recomputes_only_its_pairs():
+    cache = StatsCache()
+    rng = np.random.default_rng(10)
+    groups = [rng.normal(i, 1, 30) for i in range(4)]
+    np.testing.assert_array_equal(cached_pairwise_ranksums(groups, cache=cache), pairwise_ranksums(groups))
+    assert len(cache) == 6
+    groups[2] = groups[2] + 0.5
+    np.testing.assert_array_equal(cached_pairwise_ranksums(groups, cache=cache), pairwise_ranksums(groups))
+    # The 3 pairs of the changed group are new; the other 3 were hits
+    assert len(cache) == 9 and cache.hits == 3
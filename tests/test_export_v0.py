@@ -0,0 +1,54 @@
+"""
+Tests of the multi-format export and the size of its worker pool (functions_export_v0, functions_workers_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import functions_export_v0  # noqa: E402
+from functions_export_v0 import save_figure  # noqa: E402
+from functions_workers_v0 import usable_cpus  # noqa: E402
+
+
+@pytest.fixture
+def fig():
+    fig = Figure()
+    fig.subplots().plot(np.arange(10), np.arange(10) ** 2)
+    return fig
+
+
+def test_usable_cpus_is_bounded_by_the_affinity():
+    cpus = usable_cpus()
+    assert 1 <= cpus <= (os.cpu_count() or 1)
+    if hasattr(os, 'sched_getaffinity'):
+        assert cpus <= len(os.sched_getaffinity(0))
+
+
+def test_single_cpu_writes_serially(fig, tmp_path, monkeypatch):
+    monkeypatch.setattr(functions_export_v0, 'usable_cpus', lambda: 1)
+    monkeypatch.setattr(functions_export_v0, '_EXPORT_POOL', None)
+    paths = save_figure(fig, str(tmp_path / 'figure'), formats=('png', 'svg'))
+    assert all(os.path.getsize(path) > 0 for path in paths)
+    assert functions_export_v0._EXPORT_POOL is None
+
+
+def test_parallel_exports_reuse_one_pool(fig, tmp_path):
+    try:
+        first = save_figure(fig, str(tmp_path / 'first'), formats=('png', 'svg'), parallel=True)
+        pool = functions_export_v0._EXPORT_POOL
+        second = save_figure(fig, str(tmp_path / 'second'), formats=('png', 'svg'), parallel=True)
+        assert pool is not None and functions_export_v0._EXPORT_POOL is pool
+        assert all(os.path.getsize(path) > 0 for path in first + second)
+        # SVG ids are random; the PNGs are identical
+        with open(first[0], 'rb') as fa, open(second[0], 'rb') as fb:
+            assert fa.read() == fb.read()
+    finally:
+        functions_export_v0._discard_shared_export_pool()
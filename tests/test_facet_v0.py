@@ -0,0 +1,105 @@
+"""
+Tests of the faceted grids: panel grouping, statistics pass and shared y limits (functions_facet_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+
+matplotlib.use('Agg')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_cache_v0 import StatsCache  # noqa: E402
+from functions_facet_v0 import facet_groups, panel_statistics, plot_facets  # noqa: E402
+
+CONDITIONS = ['W', 'N1', 'N3']
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(16)
+    frames = []
+    for metric, scale in (('m1', 1), ('m2', 10)):
+        for cohort, shift in (('A', 0), ('B', 3)):
+            for i, cond in enumerate(CONDITIONS):
+                frames.append(pd.DataFrame({'value': rng.normal(shift + i, 1, 30) * scale, 'cond': cond,
+                                            'metric': metric, 'cohort': cohort}))
+    # Shuffled, so the panels are not contiguous in the table
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    yield
+    import matplotlib.pyplot as plt
+
+    plt.close('all')
+
+
+def test_panels_hold_the_samples_of_each_group(table):
+    rows, cols, panels = facet_groups(table, row='metric', col='cohort', order=['N3', 'W', 'REM'])
+    # Rows and columns in the order of appearance
+    assert rows == list(pd.unique(table['metric'])) and cols == list(pd.unique(table['cohort']))
+    for (metric, cohort), grouped in panels.items():
+        assert grouped.labels == ['N3', 'W', 'REM']
+        for label, values in zip(grouped.labels, grouped):
+            mask = (table['metric'] == metric) & (table['cohort'] == cohort) & (table['cond'] == label)
+            # In the order of the table
+            np.testing.assert_array_equal(values, table.loc[mask, 'value'].to_numpy())
+        assert grouped[2].size == 0
+    rows, cols, panels = facet_groups(table, col='cohort', col_order=['B', 'C'])
+    assert rows == [None] and cols == ['B', 'C']
+    assert panels[(None, 'C')].sizes.tolist() == [0, 0, 0]
+
+
+@pytest.mark.parametrize('kind', ['boxes', 'violins', 'half_violins'])
+def test_workers_compute_the_same_statistics(table, kind):
+    _, _, panels = facet_groups(table, row='metric', col='cohort')
+    serial, parallel = StatsCache(), StatsCache()
+    panel_statistics(panels, kind, max_workers=1, cache=serial)
+    panel_statistics(panels, kind, max_workers=2, cache=parallel)
+    assert dict(serial.items()).keys() == dict(parallel.items()).keys()
+    for key, value in serial.items():
+        expected = dict(parallel.items())[key]
+        if isinstance(value, dict):
+            for name in value:
+                np.testing.assert_array_equal(value[name], expected[name])
+        elif isinstance(value, tuple):
+            for a, b in zip(value, expected):
+                np.testing.assert_array_equal(a, b)
+        else:
+            assert value == expected
+
+
+def bracket_rows(handle):
+    """Heights of the bracket rows (the middle of their legs)."""
+    segments = handle.artists['brackets'][1].get_segments()
+    return sorted({round((s[:, 1].min() + s[:, 1].max()) / 2, 9) for s in segments})
+
+
+@pytest.mark.parametrize('sharey', [True, 'row', 'col'])
+def test_shared_panels_have_the_same_limits_and_bracket_heights(table, sharey):
+    facets = plot_facets(table, kind='boxes', row='metric', col='cohort', sharey=sharey)
+    if sharey == 'row':
+        lines = list(facets.handles)
+    elif sharey == 'col':
+        lines = list(facets.handles.T)
+    else:
+        lines = [facets.handles.ravel()]
+    for handles in lines:
+        assert len({handle.ax.get_ylim() for handle in handles}) == 1
+        assert len({tuple(bracket_rows(handle)) for handle in handles}) == 1
+    if sharey in ('row', 'col'):
+        # Metrics (rows) differ tenfold in scale: the lines do not share their limits
+        assert len({lines[0][0].ax.get_ylim(), lines[1][0].ax.get_ylim()}) == 2
+    # Every panel still contains all its data
+    for handle in facets.handles.ravel():
+        low, high = handle.ax.get_ylim()
+        assert low <= handle.grouped.values.min() and high >= handle.grouped.values.max()
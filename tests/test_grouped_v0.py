@@ -0,0 +1,60 @@
+"""
+Tests of the contiguous group container (functions_grouped_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_grouped_v0 import GroupedData  # noqa: E402
+
+
+def test_groups_are_slices_of_one_buffer():
+    grouped = GroupedData.from_dataset([[1, 2, 3], [], [4.5, 5]], ['a', 'b', 'c'])
+    assert grouped.values.tolist() == [1, 2, 3, 4.5, 5]
+    assert grouped.sizes.tolist() == [3, 0, 2]
+    assert [g.tolist() for g in grouped] == [[1, 2, 3], [], [4.5, 5]]
+    assert grouped[-1].tolist() == [4.5, 5]
+    assert all(np.shares_memory(g, grouped.values) for g in grouped if g.size)
+    assert grouped.codes().tolist() == [0, 0, 0, 2, 2]
+    with pytest.raises(IndexError):
+        grouped[3]
+
+
+def test_two_dimensional_and_split_arrays_are_not_copied():
+    matrix = np.arange(12.0).reshape(3, 4)
+    assert np.shares_memory(GroupedData.from_dataset(matrix).values, matrix)
+    buffer = np.arange(10.0)
+    grouped = GroupedData.from_dataset(np.split(buffer, [3, 7]))
+    assert np.shares_memory(grouped.values, buffer)
+    assert grouped.sizes.tolist() == [3, 4, 3]
+    # Not back to back: copied into a new buffer
+    grouped = GroupedData.from_dataset([buffer[:3], buffer[5:]])
+    assert not np.shares_memory(grouped.values, buffer)
+    assert grouped.values.tolist() == [0, 1, 2, 5, 6, 7, 8, 9]
+
+
+def test_from_frame_follows_the_order_and_keeps_missing_groups_empty():
+    frame = pd.DataFrame({'value': [1.0, 2.0, 3.0, 4.0, 5.0], 'cond': ['N3', 'W', 'N3', 'W', 'N1']})
+    grouped = GroupedData.from_frame(frame, order=['W', 'N3', 'N2'])
+    assert grouped.labels == ['W', 'N3', 'N2']
+    assert [g.tolist() for g in grouped] == [[2, 4], [1, 3], []]
+    assert GroupedData.from_frame(frame).labels == ['N3', 'W', 'N1']
+    back = grouped.to_frame()
+    assert back['cond'].tolist() == ['W', 'W', 'N3', 'N3']
+
+
+def test_invalid_offsets_and_labels_raise():
+    with pytest.raises(ValueError):
+        GroupedData([1.0, 2.0], [0, 3])
+    with pytest.raises(ValueError):
+        GroupedData([1.0, 2.0], [0, 2, 1, 2])
+    with pytest.raises(ValueError):
+        GroupedData([1.0, 2.0], [0, 1, 2], labels=['only one'])
@@ -0,0 +1,95 @@
+"""
+Tests of the plot handles and their bracket layout (functions_handle_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_box_swarm_halfviolin_v1 import plot_half_violin_box_swarm  # noqa: E402
+from functions_boxplots_v3 import plot_boxes_generalized  # noqa: E402
+from functions_cache_v0 import STATS_CACHE  # noqa: E402
+from functions_violinplots_v3 import plot_violins_generalized  # noqa: E402
+
+PLOTS = [plot_boxes_generalized, plot_violins_generalized, plot_half_violin_box_swarm]
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(2)
+    return [rng.normal(0, 1, 40), rng.normal(1, 1, 40), rng.normal(2, 1, 40)]
+
+
+@pytest.mark.parametrize('plot', PLOTS)
+def test_nan_in_a_group_gives_finite_limits(plot, dataset):
+    dataset[1][3] = np.nan
+    ax = Figure().subplots()
+    handle = plot(ax, dataset, ['a', 'b', 'c'])
+    assert np.isfinite(ax.get_ylim()).all()
+    # Pairs with the NaN group are not significant; the other pair is tested
+    assert np.isnan(handle.p_values[0, 1]) and handle.p_values[0, 2] < 0.05
+    handle.update([g + 1 for g in dataset], draw=False)
+    assert np.isfinite(ax.get_ylim()).all()
+
+
+def rendered(plot, dataset, **kwargs):
+    fig = Figure(figsize=(6, 4), dpi=50)
+    FigureCanvasAgg(fig)
+    handle = plot(fig.subplots(), dataset, ['a', 'b', 'c', 'd'], **kwargs)
+    fig.canvas.draw()
+    return handle
+
+
+def pixels(handle):
+    handle.ax.figure.canvas.draw()
+    return np.asarray(handle.ax.figure.canvas.buffer_rgba()).copy()
+
+
+@pytest.mark.parametrize('plot, kwargs', [
+    (plot_boxes_generalized, {}),
+    (plot_boxes_generalized, dict(significant_only=True, h_line=0.5)),
+    (plot_violins_generalized, {}),
+    (plot_violins_generalized, dict(significant_only=True, show_swarm_plot=False)),
+    (plot_half_violin_box_swarm, {}),
+    (plot_half_violin_box_swarm, dict(connect_pairs=True, significant_only=True, h_line=1)),
+])
+def test_update_draws_what_a_fresh_plot_draws(plot, kwargs):
+    rng = np.random.default_rng(14)
+    old = [rng.normal(i, 1, 60) for i in range(4)]
+    # Groups 1 and 3 change, group 1 also in size
+    new = [old[0], rng.normal(3, 2, 80), old[2], rng.normal(-1, 0.5, 60)]
+    handle = rendered(plot, old, **kwargs)
+    assert handle.update(new, draw=False) == [1, 3]
+    fresh = rendered(plot, new, **kwargs)
+    np.testing.assert_array_equal(handle.p_values, fresh.p_values)
+    np.testing.assert_array_equal(handle.ax.get_ylim(), fresh.ax.get_ylim())
+    np.testing.assert_array_equal(pixels(handle), pixels(fresh))
+
+
+def test_update_recomputes_only_the_changed_groups():
+    rng = np.random.default_rng(15)
+    dataset = [rng.normal(i, 1, 50) for i in range(4)]
+    handle = rendered(plot_boxes_generalized, dataset)
+    artists = dict(handle.artists)
+    assert handle.update([g.copy() for g in dataset]) == []
+    dataset[2] = dataset[2] + 1
+    misses = STATS_CACHE.misses
+    assert handle.update(dataset, draw=False) == [2]
+    # The box statistics of group 2 and its 3 pairs are new; the other pairs are cached
+    assert STATS_CACHE.misses - misses <= 4
+    assert all(handle.artists[name] is artist for name, artist in artists.items() if name != 'brackets')
+
+
+def test_plots_of_summaries_cannot_be_updated():
+    summaries = [dict(q1=0.0, med=1.0, q3=2.0, whislo=-1.0, whishi=3.0)] * 4
+    handle = rendered(plot_boxes_generalized, summaries)
+    with pytest.raises(ValueError):
+        handle.update(summaries)
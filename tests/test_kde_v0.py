@@ -0,0 +1,62 @@
+"""
+Tests of the binned/FFT kernel density estimate (functions_kde_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy import stats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_kde_v0 import binned_kde, kde_bandwidth  # noqa: E402
+
+
+def samples(kind, n, seed=11):
+    rng = np.random.default_rng(seed)
+    if kind == 'normal':
+        return rng.normal(3, 2, n)
+    if kind == 'bimodal':
+        return np.concatenate((rng.normal(-2, 0.5, n // 2), rng.normal(2, 1, n - n // 2)))
+    return rng.lognormal(0, 1, n)
+
+
+@pytest.mark.parametrize('kind', ['normal', 'bimodal', 'skewed'])
+@pytest.mark.parametrize('bw_method', ['scott', 'silverman', 0.3])
+@pytest.mark.parametrize('tol', [1e-3, 1e-4])
+def test_matches_gaussian_kde_within_tol(kind, bw_method, tol):
+    values = samples(kind, 2000)
+    support, density = binned_kde(values, bw_method=bw_method, tol=tol)
+    exact = stats.gaussian_kde(values, bw_method=bw_method)(support)
+    # tol is the approximate error relative to the peak density
+    assert np.abs(density - exact).max() <= tol * exact.max()
+
+
+def test_bandwidth_matches_gaussian_kde():
+    values = samples('bimodal', 500)
+    for bw_method in ('scott', 'silverman', 0.3):
+        kde = stats.gaussian_kde(values, bw_method=bw_method)
+        assert kde_bandwidth(values, bw_method) == pytest.approx(np.sqrt(kde.covariance[0, 0]))
+    assert kde_bandwidth(values, bw_adjust=2) == pytest.approx(2 * kde_bandwidth(values))
+
+
+def test_grid_extends_cut_bandwidths_and_ignores_non_finite_values():
+    values = samples('normal', 300)
+    bandwidth = kde_bandwidth(values)
+    support, density = binned_kde(np.concatenate((values, [np.nan, np.inf])), grid_size=300, cut=2)
+    assert support.size >= 300 and np.all(np.diff(support) > 0)
+    assert support[0] == pytest.approx(values.min() - 2 * bandwidth)
+    assert support[-1] == pytest.approx(values.max() + 2 * bandwidth)
+    np.testing.assert_allclose(density, binned_kde(values, grid_size=300, cut=2)[1])
+    # Nearly all the mass is on the grid
+    assert density.sum() * (support[1] - support[0]) == pytest.approx(1, abs=1e-3)
+
+
+@pytest.mark.parametrize('values', [[], [1.0], [2.0, 2.0, 2.0], [np.nan, 1.0]])
+def test_no_spread_gives_empty_arrays(values):
+    support, density = binned_kde(values)
+    assert support.size == density.size == 0
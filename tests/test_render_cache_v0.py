@@ -0,0 +1,104 @@
+"""
+Tests of the on-disk render cache and its keys (functions_render_cache_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import matplotlib as mpl
+import numpy as np
+import pandas as pd
+import pytest
+
+mpl.use('Agg')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_grouped_v0 import GroupedData  # noqa: E402
+from functions_render_cache_v0 import RenderCache, render_cached  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(17)
+    return [rng.normal(0, 1, 40), rng.normal(1, 1, 40)]
+
+
+def test_key_follows_the_content_of_everything_that_makes_the_figure(cache, dataset):
+    key = cache.key('plot_boxes_generalized', dataset, ['a', 'b'], {'plot_title': 't'}, figsize=(6, 4))
+    # Same content in other objects
+    assert key == cache.key('plot_boxes_generalized', [g.copy() for g in dataset], ['a', 'b'],
+                            {'plot_title': 't'}, figsize=(6, 4))
+    changed = [dataset[0], dataset[1].copy()]
+    changed[1][5] += 1e-9
+    others = [
+        cache.key('plot_violins_generalized', dataset, ['a', 'b'], {'plot_title': 't'}, figsize=(6, 4)),
+        cache.key('plot_boxes_generalized', changed, ['a', 'b'], {'plot_title': 't'}, figsize=(6, 4)),
+        cache.key('plot_boxes_generalized', dataset, ['a', 'c'], {'plot_title': 't'}, figsize=(6, 4)),
+        cache.key('plot_boxes_generalized', dataset, ['a', 'b'], {'plot_title': 'u'}, figsize=(6, 4)),
+        cache.key('plot_boxes_generalized', dataset, ['a', 'b'], {'plot_title': 't'}, figsize=(6, 5)),
+    ]
+    assert len({key, *others}) == 6
+
+
+def test_key_follows_the_rcparams_but_not_the_backend(cache, dataset):
+    key = cache.key('plot_boxes_generalized', dataset, ['a', 'b'])
+    with mpl.rc_context({'font.family': 'serif'}):
+        assert cache.key('plot_boxes_generalized', dataset, ['a', 'b']) != key
+    with mpl.rc_context({'interactive': not mpl.rcParams['interactive'], 'toolbar': 'None'}):
+        assert cache.key('plot_boxes_generalized', dataset, ['a', 'b']) == key
+
+
+def test_frames_and_grouped_data_are_keyed_by_content_and_iterators_are_not_cached(cache, dataset):
+    frame = pd.DataFrame({'value': np.concatenate(dataset), 'cond': ['W'] * 40 + ['N3'] * 40})
+    assert cache.key('plot_boxes_W_N3', frame) == cache.key('plot_boxes_W_N3', frame.copy())
+    assert cache.key('plot_boxes_W_N3', frame) != cache.key('plot_boxes_W_N3', frame.iloc[::-1])
+    grouped = GroupedData.from_dataset(dataset, ['a', 'b'])
+    assert cache.key('plot_boxes_generalized', grouped) == cache.key(
+        'plot_boxes_generalized', GroupedData.from_dataset([g.copy() for g in dataset], ['a', 'b']))
+    assert cache.key('plot_boxes_generalized', [iter(dataset[0]), dataset[1]], ['a', 'b']) is None
+
+
+def test_renders_are_skipped_and_outputs_restored(tmp_path, dataset):
+    directory = str(tmp_path / 'cache')
+    filename = str(tmp_path / 'figure')
+    options = dict(filename=filename, save_formats=('png', 'svg'), figsize=(4, 3))
+    first = render_cached('plot_boxes_generalized', dataset, ['a', 'b'], directory, **options)
+    assert first.error is None and not first.cached
+    with open(f'{filename}.png', 'rb') as f:
+        png = f.read()
+    # A new cache object reads the manifest
+    assert render_cached('plot_boxes_generalized', dataset, ['a', 'b'], directory, **options).cached
+    os.remove(f'{filename}.png')
+    with open(f'{filename}.svg', 'a') as f:
+        f.write('<!-- edited -->')
+    again = render_cached('plot_boxes_generalized', dataset, ['a', 'b'], directory, **options)
+    assert again.cached
+    with open(f'{filename}.png', 'rb') as f:
+        assert f.read() == png
+    with open(f'{filename}.svg') as f:
+        assert 'edited' not in f.read()
+    changed = render_cached('plot_boxes_generalized', dataset, ['a', 'b'], directory,
+                            plot_title='new', **options)
+    assert changed.error is None and not changed.cached
+
+
+def test_cleanup_removes_the_least_recently_used_entries(tmp_path, dataset):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    for name in ('old', 'new'):
+        path = tmp_path / f'{name}.png'
+        path.write_bytes(name.encode() * 1000)
+        cache.store(str(tmp_path / name), cache.key('plot', dataset, [name]), [str(path)])
+    cache._entries[os.path.abspath(str(tmp_path / 'old'))]['last_used'] -= 60
+    assert cache.cleanup(cache.nbytes() - 1) == 1
+    assert cache.nbytes() == 3000
+    key = cache.key('plot', dataset, ['new'])
+    assert cache.lookup(str(tmp_path / 'new'), key, ['png']) == [f"{tmp_path / 'new'}.png"]
+    assert cache.lookup(str(tmp_path / 'old'), cache.key('plot', dataset, ['old']), ['png']) is None
@@ -0,0 +1,58 @@
+"""
+Tests of the resampling engines (functions_resampling_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_cache_v0 import StatsCache, cached_pairwise_tests  # noqa: E402
+from functions_resampling_v0 import pairwise_bootstrap, pairwise_permutation  # noqa: E402
+
+
+@pytest.fixture
+def groups():
+    rng = np.random.default_rng(1)
+    return [rng.normal(0, 1, 30), rng.normal(0.4, 1, 30), rng.normal(0.2, 1, 30), rng.normal(1, 1, 30)]
+
+
+@pytest.mark.parametrize('paired', [False, True])
+@pytest.mark.parametrize('engine', [pairwise_permutation, pairwise_bootstrap])
+def test_pair_p_value_does_not_depend_on_position(groups, engine, paired):
+    a, b, c, d = groups
+
+    def p_values(dataset, **kwargs):
+        result = engine(dataset, paired=paired, n_resamples=2000, **kwargs)
+        return result[0] if engine is pairwise_bootstrap else result
+
+    reference = p_values([a, b])[0, 1]
+    assert p_values([b, a])[0, 1] == reference
+    assert p_values([c, a, d, b])[1, 3] == reference
+    assert p_values([c, b, d, a])[3, 1] == reference
+    # Other pairs tested alongside do not change it either
+    assert p_values([c, b, d, a], pairs=[(1, 3)])[1, 3] == reference
+
+
+def test_bootstrap_intervals_follow_the_pair_direction(groups):
+    a, b = groups[:2]
+    _, forward = pairwise_bootstrap([a, b], n_resamples=2000)
+    _, backward = pairwise_bootstrap([b, a], n_resamples=2000)
+    np.testing.assert_allclose(forward[0, 1], backward[1, 0])
+    np.testing.assert_allclose(forward[0, 1], -backward[0, 1][::-1])
+
+
+def test_cached_p_values_match_fresh_ones_in_any_order(groups):
+    cache = StatsCache()
+    a, b, c, d = groups
+    first = cached_pairwise_tests([a, b, c, d], test='permutation', cache=cache, n_resamples=2000)
+    reordered = [d, c, b, a]
+    cached = cached_pairwise_tests(reordered, test='permutation', cache=cache, n_resamples=2000)
+    fresh = cached_pairwise_tests(reordered, test='permutation', cache=StatsCache(), n_resamples=2000)
+    np.testing.assert_array_equal(cached, fresh)
+    np.testing.assert_array_equal(cached, first[::-1, ::-1])
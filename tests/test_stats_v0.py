@@ -0,0 +1,69 @@
+"""
+Tests of the batched rank-sum engine and the asterisk levels (functions_stats_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+from scipy import stats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_stats_v0 import SIGNIFICANCE_LEVELS, pairwise_ranksums, significance_asterisks  # noqa: E402
+
+
+def scipy_matrix(groups):
+    k = len(groups)
+    p_values = np.ones((k, k))
+    for i in range(k):
+        for j in range(k):
+            if i != j:
+                p_values[i, j] = stats.ranksums(groups[i], groups[j]).pvalue
+    return p_values
+
+
+def test_matches_scipy_on_continuous_samples():
+    rng = np.random.default_rng(3)
+    groups = [rng.normal(0, 1, 25), rng.normal(0.5, 1, 40), rng.normal(0.2, 2, 7), rng.exponential(1, 60)]
+    np.testing.assert_allclose(pairwise_ranksums(groups), scipy_matrix(groups), rtol=1e-10)
+
+
+def test_matches_scipy_with_ties():
+    rng = np.random.default_rng(4)
+    # Few distinct values: many ties within and across the groups
+    groups = [rng.integers(0, 5, 30).astype(float), rng.integers(1, 6, 20).astype(float),
+              np.full(10, 3.0)]
+    np.testing.assert_allclose(pairwise_ranksums(groups), scipy_matrix(groups), rtol=1e-10)
+
+
+def test_empty_and_nan_groups_are_nan():
+    rng = np.random.default_rng(5)
+    groups = [rng.normal(size=20), np.empty(0), np.array([1.0, np.nan, 2.0]), rng.normal(1, 1, 20)]
+    p_values = pairwise_ranksums(groups)
+    for invalid in (1, 2):
+        assert np.isnan(p_values[invalid]).all() and np.isnan(p_values[:, invalid]).all()
+        with warnings.catch_warnings():
+            # scipy warns about the samples too small to test
+            warnings.simplefilter('ignore')
+            assert np.isnan(stats.ranksums(groups[0], groups[invalid]).pvalue)
+    assert p_values[0, 3] == pytest.approx(stats.ranksums(groups[0], groups[3]).pvalue, rel=1e-10)
+
+
+@pytest.mark.parametrize('p_value, expected', [
+    (1e-6, '*****'), (5e-5, '****'), (5e-4, '***'), (5e-3, '**'), (0.02, '*'),
+    (0.05, '(n.s.)'), (0.7, '(n.s.)'), (np.nan, '(n.s.)'),
+])
+def test_asterisks(p_value, expected):
+    assert significance_asterisks(p_value) == expected
+
+
+def test_asterisks_follow_the_levels():
+    # Just below a level: one asterisk more than at the level itself
+    for stars, level in zip(range(len(SIGNIFICANCE_LEVELS), 0, -1), SIGNIFICANCE_LEVELS):
+        assert significance_asterisks(level * 0.999) == '*' * stars
+        assert significance_asterisks(level) == ('*' * (stars - 1) or '(n.s.)')
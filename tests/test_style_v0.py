@@ -0,0 +1,36 @@
+"""
+Tests of the built-in plotting contexts and default palette (functions_style_v0, functions_drawing_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+import seaborn as sns
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_drawing_v0 import resolve_palette  # noqa: E402
+from functions_style_v0 import plotting_context  # noqa: E402
+
+
+@pytest.mark.parametrize('context', ['paper', 'notebook', 'talk', 'poster'])
+@pytest.mark.parametrize('font_scale', [1, 1.4, 2.5])
+def test_contexts_match_seaborn(context, font_scale):
+    expected = dict(sns.plotting_context(context, font_scale=font_scale))
+    assert plotting_context(font_scale, context) == pytest.approx(expected)
+
+
+def test_other_contexts_go_to_seaborn():
+    rc = {'font.size': 20}
+    assert plotting_context(1, rc) == dict(sns.plotting_context(rc))
+
+
+@pytest.mark.parametrize('n', [1, 3, 10, 13])
+def test_default_palette_is_seaborn_deep(n):
+    expected = [tuple(color) for color in sns.color_palette('deep', n)]
+    assert resolve_palette(None, n) == expected
+    assert resolve_palette('deep', n) == expected
+    assert resolve_palette('Set2', n) == sns.color_palette('Set2', n)
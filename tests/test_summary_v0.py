@@ -0,0 +1,84 @@
+"""
+Tests of the quantile sketch and the out-of-core box statistics (functions_summary_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_summary_v0 import QuantileSketch, box_summary, summarize_groups  # noqa: E402
+
+QUANTILES = np.array([0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999])
+
+
+@pytest.fixture(params=['normal', 'lognormal'])
+def values(request):
+    rng = np.random.default_rng(12)
+    if request.param == 'normal':
+        return rng.normal(size=200_000)
+    return rng.lognormal(0, 1.5, 200_000)
+
+
+def rank_error(values, estimates, q):
+    return np.abs(np.searchsorted(np.sort(values), estimates) / values.size - q).max()
+
+
+def test_quantiles_are_within_the_rank_error(values):
+    sketch = QuantileSketch(compression=500)
+    for chunk in np.array_split(values, 10):
+        sketch.update(chunk)
+    assert sketch.means.size <= 500
+    assert rank_error(values, sketch.quantile(QUANTILES), QUANTILES) <= 1 / 500
+    # Count, mean and extremes are exact
+    assert sketch.count == values.size
+    assert sketch.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert sketch.quantile(0) == values.min() and sketch.quantile(1) == values.max()
+
+
+def test_merged_sketches_match_one_sketch(values):
+    parts = [QuantileSketch().update(chunk) for chunk in np.array_split(values, 7)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    merged.merge(QuantileSketch())
+    assert merged.count == values.size
+    assert rank_error(values, merged.quantile(QUANTILES), QUANTILES) <= 1 / 500
+
+
+def test_summary_is_close_to_the_exact_statistics(values):
+    exact = box_summary(values)
+    summary = QuantileSketch().update(values).summary()
+    for name, q in (('q1', 0.25), ('med', 0.5), ('q3', 0.75)):
+        assert rank_error(values, summary[name], q) <= 1 / 500
+    for name in ('whislo', 'whishi'):
+        exact_rank = np.searchsorted(np.sort(values), exact[name]) / values.size
+        assert rank_error(values, summary[name], exact_rank) <= 1 / 500
+    assert summary['mean'] == pytest.approx(exact['mean'])
+
+
+def test_non_finite_values_are_ignored_and_empty_sketches_are_nan():
+    sketch = QuantileSketch().update([1.0, np.nan, 3.0, np.inf, 2.0])
+    assert sketch.count == 3 and sketch.quantile(0.5) == 2.0
+    empty = QuantileSketch()
+    assert np.isnan(empty.quantile(0.5)) and np.isnan(empty.summary()['med'])
+
+
+def test_memmaps_and_chunk_iterators_are_streamed(tmp_path):
+    rng = np.random.default_rng(13)
+    matrix = rng.normal(size=(2, 50_000))
+    np.save(tmp_path / 'groups.npy', matrix)
+    mapped = np.load(tmp_path / 'groups.npy', mmap_mode='r')
+    from_memmap = summarize_groups(mapped, chunk_size=4096)
+    from_chunks = summarize_groups([iter(np.array_split(row, 5)) for row in matrix])
+    in_memory = summarize_groups([mapped[0], matrix[1]])
+    assert summarize_groups([matrix[0], matrix[1]]) is None
+    for stats in (from_memmap, from_chunks, in_memory):
+        for group, summary in zip(matrix, stats):
+            assert rank_error(group, summary['med'], 0.5) <= 1 / 500
+            assert summary['whislo'] >= group.min() and summary['whishi'] <= group.max()
@@ -0,0 +1,117 @@
+"""
+Tests of the beeswarm layout, the level-of-detail subsample and the swarm collections
+(functions_swarm_v0, functions_swarm_collection_v0).
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions_box_swarm_halfviolin_v1 import plot_half_violin_box_swarm  # noqa: E402
+from functions_boxplots_v3 import plot_boxes_generalized  # noqa: E402
+from functions_swarm_v0 import beeswarm_offsets, level_of_detail  # noqa: E402
+
+
+def drawn_axes(figsize=(6.4, 4.8)):
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig.subplots()
+
+
+def swarms(ax):
+    return [c for c in ax.collections if type(c).__name__ == 'SwarmCollection']
+
+
+def test_beeswarm_offsets_do_not_overlap():
+    y = np.random.default_rng(6).normal(0, 10, 300)
+    offsets = beeswarm_offsets(y, 1.0)
+    points = np.column_stack((offsets, y))
+    distances = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    np.fill_diagonal(distances, np.inf)
+    assert distances.min() >= 1 - 1e-9
+    # Deterministic
+    np.testing.assert_array_equal(beeswarm_offsets(y, 1.0), offsets)
+
+
+@pytest.mark.parametrize('single_collection', [False, True])
+@pytest.mark.parametrize('n_groups', [2, 3, 4])
+def test_half_violin_swarms_fit_with_default_settings(capsys, n_groups, single_collection):
+    rng = np.random.default_rng(7)
+    dataset = [rng.normal(0.5 * i, 1, 50) for i in range(n_groups)]
+    ax = drawn_axes()
+    plot_half_violin_box_swarm(ax, dataset, [f'g{i}' for i in range(n_groups)],
+                               single_collection=single_collection)
+    ax.figure.canvas.draw()
+    assert 'cannot be placed' not in capsys.readouterr().out
+    # One marker size for every group, and every point between its box and its violin
+    sizes = {float(size) for swarm in swarms(ax) for size in swarm.get_sizes()}
+    assert len(sizes) == 1 and 1.5 ** 2 <= sizes.pop() <= 6 ** 2
+    for swarm in swarms(ax):
+        x = swarm.get_offsets()[:, 0]
+        assert np.all(np.abs(x - np.round(x)) <= 0.2)
+
+
+def test_markers_shrink_no_further_than_half_the_point_size(capsys):
+    rng = np.random.default_rng(8)
+    ax = drawn_axes()
+    plot_half_violin_box_swarm(ax, [rng.normal(0, 1, 2000), rng.normal(1, 1, 2000)], ['a', 'b'])
+    ax.figure.canvas.draw()
+    assert 'cannot be placed' in capsys.readouterr().out
+    assert all(np.sqrt(swarm.get_sizes()[0]) == pytest.approx(3) for swarm in swarms(ax))
+
+
+@pytest.mark.parametrize('max_points', [2, 50, 500])
+def test_level_of_detail_keeps_the_extremes_and_the_outliers(max_points):
+    rng = np.random.default_rng(9)
+    values = np.concatenate((rng.normal(0, 1, 20_000), [15.0, -12.0, 20.0], [np.nan] * 5))
+    rng.shuffle(values)
+    kept = level_of_detail(values, max_points)
+    assert kept.size <= max_points and np.all(np.diff(kept) > 0)
+    assert not np.isnan(values[kept]).any()
+    assert values[kept].min() == np.nanmin(values) and values[kept].max() == np.nanmax(values)
+    q1, q3 = np.nanpercentile(values, [25, 75])
+    outliers = np.flatnonzero((values < q1 - 1.5 * (q3 - q1)) | (values > q3 + 1.5 * (q3 - q1)))
+    # All kept while they take at most half of max_points (about 140 of them here)
+    assert (set(outliers) <= set(kept)) == (outliers.size <= max_points // 2)
+    np.testing.assert_array_equal(level_of_detail(values, max_points), kept)
+
+
+def test_level_of_detail_keeps_the_quantiles():
+    values = np.random.default_rng(10).lognormal(0, 1, 100_000)
+    kept = values[level_of_detail(values, 500)]
+    q = np.linspace(0.05, 0.95, 19)
+    # Rank in the full data of the quantiles of the subsample
+    ranks = np.searchsorted(np.sort(values), np.quantile(kept, q)) / values.size
+    assert np.abs(ranks - q).max() <= 2 / 500
+
+
+def test_level_of_detail_thins_heavy_tails_and_leaves_small_groups_alone():
+    values = np.random.default_rng(11).standard_cauchy(10_000)
+    kept = level_of_detail(values, 100)
+    # Too many outliers to keep them all: still at most max_points, with both extremes
+    assert kept.size <= 100 and {values.argmin(), values.argmax()} <= set(kept)
+    np.testing.assert_array_equal(level_of_detail([3.0, np.nan, 1.0], 5), [0, 2])
+    with pytest.raises(ValueError):
+        level_of_detail(values, 1)
+
+
+def test_max_points_thins_the_swarms_only():
+    rng = np.random.default_rng(12)
+    dataset = [rng.normal(0, 1, 3000), rng.normal(0.2, 1, 200)]
+    ax = drawn_axes()
+    handle = plot_boxes_generalized(ax, dataset, ['a', 'b'], max_points=300)
+    counts = [count for swarm in swarms(ax) for count in swarm.sample_counts]
+    assert counts == [(300, 3000), (200, 200)]
+    legend = ax.get_legend()
+    assert [text.get_text() for text in legend.get_texts()] == ['a: 300 of 3,000 points (10.0%)']
+    # Boxes and p-values use all the samples
+    full = plot_boxes_generalized(drawn_axes(), dataset, ['a', 'b'])
+    np.testing.assert_array_equal(handle.p_values, full.p_values)